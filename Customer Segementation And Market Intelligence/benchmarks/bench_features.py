@@ -0,0 +1,85 @@
+"""
+Benchmark: KMeans convergence on raw StandardScaler features vs. the
+log1p / capping / robust-scaling pipeline (scripts/features.py).
+
+RFM comes from synthetic Online Retail transactions. For each K, KMeans is
+fitted with n_init=1 from several seeds; the table reports mean Lloyd
+iterations, mean fit time and the mean pairwise adjusted Rand index between
+seeds (how much restarts disagree, i.e. how much n_init buys) and the share
+of customers in the largest cluster.
+
+Usage:
+    python benchmarks/bench_features.py --rows 2000000 --customers 50000
+"""
+
+import argparse
+import os
+import sys
+import time
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+from sklearn.metrics import adjusted_rand_score
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+from data_preprocessing import clean_transactions
+from features import RFMTransformer
+from rfm import compute_rfm
+from synthetic_data import generate_transactions
+
+
+def fit_stats(X, k, seeds):
+    """Mean iterations, fit time, pairwise ARI and largest-cluster share over single-init fits"""
+    iterations, times, labels, shares = [], [], [], []
+    for seed in seeds:
+        start = time.perf_counter()
+        kmeans = KMeans(n_clusters=k, n_init=1, random_state=seed).fit(X)
+        times.append(time.perf_counter() - start)
+        iterations.append(kmeans.n_iter_)
+        labels.append(kmeans.labels_)
+        shares.append(np.bincount(kmeans.labels_).max() / len(X))
+    agreement = [adjusted_rand_score(a, b) for a, b in combinations(labels, 2)]
+    return np.mean(iterations), np.mean(times), np.mean(agreement), np.mean(shares)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--customers", type=int, default=50_000)
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 4, 5, 6, 8])
+    parser.add_argument("--seeds", type=int, default=5)
+    args = parser.parse_args()
+
+    rfm = compute_rfm(clean_transactions(generate_transactions(args.rows, n_customers=args.customers)))
+    print(f"Customers: {len(rfm):,}")
+
+    start = time.perf_counter()
+    standard = StandardScaler().fit_transform(rfm.to_numpy(dtype=np.float64))
+    standard_time = time.perf_counter() - start
+    start = time.perf_counter()
+    robust = RFMTransformer().fit_transform(rfm)
+    robust_time = time.perf_counter() - start
+    print(f"Transform: standard {standard_time:.3f}s, log1p+cap+robust {robust_time:.3f}s")
+
+    rows = []
+    seeds = range(args.seeds)
+    for k in args.k:
+        for name, X in (("standard", standard), ("robust", robust)):
+            iterations, fit_time, agreement, share = fit_stats(X, k, seeds)
+            rows.append({"K": k, "features": name, "iterations": iterations, "fit_s": fit_time,
+                         "seed_ARI": agreement, "largest_share": share})
+    results = pd.DataFrame(rows).set_index(["K", "features"])
+    print(results.to_string(float_format=lambda value: f"{value:.3f}"))
+
+    totals = results.groupby(level="features")[["iterations", "fit_s"]].sum()
+    print(f"\nIterations: {totals.loc['standard', 'iterations']:.0f} -> {totals.loc['robust', 'iterations']:.0f} "
+          f"({totals.loc['robust', 'iterations'] / totals.loc['standard', 'iterations'] - 1:+.0%}); "
+          f"fit time: {totals.loc['standard', 'fit_s']:.2f}s -> {totals.loc['robust', 'fit_s']:.2f}s "
+          f"({totals.loc['robust', 'fit_s'] / totals.loc['standard', 'fit_s'] - 1:+.0%})")
+
+
+if __name__ == "__main__":
+    main()
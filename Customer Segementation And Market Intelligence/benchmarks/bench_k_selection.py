@@ -0,0 +1,74 @@
+"""
+Benchmark: K selection from scratch (k_selection.sweep_k plus a final refit
+of the chosen K) vs. the warm-started, early-stopped k_selection.warm_sweep_k
+with its model for the chosen K reused (model_development.py's
+REUSE_SWEEP_MODEL).
+
+Features are the log1p/capping/robust-scaled RFM (features.py) of synthetic
+Online Retail transactions. Reports sweep, final fit and total time, the
+Ks each mode visited, and how the chosen K's model compares (inertia and
+adjusted Rand index against the from-scratch fit).
+
+Usage:
+    python benchmarks/bench_k_selection.py --rows 3000000 --customers 100000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from sklearn.cluster import KMeans
+from sklearn.metrics import adjusted_rand_score
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+from data_preprocessing import clean_transactions
+from features import RFMTransformer
+from k_selection import sweep_k, warm_sweep_k
+from rfm import compute_rfm
+from synthetic_data import generate_transactions
+
+SCORING = ["sampled_silhouette", "calinski_harabasz", "davies_bouldin"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=3_000_000)
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--k-max", type=int, default=10)
+    parser.add_argument("--k", type=int, default=3, help="The chosen K (fitted or reused after the sweep)")
+    parser.add_argument("--patience", type=int, default=2)
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Workers for the from-scratch sweep")
+    args = parser.parse_args()
+
+    rfm = compute_rfm(clean_transactions(generate_transactions(args.rows, n_customers=args.customers)))
+    X = RFMTransformer().fit_transform(rfm)
+    k_range = range(2, args.k_max + 1)
+    print(f"Customers: {len(X):,}, K range {k_range.start}-{k_range.stop - 1}, chosen K={args.k}")
+
+    start = time.perf_counter()
+    scratch = sweep_k(X, k_range=k_range, n_jobs=args.n_jobs, scoring=SCORING)
+    scratch_sweep = time.perf_counter() - start
+    start = time.perf_counter()
+    final = KMeans(n_clusters=args.k, n_init=10, random_state=42).fit(X)
+    scratch_final = time.perf_counter() - start
+
+    start = time.perf_counter()
+    warm, models = warm_sweep_k(X, k_range=k_range, scoring=SCORING, patience=args.patience, min_k=args.k)
+    warm_sweep = time.perf_counter() - start
+    reused = models[args.k]
+
+    print(f"\n{'':12s}{'sweep_s':>10s}{'final_s':>10s}{'total_s':>10s}{'fit_s':>10s}{'score_s':>10s}  Ks")
+    for name, sweep, final_time, table in (("scratch", scratch_sweep, scratch_final, scratch),
+                                          ("warm", warm_sweep, 0.0, warm)):
+        print(f"{name:12s}{sweep:10.2f}{final_time:10.2f}{sweep + final_time:10.2f}"
+              f"{table['FitTime'].sum():10.2f}{table['ScoreTime'].sum():10.2f}  {list(table.index)}")
+    print(f"\nSpeedup: {(scratch_sweep + scratch_final) / warm_sweep:.1f}x")
+    print(f"K={args.k} inertia: refit {final.inertia_:.1f}, reused warm {reused.inertia_:.1f} "
+          f"({reused.inertia_ / final.inertia_ - 1:+.3%}); ARI {adjusted_rand_score(final.labels_, reused.labels_):.3f}")
+    print("\nWarm sweep:")
+    print(warm.drop(columns=["SilhouetteLow", "SilhouetteHigh"], errors="ignore").to_string(float_format=lambda v: f"{v:.3f}"))
+
+
+if __name__ == "__main__":
+    main()
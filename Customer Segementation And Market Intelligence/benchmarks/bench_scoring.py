@@ -0,0 +1,68 @@
+"""
+Benchmark: batch scoring throughput of a persisted segmentation model.
+
+Fits a scaler + KMeans on a synthetic RFM sample, then scores --customers
+synthetic customers with predict_segments and with the sklearn estimator.
+
+Usage:
+    python benchmarks/bench_scoring.py --customers 1000000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+from clustering import make_backend
+from segmentation_model import load_model, predict_segments, save_model
+
+
+def make_rfm(n_customers, seed=42):
+    """Synthetic skewed RFM table indexed by CustomerID"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Recency": rng.integers(0, 374, n_customers),
+        "Frequency": rng.geometric(0.3, n_customers),
+        "Monetary": rng.lognormal(6.5, 1.2, n_customers),
+    }, index=pd.Index(np.arange(n_customers) + 10000, name="CustomerID"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=1_000_000)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rfm = make_rfm(args.customers)
+    train = rfm.sample(min(len(rfm), 50_000), random_state=0)
+    scaler = StandardScaler().fit(train)
+    model = make_backend("kmeans", args.k).fit(scaler.transform(train))
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        save_model(scaler, model, features=rfm.columns, model_dir=model_dir)
+        artifact = load_model(model_dir)
+
+    best = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        labels = predict_segments(rfm, artifact)
+        best = min(best, time.perf_counter() - start)
+    print(f"Customers: {len(rfm):,}")
+    print(f"predict_segments: {best:8.3f}s  {len(rfm) / best:14,.0f} customers/s")
+
+    start = time.perf_counter()
+    reference = model.model.predict(scaler.transform(rfm))
+    sk_time = time.perf_counter() - start
+    print(f"sklearn predict:  {sk_time:8.3f}s  {len(rfm) / sk_time:14,.0f} customers/s")
+    print(f"Label agreement:  {np.mean(labels.to_numpy() == reference):.4%}")
+
+
+if __name__ == "__main__":
+    main()
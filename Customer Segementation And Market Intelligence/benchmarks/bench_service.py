@@ -0,0 +1,90 @@
+"""
+Benchmark: segment lookup latency, in-process and over local HTTP.
+
+Starts segment_service on a free local port with a synthetic customer
+table and a freshly fitted model, then times lookups by CustomerID and by
+raw R/F/M, sequentially and from concurrent clients.
+
+Usage:
+    python benchmarks/bench_service.py --customers 1000000 --requests 2000
+"""
+
+import argparse
+import http.client
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+from bench_scoring import make_rfm
+from clustering import make_backend
+from segment_service import create_server
+from segmentation_model import save_model
+
+
+def time_requests(port, paths):
+    """Per-request latencies (seconds) over one keep-alive connection"""
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    latencies = []
+    for path in paths:
+        start = time.perf_counter()
+        conn.request("GET", path)
+        response = conn.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        assert response.status == 200, response.status
+    conn.close()
+    return latencies
+
+
+def report(name, latencies):
+    latencies = np.asarray(latencies) * 1000
+    print(f"{name:28s} p50 {np.percentile(latencies, 50):7.3f} ms  p99 {np.percentile(latencies, 99):7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=1_000_000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=8)
+    args = parser.parse_args()
+
+    rfm = make_rfm(args.customers)
+    scaler = StandardScaler().fit(rfm)
+    model = make_backend("kmeans", 3).fit(scaler.transform(rfm.sample(50_000, random_state=0)))
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        save_model(scaler, model, features=rfm.columns, model_dir=model_dir)
+        server = create_server(port=0, model_dir=model_dir, rfm=rfm)
+    port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    rng = np.random.default_rng(0)
+    ids = rng.choice(rfm.index.to_numpy(), args.requests)
+    id_paths = [f"/segment?customer_id={i}" for i in ids]
+    rfm_paths = [f"/segment?recency={r}&frequency={f}&monetary={m:.2f}"
+                 for r, f, m in rfm.sample(args.requests, random_state=1).itertuples(index=False)]
+
+    print(f"Customers indexed: {len(rfm):,}")
+    report("HTTP by CustomerID", time_requests(port, id_paths))
+    report("HTTP by raw R/F/M", time_requests(port, rfm_paths))
+
+    per_client = [rfm_paths[i::args.clients] for i in range(args.clients)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.clients) as pool:
+        results = list(pool.map(lambda paths: time_requests(port, paths), per_client))
+    elapsed = time.perf_counter() - start
+    report(f"HTTP R/F/M x{args.clients} clients", [t for r in results for t in r])
+    print(f"Concurrent throughput: {args.requests / elapsed:,.0f} requests/s")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
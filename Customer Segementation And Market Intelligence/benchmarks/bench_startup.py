@@ -0,0 +1,112 @@
+"""
+Benchmark: cold-start time of the dashboard and the short-lived scripts.
+
+Each entry point's imports run in a fresh interpreter (cwd scripts/, as the
+scripts are run), --repeats times. "scoring_predict" also loads a model
+artifact (a small one fitted here, in a temporary directory) and scores
+1,000 customers with it; the table reports the median and the
+fastest start, the heavy libraries the imports pulled in, and whether the
+median meets STARTUP_TARGETS. The exit status is 1 when a target is missed.
+
+Usage:
+    python benchmarks/bench_startup.py --repeats 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SCRIPTS_DIR = os.path.join(PROJECT_DIR, "scripts")
+
+# Entry point -> the imports it runs before doing any work
+ENTRY_POINTS = {
+    "package": "import customer_segmentation",
+    "scoring": "from segmentation_model import load_model, predict_segments",
+    "scoring_predict": ("import numpy as np, pandas as pd\n"
+                        "from segmentation_model import load_model, predict_segments\n"
+                        "rfm = pd.DataFrame(np.ones((1000, 3)), columns=['Recency', 'Frequency', 'Monetary'])\n"
+                        "predict_segments(rfm, load_model({model_dir!r}))"),
+    "segment_service": "import segment_service",
+    "rfm_snapshots": "import rfm_snapshots",
+    "cluster_profiling": "from cluster_profiling import profile_clusters",
+    "dashboard": ("import streamlit, numpy, pandas\n"
+                  "from dashboard_cube import build_cube, load_cube\n"
+                  "from rfm import compact_rfm"),
+}
+
+# Median cold start, in seconds, each entry point must stay under
+STARTUP_TARGETS = {
+    "package": 0.05,
+    "scoring": 0.8,
+    "scoring_predict": 0.8,
+    "segment_service": 0.8,
+    "rfm_snapshots": 0.8,
+    "cluster_profiling": 0.8,
+    "dashboard": 1.5,
+}
+
+HEAVY_MODULES = ["pandas", "pyarrow", "joblib", "scipy", "sklearn", "matplotlib", "seaborn", "plotly", "streamlit"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+exec({code!r})
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def cold_start(code):
+    """Seconds to run `code` in a fresh interpreter, and the heavy modules it loaded"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([PROJECT_DIR, SCRIPTS_DIR]))
+    output = subprocess.run([sys.executable, "-c", PROBE.format(code=code, heavy=HEAVY_MODULES)],
+                            cwd=SCRIPTS_DIR, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def write_model(model_dir):
+    """A small K=3 artifact for scoring_predict"""
+    sys.path.insert(0, SCRIPTS_DIR)
+    from sklearn.preprocessing import StandardScaler
+
+    from clustering import make_backend
+    from segmentation_model import save_model
+
+    X = np.random.default_rng(0).lognormal(size=(2_000, 3))
+    scaler = StandardScaler().fit(X)
+    save_model(scaler, make_backend("kmeans", 3, n_init=1).fit(scaler.transform(X)), model_dir=model_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--entry", nargs="+", choices=list(ENTRY_POINTS), default=list(ENTRY_POINTS))
+    args = parser.parse_args()
+
+    missed = []
+    with tempfile.TemporaryDirectory(prefix="bench_startup_") as model_dir:
+        write_model(model_dir)
+        for name in args.entry:
+            code = ENTRY_POINTS[name].format(model_dir=model_dir)
+            runs = [cold_start(code) for _ in range(args.repeats)]
+            seconds = np.array([run["seconds"] for run in runs])
+            median, target = np.median(seconds), STARTUP_TARGETS[name]
+            status = "ok" if median <= target else "MISSED"
+            if median > target:
+                missed.append(name)
+            print(f"{name:18s} median {median:6.3f}s  min {seconds.min():6.3f}s  target {target:5.2f}s  "
+                  f"{status:6s}  loads: {', '.join(runs[-1]['heavy']) or '-'}")
+
+    if missed:
+        print(f"\nStartup targets missed: {', '.join(missed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
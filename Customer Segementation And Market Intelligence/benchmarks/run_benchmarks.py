@@ -0,0 +1,149 @@
+"""
+Benchmark suite: times the pipeline's hot paths on synthetic data at several scales.
+
+For each scale it writes synthetic Online Retail transactions to a CSV chunk
+by chunk, so no scale is held in memory whole, and times: partitioned
+preprocessing of that file (cleaning, per-customer totals and the invoice
+table, one customer-hash partition of about ROWS_PER_PARTITION rows per
+worker task), RFM from the partitioned totals and from the invoice table, the
+K sweep (parallel and warm-started), the final clustering, and the
+dashboard's summary cube (built once by the pipeline, then queried on every
+rerun). Results are written to
+benchmarks/results/<timestamp>.json, appended to benchmarks/results/history.csv,
+and compared with the previous run of the same benchmark at the same scale.
+
+Usage:
+    python benchmarks/run_benchmarks.py --scales 100k 1m
+    python benchmarks/run_benchmarks.py --scales 10m 100m --k-max 6
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+HISTORY_PATH = os.path.join(RESULTS_DIR, "history.csv")
+
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "scripts"))
+from clustering import make_backend
+from dashboard_cube import RFM_PAIRS, build_cube, cluster_ids, cluster_summary, density, histogram, overall_summary
+from data_preprocessing import preprocess_partitioned
+from invoices import invoices_path
+from k_selection import sweep_k, warm_sweep_k
+from partitions import customer_totals_path, load_partitioned_rfm
+from rfm import RFM_COLUMNS, compute_rfm
+from storage import load_table
+from synthetic_data import write_transactions
+
+SCALES = {"100k": 100_000, "1m": 1_000_000, "10m": 10_000_000, "100m": 100_000_000}
+# Raw rows per customer-hash partition: bounds each preprocessing task's memory
+ROWS_PER_PARTITION = 2_000_000
+
+
+def dashboard_queries(cube):
+    """What dashboard.py computes from the cube on each rerun, for all clusters and a selection"""
+    clusters = cluster_ids(cube)
+    for selected in (clusters, clusters[:1]):
+        cluster_summary(cube, selected)
+        overall_summary(cube, selected)
+        for column in RFM_COLUMNS:
+            histogram(cube, column, selected)
+        for x, y in RFM_PAIRS:
+            density(cube, x, y, selected)
+
+
+def timed(results, scale, name, func, rows):
+    """Run func once, record its wall time and throughput, and return its result"""
+    start = time.perf_counter()
+    value = func()
+    elapsed = time.perf_counter() - start
+    results.append({"scale": scale, "benchmark": name, "rows": rows, "seconds": elapsed,
+                    "rows_per_sec": rows / elapsed if elapsed else None})
+    print(f"  {name:22s} {elapsed:9.3f}s  {rows / elapsed if elapsed else float('inf'):14,.0f} rows/s")
+    return value
+
+
+def run_scale(scale, n_rows, k_range, n_jobs, results, work_dir=None):
+    print(f"\nScale {scale} ({n_rows:,} rows)")
+    with tempfile.TemporaryDirectory(dir=work_dir) as scratch:
+        raw_path = os.path.join(scratch, "Online Retail.csv")
+        write_transactions(n_rows, raw_path)
+        output = os.path.join(scratch, "Online Retail Preprocessed.csv")
+        n_partitions = max(1, n_rows // ROWS_PER_PARTITION)
+
+        timed(results, scale, "preprocess_partitioned",
+              lambda: preprocess_partitioned(raw_path, output, n_partitions, n_jobs=n_jobs,
+                                             invoices_output=invoices_path(output)), n_rows)
+        rfm = timed(results, scale, "rfm_partitioned", lambda: load_partitioned_rfm(customer_totals_path(output)),
+                    n_rows)
+        invoices = timed(results, scale, "load_invoices",
+                         lambda: load_table(invoices_path(output),
+                                            columns=["InvoiceNo", "InvoiceDate", "CustomerID", "TotalPrice"]),
+                         n_rows)
+        timed(results, scale, "rfm_invoices", lambda: compute_rfm(invoices, invoices=True), len(invoices))
+        del invoices
+
+    rfm_scaled = StandardScaler().fit_transform(rfm)
+    timed(results, scale, "k_sweep", lambda: sweep_k(rfm_scaled, k_range=k_range, n_jobs=n_jobs,
+                                                     scoring=["sampled_silhouette"]), len(rfm))
+    timed(results, scale, "warm_k_sweep", lambda: warm_sweep_k(rfm_scaled, k_range=k_range,
+                                                               scoring=["sampled_silhouette"]), len(rfm))
+    model = timed(results, scale, "cluster", lambda: make_backend("kmeans", 3).fit(rfm_scaled), len(rfm))
+
+    rfm["Cluster"] = model.predict(rfm_scaled)
+    cube = timed(results, scale, "dashboard_cube", lambda: build_cube(rfm), len(rfm))
+    timed(results, scale, "dashboard_queries", lambda: dashboard_queries(cube), len(rfm))
+
+
+def compare_with_history(results):
+    """Print the change against the most recent previous run of each benchmark"""
+    if not os.path.exists(HISTORY_PATH):
+        return
+    history = pd.read_csv(HISTORY_PATH)
+    print("\nChange vs. previous run:")
+    for result in results:
+        previous = history[(history["scale"] == result["scale"]) & (history["benchmark"] == result["benchmark"])]
+        if len(previous):
+            before = previous.iloc[-1]["seconds"]
+            print(f"  {result['scale']:5s} {result['benchmark']:22s} {before:9.3f}s -> {result['seconds']:9.3f}s "
+                  f"({(result['seconds'] - before) / before:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", nargs="+", default=["100k", "1m"], choices=sorted(SCALES))
+    parser.add_argument("--k-max", type=int, default=10, help="Largest K in the sweep (starts at 2)")
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--label", default="", help="Free-form label stored with the results")
+    parser.add_argument("--work-dir", help="Where the synthetic data and preprocessed tables are written "
+                                           "(default: the system temp directory; 100m needs tens of GB)")
+    args = parser.parse_args()
+
+    run_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+    results = []
+    for scale in args.scales:
+        run_scale(scale, SCALES[scale], range(2, args.k_max + 1), args.n_jobs, results, args.work_dir)
+
+    compare_with_history(results)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    for result in results:
+        result.update(run_id=run_id, label=args.label)
+    with open(os.path.join(RESULTS_DIR, f"{run_id}.json"), "w") as f:
+        json.dump({"run_id": run_id, "label": args.label, "python": platform.python_version(),
+                   "machine": platform.machine(), "cpu_count": os.cpu_count(), "results": results}, f, indent=2)
+    pd.DataFrame(results).to_csv(HISTORY_PATH, mode="a", header=not os.path.exists(HISTORY_PATH), index=False)
+    print(f"\nResults saved to {os.path.join(RESULTS_DIR, run_id + '.json')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Synthetic transaction generator matching the Online Retail schema.
+
+Columns: InvoiceNo, StockCode, Description, Quantity, InvoiceDate,
+UnitPrice, CustomerID, Country -- the raw input of data_preprocessing.py.
+
+The data is skewed like the real log: a few customers and products account
+for most lines (Pareto weights), most customers are in one country,
+invoices have a varying number of lines, about 2% of invoices are
+cancellations ("C" prefix, negative quantities) and about 25% of lines
+have no CustomerID. Rows are generated in chunks, so 100M-row files can be
+written without holding them in memory.
+
+Usage:
+    python benchmarks/synthetic_data.py 1000000 synthetic_retail.csv
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+START_DATE = np.datetime64("2010-12-01T08:00:00")
+N_DAYS = 374
+COUNTRIES = ["United Kingdom", "Germany", "France", "EIRE", "Spain", "Netherlands",
+             "Belgium", "Switzerland", "Portugal", "Australia"]
+COUNTRY_WEIGHTS = [0.89, 0.02, 0.02, 0.015, 0.01, 0.01, 0.01, 0.01, 0.008, 0.007]
+LINES_PER_INVOICE = 20
+MISSING_CUSTOMER_RATE = 0.25
+MISSING_DESCRIPTION_RATE = 0.003
+CANCELLATION_RATE = 0.02
+
+
+def pareto_weights(n, shape, rng):
+    weights = rng.pareto(shape, n) + 1
+    return weights / weights.sum()
+
+
+class SyntheticRetail:
+    """Fixed customer and product populations that chunks of transactions are drawn from"""
+
+    def __init__(self, n_customers=4000, n_products=4000, seed=42):
+        self.rng = np.random.default_rng(seed)
+        self.customer_ids = np.arange(12346, 12346 + n_customers)
+        self.customer_weights = pareto_weights(n_customers, 1.2, self.rng)
+        self.customer_country = self.rng.choice(len(COUNTRIES), n_customers, p=COUNTRY_WEIGHTS)
+
+        self.stock_codes = np.array([str(20000 + i) for i in range(n_products)])
+        self.descriptions = np.array([f"PRODUCT {code}" for code in self.stock_codes])
+        self.product_weights = pareto_weights(n_products, 1.5, self.rng)
+        self.product_prices = np.round(self.rng.lognormal(1.0, 0.9, n_products), 2)
+        self.next_invoice = 536365
+
+    def chunk(self, n_rows):
+        """Generate the next n_rows transaction lines"""
+        rng = self.rng
+        n_invoices = max(n_rows // LINES_PER_INVOICE, 1)
+
+        # Invoice-level attributes
+        invoice_customer = rng.choice(len(self.customer_ids), n_invoices, p=self.customer_weights)
+        invoice_seconds = (rng.integers(0, N_DAYS, n_invoices) * 86400
+                           + rng.integers(8 * 3600, 18 * 3600, n_invoices))
+        invoice_cancelled = rng.random(n_invoices) < CANCELLATION_RATE
+        invoice_numbers = np.arange(self.next_invoice, self.next_invoice + n_invoices)
+        self.next_invoice += n_invoices
+
+        # Assign lines to invoices (uneven invoice sizes)
+        line_invoice = np.sort(rng.integers(0, n_invoices, n_rows))
+        line_customer = invoice_customer[line_invoice]
+        cancelled = invoice_cancelled[line_invoice]
+
+        product = rng.choice(len(self.stock_codes), n_rows, p=self.product_weights)
+        quantity = rng.geometric(0.15, n_rows)
+        quantity = np.where(cancelled, -quantity, quantity)
+
+        invoice_no = pd.Series(invoice_numbers[line_invoice]).astype(str)
+        invoice_no = invoice_no.where(~cancelled, "C" + invoice_no)
+
+        customer_id = self.customer_ids[line_customer].astype(np.float64)
+        customer_id[rng.random(n_rows) < MISSING_CUSTOMER_RATE] = np.nan
+
+        description = pd.Series(pd.Categorical.from_codes(product, self.descriptions)).astype(object)
+        description[rng.random(n_rows) < MISSING_DESCRIPTION_RATE] = None
+
+        return pd.DataFrame({
+            "InvoiceNo": invoice_no,
+            "StockCode": pd.Categorical.from_codes(product, self.stock_codes),
+            "Description": description,
+            "Quantity": quantity,
+            "InvoiceDate": START_DATE + invoice_seconds[line_invoice].astype("timedelta64[s]"),
+            "UnitPrice": self.product_prices[product],
+            "CustomerID": customer_id,
+            "Country": pd.Categorical.from_codes(self.customer_country[line_customer], COUNTRIES),
+        })
+
+
+def customers_for_rows(n_rows):
+    """Customer population that keeps roughly the real data's rows per customer"""
+    return max(int(n_rows / 130), 100)
+
+
+def iter_transactions(n_rows, chunk_rows=1_000_000, n_customers=None, seed=42):
+    """Yield DataFrame chunks that together hold n_rows synthetic transactions"""
+    retail = SyntheticRetail(n_customers or customers_for_rows(n_rows), seed=seed)
+    for start in range(0, n_rows, chunk_rows):
+        yield retail.chunk(min(chunk_rows, n_rows - start))
+
+
+def generate_transactions(n_rows, n_customers=None, seed=42):
+    """All n_rows synthetic transactions in one DataFrame"""
+    return pd.concat(iter_transactions(n_rows, n_customers=n_customers, seed=seed), ignore_index=True)
+
+
+def write_transactions(n_rows, path, n_customers=None, seed=42):
+    """Write n_rows synthetic transactions to a CSV, one chunk at a time"""
+    for i, chunk in enumerate(iter_transactions(n_rows, n_customers=n_customers, seed=seed)):
+        chunk.to_csv(path, mode="w" if i == 0 else "a", header=(i == 0), index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("rows", type=int)
+    parser.add_argument("output", help="Output .csv (written chunk by chunk)")
+    parser.add_argument("--customers", type=int)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    write_transactions(args.rows, args.output, n_customers=args.customers, seed=args.seed)
+    print(f"Wrote {args.rows:,} synthetic transactions to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
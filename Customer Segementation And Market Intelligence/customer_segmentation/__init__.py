@@ -0,0 +1,65 @@
+"""
+Importable entry point to the segmentation modules in scripts/.
+
+The modules in scripts/ import each other by bare name (`from rfm import
+RFM_COLUMNS`), and pickled artifacts refer to them the same way
+(features.RFMTransformer), so this package puts scripts/ on sys.path
+rather than moving them. The public API is resolved lazily: importing the
+package loads nothing beyond the standard library, and each name imports
+its module (and that module's dependencies) on first use.
+
+    import customer_segmentation as cs
+
+    rfm = cs.compute_rfm(cs.load_table("Online Retail Preprocessed.csv"))
+    rfm["Cluster"] = cs.predict_segments(rfm, cs.load_model("scripts/models"))
+"""
+
+import importlib
+import os
+import sys
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+# Public name -> scripts/ module that defines it
+_EXPORTS = {
+    "RFM_COLUMNS": "rfm",
+    "compute_rfm": "rfm",
+    "compact_rfm": "rfm",
+    "customer_totals": "rfm",
+    "RFMState": "rfm_state",
+    "load_table": "storage",
+    "save_table": "storage",
+    "iter_table": "storage",
+    "clean_transactions": "data_preprocessing",
+    "aggregate_invoices": "invoices",
+    "load_partitioned_rfm": "partitions",
+    "RFMTransformer": "features",
+    "make_backend": "clustering",
+    "sweep_k": "k_selection",
+    "warm_sweep_k": "k_selection",
+    "load_model": "segmentation_model",
+    "load_estimator": "segmentation_model",
+    "save_model": "segmentation_model",
+    "predict_segments": "segmentation_model",
+    "profile_clusters": "cluster_profiling",
+    "build_cube": "dashboard_cube",
+    "load_cube": "dashboard_cube",
+    "SegmentIndex": "segment_service",
+}
+
+__all__ = ["SCRIPTS_DIR"] + sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
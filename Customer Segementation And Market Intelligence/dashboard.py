@@ -1,8 +1,20 @@
+import os
+import sys
+
 import streamlit as st
+import numpy as np
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+
+# plotly and cluster_profiling are imported inside the views that use them,
+# so the title and the metrics render before they are loaded
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+from dashboard_cube import (DEFAULT_POINT_BUDGET, bin_centers, bin_positions, build_cube, cluster_ids,
+                            cluster_summary, density, histogram, load_cube, overall_summary, page_rows, sample_points,
+                            sort_by_cluster)
+from rfm import RFM_COLUMNS, compact_rfm
+
+RFM_CLUSTERS_PATH = "data/Online Retail RFM Clusters.csv"
+RFM_CUBE_PATH = "data/Online Retail RFM Cube.json"
 
 # Set page configuration
 st.set_page_config(
@@ -15,30 +27,187 @@ st.set_page_config(
 # Load data
 @st.cache_data
 def load_data():
-    rfm = pd.read_csv("data/Online Retail RFM Clusters.csv")
+    rfm = compact_rfm(pd.read_csv(RFM_CLUSTERS_PATH, index_col="CustomerID"))
     return rfm
 
+# Per-cluster aggregates precomputed by model_development.py (built here if missing)
+@st.cache_data
+def load_summary_cube():
+    if os.path.exists(RFM_CUBE_PATH):
+        return load_cube(RFM_CUBE_PATH)
+    return build_cube(load_data())
+
+# Per-cluster descriptive statistics and personas, computed once per session
+# (the significance tests are not shown here, so they are skipped)
+@st.cache_data
+def load_profile():
+    from cluster_profiling import profile_clusters
+    return profile_clusters(load_data(), tests=False)
+
+# RFM rows grouped by cluster, so table pages are sliced without filtering every row
+@st.cache_data
+def load_sorted_data():
+    return sort_by_cluster(load_data())
+
+# Bins of Frequency and Monetary are log-spaced: they are drawn evenly spaced,
+# with ticks labelled in the metric's units
+def value_ticks(positions, centers, n_ticks=6):
+    ticks = np.unique(np.linspace(0, len(positions) - 1, n_ticks).round().astype(int))
+    return dict(tickvals=positions[ticks],
+                ticktext=[f"{v:,.0f}" if abs(v) >= 10 else f"{v:.1f}" for v in centers[ticks]])
+
+def histogram_figure(cube, column, selected_clusters, title):
+    """Stacked per-cluster histogram from precomputed bin counts"""
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    centers, counts = histogram(cube, column, selected_clusters)
+    positions = bin_positions(cube, column)
+    colors = px.colors.qualitative.Set3
+    fig = go.Figure()
+    for i, (cluster_id, cluster_counts) in enumerate(counts.items()):
+        fig.add_trace(go.Bar(x=positions, y=cluster_counts, name=str(cluster_id), customdata=centers,
+                             hovertemplate=f"{column}: %{{customdata:,.1f}}<br>count: %{{y}}",
+                             marker_color=colors[i % len(colors)]))
+    fig.update_layout(title=title, barmode="stack", bargap=0, xaxis_title=column, yaxis_title="count",
+                      legend_title_text="Cluster")
+    fig.update_xaxes(**value_ticks(positions, centers))
+    return fig
+
+# Scatter matrix from a stratified sample; cached per cluster selection and budget
+@st.cache_data
+def sampled_scatter_figure(selected_clusters, budget):
+    import plotly.express as px
+
+    sorted_rfm, cluster_ranges = load_sorted_data()
+    sample = sample_points(sorted_rfm, cluster_ranges, selected_clusters, budget)
+    fig = px.scatter_matrix(
+        sample.assign(Cluster=sample['Cluster'].astype(str)),
+        dimensions=RFM_COLUMNS,
+        color='Cluster',
+        title=f"RFM Scatter Plot Matrix ({len(sample):,} sampled customers)",
+        color_discrete_sequence=px.colors.qualitative.Set3
+    )
+    fig.update_traces(marker=dict(size=3, opacity=0.6), diagonal_visible=False)
+    fig.update_layout(height=600)
+    return fig
+
+# Binned 2D density per RFM pair, composed from the cube's per-cluster counts
+@st.cache_data
+def density_matrix_figure(selected_clusters):
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    cube = load_summary_cube()
+    n = len(RFM_COLUMNS)
+    fig = make_subplots(rows=n, cols=n, horizontal_spacing=0.04, vertical_spacing=0.04)
+    for i, y in enumerate(RFM_COLUMNS):
+        for j, x in enumerate(RFM_COLUMNS):
+            if x == y:
+                centers, counts = histogram(cube, x, selected_clusters)
+                fig.add_trace(go.Bar(x=bin_positions(cube, x), y=sum(counts.values(), np.zeros(len(centers))),
+                                     marker_color="#636EFA", showlegend=False), row=i + 1, col=j + 1)
+            else:
+                centers_x, centers_y, counts = density(cube, x, y, selected_clusters)
+                # customdata per cell: customers, x value, y value
+                customdata = np.dstack([counts, np.broadcast_to(centers_x, counts.shape),
+                                        np.broadcast_to(centers_y[:, None], counts.shape)])
+                fig.add_trace(go.Heatmap(x=bin_positions(cube, x), y=bin_positions(cube, y), z=np.log1p(counts),
+                                         colorscale="Viridis", showscale=False, customdata=customdata,
+                                         hovertemplate=f"{x}: %{{customdata[1]:,.1f}}<br>"
+                                                       f"{y}: %{{customdata[2]:,.1f}}<br>"
+                                                       "customers: %{customdata[0]}<extra></extra>"),
+                              row=i + 1, col=j + 1)
+            fig.update_xaxes(**value_ticks(bin_positions(cube, x), bin_centers(cube, x), n_ticks=4),
+                             row=i + 1, col=j + 1)
+            if x != y:
+                fig.update_yaxes(**value_ticks(bin_positions(cube, y), bin_centers(cube, y), n_ticks=4),
+                                 row=i + 1, col=j + 1)
+            if i == n - 1:
+                fig.update_xaxes(title_text=x, row=i + 1, col=j + 1)
+            if j == 0:
+                fig.update_yaxes(title_text=y, row=i + 1, col=j + 1)
+    fig.update_layout(title="RFM Density Matrix (log customer count per bin)", height=600, bargap=0)
+    return fig
+
+# Cluster size pie chart
+def cluster_sizes_figure(selected_summary):
+    import plotly.express as px
+
+    cluster_sizes = selected_summary['Count']
+    fig_pie = px.pie(
+        values=cluster_sizes.values,
+        names=[f"Cluster {i}" for i in cluster_sizes.index],
+        title="Customer Distribution by Cluster",
+        color_discrete_sequence=px.colors.qualitative.Set3
+    )
+    return fig_pie
+
+# RFM comparison by cluster
+def cluster_means_figure(selected_summary):
+    import plotly.graph_objects as go
+
+    cluster_means = selected_summary[['Recency', 'Frequency', 'Monetary']]
+    
+    fig_bar = go.Figure()
+    
+    fig_bar.add_trace(go.Bar(
+        name='Recency (Days)',
+        x=[f"Cluster {i}" for i in cluster_means.index],
+        y=cluster_means['Recency'],
+        yaxis='y',
+        offsetgroup=1
+    ))
+    
+    fig_bar.add_trace(go.Bar(
+        name='Frequency',
+        x=[f"Cluster {i}" for i in cluster_means.index],
+        y=cluster_means['Frequency'],
+        yaxis='y2',
+        offsetgroup=2
+    ))
+    
+    fig_bar.add_trace(go.Bar(
+        name='Monetary ($)',
+        x=[f"Cluster {i}" for i in cluster_means.index],
+        y=cluster_means['Monetary'],
+        yaxis='y3',
+        offsetgroup=3
+    ))
+    
+    fig_bar.update_layout(
+        title="RFM Metrics by Cluster",
+        xaxis=dict(domain=[0, 1]),
+        yaxis=dict(title="Recency", title_font=dict(color="blue"), tickfont=dict(color="blue")),
+        yaxis2=dict(title="Frequency", title_font=dict(color="red"), tickfont=dict(color="red"), anchor="free", overlaying="y", side="right", position=0.85),
+        yaxis3=dict(title="Monetary", title_font=dict(color="green"), tickfont=dict(color="green"), anchor="free", overlaying="y", side="right", position=1),
+        legend=dict(x=0.1, y=1)
+    )
+    return fig_bar
+
 # Main dashboard
 def main():
     st.title("🎯 Customer Segmentation and Market Intelligence Platform")
     st.markdown("---")
     
-    # Load data
-    rfm = load_data()
+    # Load pre-aggregated cluster statistics
+    cube = load_summary_cube()
     
     # Sidebar
     st.sidebar.header("Dashboard Controls")
     
     # Cluster selection
-    clusters = sorted(rfm['Cluster'].unique())
+    clusters = cluster_ids(cube)
     selected_clusters = st.sidebar.multiselect(
         "Select Clusters to Display",
         clusters,
         default=clusters
     )
     
-    # Filter data based on selection
-    filtered_data = rfm[rfm['Cluster'].isin(selected_clusters)]
+    # Compose the selected view from per-cluster aggregates
+    total_count, total_means = overall_summary(cube)
+    selected_count, selected_means = overall_summary(cube, selected_clusters)
+    selected_summary = cluster_summary(cube, selected_clusters)
     
     # Main metrics
     col1, col2, col3, col4 = st.columns(4)
@@ -46,32 +215,32 @@ def main():
     with col1:
         st.metric(
             label="Total Customers",
-            value=f"{len(filtered_data):,}",
-            delta=f"{len(filtered_data) - len(rfm)}" if len(selected_clusters) < len(clusters) else None
+            value=f"{selected_count:,}",
+            delta=f"{selected_count - total_count}" if len(selected_clusters) < len(clusters) else None
         )
     
     with col2:
-        avg_monetary = filtered_data['Monetary'].mean()
+        avg_monetary = selected_means['Monetary']
         st.metric(
             label="Avg Customer Value",
             value=f"${avg_monetary:,.2f}",
-            delta=f"${avg_monetary - rfm['Monetary'].mean():,.2f}" if len(selected_clusters) < len(clusters) else None
+            delta=f"${avg_monetary - total_means['Monetary']:,.2f}" if len(selected_clusters) < len(clusters) else None
         )
     
     with col3:
-        avg_frequency = filtered_data['Frequency'].mean()
+        avg_frequency = selected_means['Frequency']
         st.metric(
             label="Avg Purchase Frequency",
             value=f"{avg_frequency:.1f}",
-            delta=f"{avg_frequency - rfm['Frequency'].mean():.1f}" if len(selected_clusters) < len(clusters) else None
+            delta=f"{avg_frequency - total_means['Frequency']:.1f}" if len(selected_clusters) < len(clusters) else None
         )
     
     with col4:
-        avg_recency = filtered_data['Recency'].mean()
+        avg_recency = selected_means['Recency']
         st.metric(
             label="Avg Days Since Last Purchase",
             value=f"{avg_recency:.0f}",
-            delta=f"{avg_recency - rfm['Recency'].mean():.0f}" if len(selected_clusters) < len(clusters) else None
+            delta=f"{avg_recency - total_means['Recency']:.0f}" if len(selected_clusters) < len(clusters) else None
         )
     
     st.markdown("---")
@@ -83,111 +252,36 @@ def main():
     col1, col2 = st.columns(2)
     
     with col1:
-        # Cluster size pie chart
-        cluster_sizes = filtered_data['Cluster'].value_counts().sort_index()
-        fig_pie = px.pie(
-            values=cluster_sizes.values,
-            names=[f"Cluster {i}" for i in cluster_sizes.index],
-            title="Customer Distribution by Cluster",
-            color_discrete_sequence=px.colors.qualitative.Set3
-        )
-        st.plotly_chart(fig_pie, use_container_width=True)
+        st.plotly_chart(cluster_sizes_figure(selected_summary), use_container_width=True)
     
     with col2:
-        # RFM comparison by cluster
-        cluster_means = filtered_data.groupby('Cluster')[['Recency', 'Frequency', 'Monetary']].mean()
-        
-        fig_bar = go.Figure()
-        
-        fig_bar.add_trace(go.Bar(
-            name='Recency (Days)',
-            x=[f"Cluster {i}" for i in cluster_means.index],
-            y=cluster_means['Recency'],
-            yaxis='y',
-            offsetgroup=1
-        ))
-        
-        fig_bar.add_trace(go.Bar(
-            name='Frequency',
-            x=[f"Cluster {i}" for i in cluster_means.index],
-            y=cluster_means['Frequency'],
-            yaxis='y2',
-            offsetgroup=2
-        ))
-        
-        fig_bar.add_trace(go.Bar(
-            name='Monetary ($)',
-            x=[f"Cluster {i}" for i in cluster_means.index],
-            y=cluster_means['Monetary'],
-            yaxis='y3',
-            offsetgroup=3
-        ))
-        
-        fig_bar.update_layout(
-            title="RFM Metrics by Cluster",
-            xaxis=dict(domain=[0, 1]),
-            yaxis=dict(title="Recency", title_font=dict(color="blue"), tickfont=dict(color="blue")),
-            yaxis2=dict(title="Frequency", title_font=dict(color="red"), tickfont=dict(color="red"), anchor="free", overlaying="y", side="right", position=0.85),
-            yaxis3=dict(title="Monetary", title_font=dict(color="green"), tickfont=dict(color="green"), anchor="free", overlaying="y", side="right", position=1),
-            legend=dict(x=0.1, y=1)
-        )
-        
-        st.plotly_chart(fig_bar, use_container_width=True)
+        st.plotly_chart(cluster_means_figure(selected_summary), use_container_width=True)
     
     # Detailed cluster information
     st.header("🎭 Customer Personas")
     
     # Create tabs for each cluster
     if selected_clusters:
+        profile = load_profile()
         tabs = st.tabs([f"Cluster {i}" for i in selected_clusters])
         
-        personas = {
-            0: {
-                "name": "Loyal Customers",
-                "description": "Recent, frequent, and high-spending customers. They are likely your most valuable customers.",
-                "recommendations": [
-                    "Implement loyalty programs",
-                    "Offer exclusive previews of new products",
-                    "Provide personalized recommendations",
-                    "Ensure excellent customer service to retain them"
-                ]
-            },
-            1: {
-                "name": "At-Risk Customers",
-                "description": "Customers who purchased long ago, with low frequency and monetary value. They might be at risk of churning.",
-                "recommendations": [
-                    "Send re-engagement campaigns",
-                    "Offer special discounts to encourage repeat purchases",
-                    "Conduct surveys to understand their needs",
-                    "Implement win-back strategies"
-                ]
-            },
-            2: {
-                "name": "VIP Customers",
-                "description": "Highly frequent and high-spending customers. These are your 'Whales' or 'VIPs'.",
-                "recommendations": [
-                    "Provide dedicated account managers",
-                    "Offer exclusive high-value products",
-                    "Solicit feedback for product development",
-                    "Ensure they feel valued with special treatment"
-                ]
-            }
-        }
-        
         for i, tab in enumerate(tabs):
             cluster_id = selected_clusters[i]
-            cluster_data = filtered_data[filtered_data['Cluster'] == cluster_id]
-            persona = personas.get(cluster_id, {"name": "General Segment", "description": "General customer segment", "recommendations": ["Standard marketing campaigns"]})
+            cluster_stats = selected_summary.loc[cluster_id]
+            persona = profile.persona(cluster_id)
             
             with tab:
                 col1, col2 = st.columns([1, 2])
                 
                 with col1:
                     st.subheader(f"📊 Cluster {cluster_id} Metrics")
-                    st.metric("Customer Count", f"{len(cluster_data):,}")
-                    st.metric("Avg Recency", f"{cluster_data['Recency'].mean():.1f} days")
-                    st.metric("Avg Frequency", f"{cluster_data['Frequency'].mean():.1f}")
-                    st.metric("Avg Monetary", f"${cluster_data['Monetary'].mean():,.2f}")
+                    st.metric("Customer Count", f"{int(cluster_stats['Count']):,}")
+                    st.metric("Avg Recency", f"{cluster_stats['Recency']:.1f} days")
+                    st.metric("Avg Frequency", f"{cluster_stats['Frequency']:.1f}")
+                    st.metric("Avg Monetary", f"${cluster_stats['Monetary']:,.2f}")
+                    st.caption(f"Median R/F/M: {profile.stats.loc[cluster_id, ('Recency', 'median')]:.0f} days, "
+                               f"{profile.stats.loc[cluster_id, ('Frequency', 'median')]:.0f}, "
+                               f"${profile.stats.loc[cluster_id, ('Monetary', 'median')]:,.2f}")
                 
                 with col2:
                     st.subheader(f"🎭 {persona['name']}")
@@ -204,54 +298,42 @@ def main():
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        fig_recency = px.histogram(
-            filtered_data, 
-            x='Recency', 
-            color='Cluster',
-            title="Recency Distribution",
-            nbins=30,
-            color_discrete_sequence=px.colors.qualitative.Set3
-        )
+        fig_recency = histogram_figure(cube, 'Recency', selected_clusters, "Recency Distribution")
         st.plotly_chart(fig_recency, use_container_width=True)
     
     with col2:
-        fig_frequency = px.histogram(
-            filtered_data, 
-            x='Frequency', 
-            color='Cluster',
-            title="Frequency Distribution",
-            nbins=30,
-            color_discrete_sequence=px.colors.qualitative.Set3
-        )
+        fig_frequency = histogram_figure(cube, 'Frequency', selected_clusters, "Frequency Distribution")
         st.plotly_chart(fig_frequency, use_container_width=True)
     
     with col3:
-        fig_monetary = px.histogram(
-            filtered_data, 
-            x='Monetary', 
-            color='Cluster',
-            title="Monetary Distribution",
-            nbins=30,
-            color_discrete_sequence=px.colors.qualitative.Set3
-        )
+        fig_monetary = histogram_figure(cube, 'Monetary', selected_clusters, "Monetary Distribution")
         st.plotly_chart(fig_monetary, use_container_width=True)
     
     # Scatter plot matrix
     st.header("🔍 RFM Relationship Analysis")
     
-    fig_scatter = px.scatter_matrix(
-        filtered_data,
-        dimensions=['Recency', 'Frequency', 'Monetary'],
-        color='Cluster',
-        title="RFM Scatter Plot Matrix",
-        color_discrete_sequence=px.colors.qualitative.Set3
-    )
-    fig_scatter.update_layout(height=600)
+    render_mode = st.radio("Rendering", ["Sampled points", "Density"], horizontal=True)
+    if render_mode == "Sampled points":
+        point_budget = st.slider("Point budget", min_value=1000, max_value=50000, value=DEFAULT_POINT_BUDGET,
+                                 step=1000)
+        fig_scatter = sampled_scatter_figure(tuple(sorted(selected_clusters)), point_budget)
+    else:
+        fig_scatter = density_matrix_figure(tuple(sorted(selected_clusters)))
     st.plotly_chart(fig_scatter, use_container_width=True)
     
     # Data table
     st.header("📋 Raw Data")
-    st.dataframe(filtered_data, use_container_width=True)
+    
+    sorted_rfm, cluster_ranges = load_sorted_data()
+    col1, col2 = st.columns(2)
+    with col1:
+        page_size = st.selectbox("Rows per page", [25, 50, 100, 500], index=1)
+    n_pages = max((selected_count - 1) // page_size + 1, 1)
+    with col2:
+        page = st.number_input(f"Page (of {n_pages:,})", min_value=1, max_value=n_pages, value=1)
+    
+    st.dataframe(page_rows(sorted_rfm, cluster_ranges, selected_clusters, page - 1, page_size),
+                 use_container_width=True)
 
 if __name__ == "__main__":
     main()
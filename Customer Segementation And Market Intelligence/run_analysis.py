@@ -2,69 +2,476 @@
 """
 Customer Segmentation Analysis Pipeline
 Main script to run the complete analysis workflow
+
+Stages are declared with their inputs and outputs and run as a DAG:
+- a stage is skipped when the content hash of its code and inputs matches
+  its last successful run and its outputs are unchanged
+- stages whose dependencies are done run concurrently (EDA and model
+  development both only need the preprocessed data)
+- script output is streamed live, prefixed with the stage name
+- --in-process runs the stages one after another in this interpreter
+  instead of one fresh interpreter each, so pandas, scikit-learn, scipy and
+  matplotlib are imported once per run rather than once per stage
+
+Every run writes a report to reports/<timestamp>/ (report.json and
+report.csv) with wall time, CPU time, peak RSS, rows in/out and throughput
+per stage and per instrumented step (see scripts/instrumentation.py);
+--profile also writes a cProfile dump per stage.
 """
 
+import argparse
+import ast
+import csv
+import glob
+import hashlib
+import json
+import gc
 import os
-import sys
+import runpy
 import subprocess
+import sys
+import threading
 import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field, replace
+from datetime import datetime
 
-def run_script(script_name, description):
-    """Run a Python script and handle errors"""
-    print(f"\n{'='*60}")
-    print(f"Running: {description}")
-    print(f"Script: {script_name}")
-    print(f"{'='*60}")
-    
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(PROJECT_DIR, 'scripts')
+DATA_DIR = '/Users/sumitkumarsingh/Downloads/Anomaly Detection in High-Dimensional Data/data'
+CACHE_PATH = os.path.join(PROJECT_DIR, '.pipeline_cache.json')
+REPORTS_DIR = os.path.join(PROJECT_DIR, 'reports')
+
+
+def data_file(name):
+    return os.path.join(DATA_DIR, name)
+
+
+def script_output(name):
+    return os.path.join(SCRIPTS_DIR, name)
+
+
+PREPROCESSED = [data_file('Online Retail Preprocessed.feather'), data_file('Online Retail Preprocessed.csv')]
+RFM_CLUSTERS = [data_file('Online Retail RFM Clusters.feather'), data_file('Online Retail RFM Clusters.csv')]
+RFM_CUBE = data_file('Online Retail RFM Cube.json')
+# Optional RFM sources model_development.py reads in place of the line items
+# (`data_preprocessing.py --invoices` / `--partitions N`, rfm_state.py)
+INVOICES = [data_file('Online Retail Invoices.feather'), data_file('Online Retail Invoices.csv')]
+CUSTOMER_TOTALS_MANIFEST = data_file('Online Retail Customer Totals.partitions.json')
+RFM_STATE = script_output('rfm_state.npz')
+
+
+@dataclass
+class Stage:
+    """
+    A pipeline step: a script in scripts/ with declared inputs, outputs and
+    dependencies. Outputs may be glob patterns (versioned artifacts).
+    """
+    name: str
+    script: str
+    description: str
+    inputs: list = field(default_factory=list)
+    outputs: list = field(default_factory=list)
+    deps: list = field(default_factory=list)
+    args: list = field(default_factory=list)
+
+
+STAGES = [
+    Stage('preprocess', 'data_preprocessing.py', 'Data Preprocessing and Feature Engineering',
+          inputs=[data_file('Online Retail.xlsx')],
+          outputs=PREPROCESSED,
+          args=['--output', data_file('Online Retail Preprocessed.csv')]),
+    Stage('eda', 'eda.py', 'Exploratory Data Analysis',
+          inputs=PREPROCESSED,
+          outputs=[script_output(name) for name in ('rfm_distribution.png', 'top_countries_sales.png',
+                                                    'top_products_quantity.png', 'monthly_sales_over_time.png')],
+          deps=['preprocess']),
+    Stage('model', 'model_development.py', 'Machine Learning Model Development',
+          inputs=PREPROCESSED + INVOICES + [CUSTOMER_TOTALS_MANIFEST, RFM_STATE],
+          outputs=RFM_CLUSTERS + [RFM_CUBE] + [script_output(name) for name in (
+              'elbow_method.png', 'silhouette_score.png', 'k_sweep_results.csv', 'rfm_clusters_pairplot.png',
+              'models/segmentation_model_v*.joblib')],
+          deps=['preprocess']),
+    Stage('insights', 'insights_generation.py', 'Business Insights Generation',
+          inputs=RFM_CLUSTERS,
+          outputs=[script_output('cluster_characteristics_boxplot.png')],
+          deps=['model']),
+]
+
+_print_lock = threading.Lock()
+
+
+def log(message):
+    with _print_lock:
+        print(message, flush=True)
+
+
+# --- Content hashing ---
+
+def file_hash(path, file_cache):
+    """sha256 of a file, memoized on (size, mtime) so unchanged files are not reread"""
+    stat = os.stat(path)
+    signature = [stat.st_size, stat.st_mtime_ns]
+    cached = file_cache.get(path)
+    if cached and cached['signature'] == signature:
+        return cached['sha256']
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    file_cache[path] = {'signature': signature, 'sha256': digest.hexdigest()}
+    return file_cache[path]['sha256']
+
+
+def code_files(script):
+    """The stage script plus every local scripts/ module it imports (recursively)"""
+    seen = set()
+    queue = [os.path.join(SCRIPTS_DIR, script)]
+    while queue:
+        path = queue.pop()
+        if path in seen:
+            continue
+        seen.add(path)
+        with open(path) as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                modules = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                modules = [node.module]
+            else:
+                continue
+            for module in modules:
+                local = os.path.join(SCRIPTS_DIR, module.split('.')[0] + '.py')
+                if os.path.exists(local):
+                    queue.append(local)
+    return sorted(seen)
+
+
+def stage_fingerprint(stage, file_cache):
+    """Hash of the stage's code, arguments and the contents of its existing inputs"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps(stage.args).encode())
+    for path in code_files(stage.script) + sorted(stage.inputs):
+        if os.path.exists(path):
+            digest.update(path.encode())
+            digest.update(file_hash(path, file_cache).encode())
+    return digest.hexdigest()
+
+
+def output_hashes(stage, file_cache):
+    paths = sorted({path for pattern in stage.outputs for path in glob.glob(pattern)})
+    return {path: file_hash(path, file_cache) for path in paths}
+
+
+def is_up_to_date(stage, fingerprint, cache):
+    record = cache['stages'].get(stage.name)
+    if not record or record['fingerprint'] != fingerprint or not record['outputs']:
+        return False
+    return all(os.path.exists(path) and file_hash(path, cache['files']) == sha
+               for path, sha in record['outputs'].items())
+
+
+def load_cache():
+    if os.path.exists(CACHE_PATH):
+        with open(CACHE_PATH) as f:
+            return json.load(f)
+    return {'stages': {}, 'files': {}}
+
+
+def save_cache(cache):
+    with open(CACHE_PATH, 'w') as f:
+        json.dump(cache, f, indent=2)
+
+
+# --- Execution ---
+
+def wait_with_usage(process):
+    """Wait for a child and return (returncode, cpu seconds, peak RSS in MB or None)"""
+    if not hasattr(os, 'wait4'):  # Windows: no per-child resource usage
+        return process.wait(), None, None
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    peak_rss_mb = usage.ru_maxrss / 1024 ** 2 if sys.platform == 'darwin' else usage.ru_maxrss / 1024
+    return process.returncode, usage.ru_utime + usage.ru_stime, peak_rss_mb
+
+
+def run_script(stage, run_dir, profile=False):
+    """Run a stage's script, streaming its output live; returns the stage's report record"""
+    log(f"\n{'='*60}\nRunning: {stage.description}\nScript: {stage.script}\n{'='*60}")
+
+    command = [sys.executable, stage.script] + stage.args
+    if profile:
+        command[1:1] = ['-m', 'cProfile', '-o', os.path.join(run_dir, f'{stage.name}.prof')]
+    env = dict(os.environ, PYTHONUNBUFFERED='1', MPLBACKEND='Agg',
+               PIPELINE_RUN_DIR=run_dir, PIPELINE_STAGE=stage.name)
+    record = {'kind': 'stage', 'stage': stage.name, 'status': 'failed'}
+    start = time.perf_counter()
     try:
-        result = subprocess.run([sys.executable, script_name], 
-                              capture_output=True, text=True, cwd='scripts')
-        
-        if result.returncode == 0:
-            print(f"✅ {description} completed successfully!")
-            if result.stdout:
-                print("Output:")
-                print(result.stdout)
-        else:
-            print(f"❌ Error in {description}")
-            print("Error output:")
-            print(result.stderr)
-            return False
-            
+        process = subprocess.Popen(command, cwd=SCRIPTS_DIR, env=env,
+                                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+        for line in process.stdout:
+            log(f"[{stage.name}] {line.rstrip()}")
+        returncode, cpu_time, peak_rss_mb = wait_with_usage(process)
     except Exception as e:
-        print(f"❌ Failed to run {script_name}: {str(e)}")
+        log(f"❌ Failed to run {stage.script}: {str(e)}")
+        return record
+
+    record.update(wall_time=time.perf_counter() - start, cpu_time=cpu_time, peak_rss_mb=peak_rss_mb)
+    if returncode == 0:
+        log(f"✅ {stage.description} completed successfully!")
+        record['status'] = 'ok'
+    else:
+        log(f"❌ Error in {stage.description} (exit code {returncode})")
+    return record
+
+
+class StageOutput:
+    """
+    sys.stdout/sys.stderr stand-in while a stage runs in-process: complete
+    lines written by the stage's thread are prefixed with the stage name,
+    writes from other threads (the scheduler's log) pass through unchanged.
+    """
+
+    def __init__(self, stage_name, console):
+        self.prefix = f"[{stage_name}] "
+        self.console = console
+        self.thread = threading.get_ident()
+        self.pending = ''
+
+    def write(self, text):
+        if threading.get_ident() != self.thread:
+            return self.console.write(text)
+        self.pending += text
+        *lines, self.pending = self.pending.split('\n')
+        if lines:
+            self.console.write(''.join(f"{self.prefix}{line.rstrip()}\n" for line in lines))
+            self.console.flush()
+        return len(text)
+
+    def flush(self):
+        if self.pending and threading.get_ident() == self.thread:
+            self.write('\n')
+        self.console.flush()
+
+    def isatty(self):
         return False
-    
-    return True
+
+
+def peak_rss_mb():
+    """Peak RSS of this process so far in MB (None if unavailable); in-process stages share it"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def children_cpu_time():
+    """CPU seconds of this process's terminated, waited-for children (worker pools)"""
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def drop_local_modules():
+    """
+    Forget the modules imported from scripts/, so the next in-process stage
+    imports them fresh (module state and code edits included) as a new
+    process would; third-party libraries stay imported.
+    """
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, '__file__', None)
+        if path and os.path.dirname(os.path.abspath(path)) == os.path.abspath(SCRIPTS_DIR):
+            del sys.modules[name]
+
+
+def run_in_process(stage, run_dir, profile=False):
+    """
+    Run a stage's script in this interpreter with runpy, as `python script args`
+    from scripts/ would; returns the stage's report record. Third-party
+    modules imported by earlier stages are reused, the scripts/ modules are
+    imported afresh (drop_local_modules). The working directory, sys.argv, the
+    environment and stdout are process-wide, so stages run one at a time.
+    """
+    log(f"\n{'='*60}\nRunning: {stage.description}\nScript: {stage.script} (in-process)\n{'='*60}")
+
+    record = {'kind': 'stage', 'stage': stage.name, 'status': 'failed'}
+    saved = os.getcwd(), list(sys.argv), dict(os.environ), sys.stdout, sys.stderr, list(sys.path)
+    os.environ.update(MPLBACKEND='Agg', PIPELINE_RUN_DIR=run_dir, PIPELINE_STAGE=stage.name)
+    sys.path.insert(0, SCRIPTS_DIR)
+    os.chdir(SCRIPTS_DIR)
+    sys.argv = [stage.script] + stage.args
+    sys.stdout = sys.stderr = output = StageOutput(stage.name, saved[3])
+
+    profiler = None
+    if profile:
+        import cProfile
+        profiler = cProfile.Profile()
+    start, cpu_start, children_start = time.perf_counter(), time.process_time(), children_cpu_time()
+    returncode = 0
+    try:
+        if profiler:
+            profiler.enable()
+        runpy.run_path(os.path.join(SCRIPTS_DIR, stage.script), run_name='__main__')
+    except SystemExit as e:
+        returncode = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        traceback.print_exc()
+        returncode = 1
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(run_dir, f'{stage.name}.prof'))
+        output.flush()
+        os.chdir(saved[0])
+        sys.argv = saved[1]
+        os.environ.clear()
+        os.environ.update(saved[2])
+        sys.stdout, sys.stderr = saved[3], saved[4]
+        sys.path[:] = saved[5]
+        drop_local_modules()
+        gc.collect()
+
+    record.update(wall_time=time.perf_counter() - start,
+                  cpu_time=time.process_time() - cpu_start + children_cpu_time() - children_start,
+                  peak_rss_mb=peak_rss_mb())
+    if returncode == 0:
+        log(f"✅ {stage.description} completed successfully!")
+        record['status'] = 'ok'
+    else:
+        log(f"❌ Error in {stage.description} (exit code {returncode})")
+    return record
+
+
+def write_report(run_dir, stage_records):
+    """Merge stage records with the step records the scripts wrote into report.json / report.csv"""
+    steps = []
+    for record in stage_records:
+        steps_path = os.path.join(run_dir, f"{record['stage']}.steps.jsonl")
+        if not os.path.exists(steps_path):
+            continue
+        with open(steps_path) as f:
+            for line in f:
+                step = json.loads(line)
+                if step['kind'] == 'stage_rows':
+                    record.update(rows_in=step['rows_in'], rows_out=step['rows_out'])
+                else:
+                    steps.append(step)
+    for record in stage_records:
+        rows = record.get('rows_in')
+        wall_time = record.get('wall_time')
+        record['rows_per_sec'] = rows / wall_time if rows is not None and wall_time else None
+
+    with open(os.path.join(run_dir, 'report.json'), 'w') as f:
+        json.dump({'stages': stage_records, 'steps': steps}, f, indent=2)
+
+    fields = ['kind', 'stage', 'step', 'status', 'wall_time', 'cpu_time', 'peak_rss_mb',
+              'rows_in', 'rows_out', 'rows_per_sec']
+    with open(os.path.join(run_dir, 'report.csv'), 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(stage_records + steps)
+
+
+def run_pipeline(stages, force=False, max_workers=None, profile=False, in_process=False):
+    """
+    Run stages in dependency order, concurrently where possible (one at a
+    time with in_process). Returns the failed stage names and the run report
+    directory.
+    """
+    run_dir = os.path.join(REPORTS_DIR, datetime.now().strftime('%Y%m%d-%H%M%S'))
+    os.makedirs(run_dir, exist_ok=True)
+    stage_records = []
+
+    cache = load_cache()
+    pending = {stage.name: stage for stage in stages}
+    done, failed = set(), set()
+    running = {}
+
+    runner = run_in_process if in_process else run_script
+    with ThreadPoolExecutor(max_workers=1 if in_process else max_workers) as pool:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if any(dep in failed for dep in stage.deps):
+                    log(f"⏭️  Skipping {stage.description}: a dependency failed")
+                    failed.add(pending.pop(name).name)
+                    stage_records.append({'kind': 'stage', 'stage': name, 'status': 'not run'})
+                elif all(dep in done for dep in stage.deps):
+                    del pending[name]
+                    fingerprint = stage_fingerprint(stage, cache['files'])
+                    if not force and is_up_to_date(stage, fingerprint, cache):
+                        log(f"⏭️  {stage.description} is up to date")
+                        done.add(name)
+                        stage_records.append({'kind': 'stage', 'stage': name, 'status': 'up to date'})
+                    else:
+                        running[pool.submit(runner, stage, run_dir, profile)] = stage
+
+            if not running:
+                if pending and not any(all(dep in done for dep in s.deps) for s in pending.values()):
+                    raise ValueError(f"Unresolvable stage dependencies: {sorted(pending)}")
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = running.pop(future)
+                record = future.result()
+                stage_records.append(record)
+                if record['status'] == 'ok':
+                    done.add(stage.name)
+                    # Rehashed after the run: a stage may write one of its own inputs
+                    # (model development bootstraps the RFM state it reads next time)
+                    cache['stages'][stage.name] = {'fingerprint': stage_fingerprint(stage, cache['files']),
+                                                   'outputs': output_hashes(stage, cache['files'])}
+                    save_cache(cache)
+                else:
+                    failed.add(stage.name)
+
+    write_report(run_dir, stage_records)
+    return failed, run_dir
+
 
 def main():
     """Main analysis pipeline"""
+    parser = argparse.ArgumentParser(description='Run the customer segmentation pipeline')
+    parser.add_argument('--force', action='store_true', help='Rerun every stage even if up to date')
+    parser.add_argument('--jobs', type=int, default=None, help='Maximum stages to run concurrently')
+    parser.add_argument('--profile', action='store_true', help='Write a cProfile dump per stage to the run report')
+    parser.add_argument('--in-process', action='store_true',
+                        help='Run stages sequentially in this interpreter instead of one subprocess each')
+    parser.add_argument('--rebuild-rfm-state', action='store_true',
+                        help='Rebuild scripts/rfm_state.npz from the preprocessed data, discarding folded batches')
+    args = parser.parse_args()
+
     print("🎯 Customer Segmentation and Market Intelligence Platform")
     print("Starting complete analysis pipeline...")
-    
+
     # Check if data directory exists
-    if not os.path.exists('/Users/sumitkumarsingh/Downloads/Anomaly Detection in High-Dimensional Data/data'):
+    if not os.path.exists(DATA_DIR):
         print("❌ Data directory not found. Please ensure data files are in the 'data' folder.")
         return
-    
-    # Analysis pipeline steps
-    steps = [
-        ("/Users/sumitkumarsingh/Downloads/Anomaly Detection in High-Dimensional Data/scripts/data_preprocessing.py", "Data Preprocessing and Feature Engineering"),
-        ("/Users/sumitkumarsingh/Downloads/Anomaly Detection in High-Dimensional Data/scripts/eda.py", "Exploratory Data Analysis"),
-        ("/Users/sumitkumarsingh/Downloads/Anomaly Detection in High-Dimensional Data/scripts/model_development.py", "Machine Learning Model Development"),
-        ("/Users/sumitkumarsingh/Downloads/Anomaly Detection in High-Dimensional Data/scripts/insights_generation.py", "Business Insights Generation")
-    ]
-    
-    # Run each step
-    for script, description in steps:
-        success = run_script(script, description)
-        if not success:
-            print(f"\n❌ Pipeline failed at: {description}")
-            print("Please check the error messages above and fix any issues.")
-            return
-        
-        time.sleep(1)  # Brief pause between steps
-    
+
+    stages = STAGES
+    if args.rebuild_rfm_state:
+        stages = [replace(stage, args=stage.args + ['--rebuild-rfm-state']) if stage.name == 'model' else stage
+                  for stage in STAGES]
+    failed, run_dir = run_pipeline(stages, force=args.force, max_workers=args.jobs, profile=args.profile,
+                                   in_process=args.in_process)
+    print(f"\n📋 Run report: {os.path.join(run_dir, 'report.json')}")
+    if failed:
+        print(f"\n❌ Pipeline failed at: {', '.join(sorted(failed))}")
+        print("Please check the error messages above and fix any issues.")
+        return
+
     print(f"\n{'='*60}")
     print("🎉 Analysis Pipeline Completed Successfully!")
     print(f"{'='*60}")
@@ -72,7 +479,7 @@ def main():
     print("📊 Visualizations: Check the 'visualizations' folder")
     print("📈 Data: Check the 'data' folder for processed datasets")
     print("📋 Results: Check the console output above for insights")
-    
+
     print(f"\n{'='*60}")
     print("🚀 Next Steps:")
     print("1. Review the generated visualizations")
@@ -81,6 +488,6 @@ def main():
     print("3. Explore customer segments and insights")
     print(f"{'='*60}")
 
+
 if __name__ == "__main__":
     main()
-
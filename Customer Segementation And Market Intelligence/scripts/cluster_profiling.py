@@ -0,0 +1,199 @@
+"""
+Per-cluster RFM profiling shared by insights_generation.py and the dashboard.
+
+profile_clusters() sorts each metric once by (cluster, value) and derives
+every per-cluster statistic from contiguous segments of that order: counts,
+means and standard deviations with np.add.reduceat, medians and quantiles by
+indexing into the sorted segments, and one-way ANOVA and Kruskal-Wallis
+tests from the same per-cluster sums and ranks. No per-cluster boolean
+masks are built. scipy is imported only when the tests or the persona
+matching run; the dashboard skips the tests (tests=False).
+
+Personas are assigned from the data, not from cluster IDs: each cluster's
+mean Recency/Frequency/Monetary is standardized against the whole customer
+base and matched to the closest persona template, so the labels survive
+refits that renumber clusters. The insights report and the dashboard tabs
+both read them from the profile.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from rfm import RFM_COLUMNS
+
+QUANTILES = (0.25, 0.5, 0.75)
+
+# Persona templates. "profile" is the template's typical cluster-mean
+# Recency/Frequency/Monetary in population standard deviations; clusters
+# are matched to templates by these profiles, never by cluster ID.
+PERSONAS = {
+    "VIP Customers": {
+        "profile": (-0.5, 2.0, 2.0),
+        "description": "Highly frequent and high-spending customers. These are your 'Whales' or 'VIPs'.",
+        "recommendations": [
+            "Provide dedicated account managers",
+            "Offer exclusive high-value products",
+            "Solicit feedback for product development",
+            "Ensure they feel valued with special treatment"
+        ]
+    },
+    "Loyal Customers": {
+        "profile": (-0.5, 0.5, 0.5),
+        "description": "Recent, frequent, and high-spending customers. They are likely your most valuable customers.",
+        "recommendations": [
+            "Implement loyalty programs",
+            "Offer exclusive previews of new products",
+            "Provide personalized recommendations",
+            "Ensure excellent customer service to retain them"
+        ]
+    },
+    "At-Risk Customers": {
+        "profile": (1.0, -0.5, -0.5),
+        "description": "Customers who purchased long ago, with low frequency and monetary value. They might be at risk of churning.",
+        "recommendations": [
+            "Send re-engagement campaigns",
+            "Offer special discounts to encourage repeat purchases",
+            "Conduct surveys to understand their needs",
+            "Implement win-back strategies"
+        ]
+    },
+    "New Customers": {
+        "profile": (-1.0, -0.5, -0.5),
+        "description": "Customers who bought recently but only a few times so far.",
+        "recommendations": [
+            "Send onboarding and welcome offers",
+            "Recommend products related to their first purchases",
+            "Encourage a second purchase with a time-limited incentive"
+        ]
+    },
+}
+
+DEFAULT_PERSONA = {
+    "name": "General Segment",
+    "description": "General customer segment. Further analysis might be needed to refine this segment.",
+    "recommendations": ["Standard marketing campaigns",
+                        "Focus on increasing frequency and monetary value through promotions"]
+}
+
+
+def assign_personas(cluster_means, population_means, population_stds, templates=PERSONAS):
+    """
+    Map cluster IDs to persona templates by their standardized RFM means.
+    Each template is used at most once (Hungarian matching on the squared
+    distance to the template profile); clusters beyond the number of
+    templates get DEFAULT_PERSONA. Returns {cluster_id: persona dict with name}.
+    """
+    from scipy.optimize import linear_sum_assignment
+
+    z = (np.asarray(cluster_means, dtype=np.float64) - population_means) / np.where(population_stds > 0, population_stds, 1)
+    names = list(templates)
+    targets = np.array([templates[name]["profile"] for name in names], dtype=np.float64)
+    cost = ((z[:, None, :] - targets[None, :, :]) ** 2).sum(axis=2)
+    rows, cols = linear_sum_assignment(cost)
+
+    clusters = list(cluster_means.index)
+    personas = {cluster_id: DEFAULT_PERSONA for cluster_id in clusters}
+    for row, col in zip(rows, cols):
+        template = templates[names[col]]
+        personas[clusters[row]] = {"name": names[col], "description": template["description"],
+                                   "recommendations": template["recommendations"]}
+    return personas
+
+
+@dataclass
+class ClusterProfile:
+    """
+    stats: one row per cluster; columns are Count plus (metric, statistic)
+           pairs for mean, std, min, quantiles (q25, median, q75) and max
+    tests: one row per metric with ANOVA F/p and Kruskal-Wallis H/p
+    personas: cluster ID -> persona (name, description, recommendations)
+    """
+    stats: pd.DataFrame
+    tests: pd.DataFrame
+    personas: dict
+
+    def metric(self, statistic):
+        """Cluster x metric frame of one statistic, e.g. profile.metric("median")"""
+        return self.stats.xs(statistic, axis=1, level=1)
+
+    def persona(self, cluster_id):
+        return self.personas.get(cluster_id, DEFAULT_PERSONA)
+
+
+def quantile_name(q):
+    return "median" if q == 0.5 else f"q{round(q * 100)}"
+
+
+def segment_quantiles(sorted_values, starts, counts, q):
+    """Linear-interpolated quantile of every sorted segment (numpy's default method)"""
+    position = (counts - 1) * q
+    low = np.floor(position).astype(np.int64)
+    high = np.ceil(position).astype(np.int64)
+    return sorted_values[starts + low] + (sorted_values[starts + high] - sorted_values[starts + low]) * (position - low)
+
+
+def group_tests(values, order, starts, counts, sums, means):
+    """One-way ANOVA and Kruskal-Wallis from per-cluster sums and pooled ranks"""
+    from scipy.stats import chi2, f, rankdata
+
+    n, k = len(values), len(counts)
+    if k < 2 or n <= k:
+        return np.nan, np.nan, np.nan, np.nan
+
+    grand_mean = sums.sum() / n
+    between = (counts * (means - grand_mean) ** 2).sum()
+    within = ((values[order] - np.repeat(means, counts)) ** 2).sum()
+    f_stat = (between / (k - 1)) / (within / (n - k)) if within > 0 else np.inf
+    f_p = f.sf(f_stat, k - 1, n - k)
+
+    ranks = rankdata(values)
+    rank_sums = np.add.reduceat(ranks[order], starts)
+    h_stat = 12.0 / (n * (n + 1)) * (rank_sums ** 2 / counts).sum() - 3 * (n + 1)
+    _, ties = np.unique(values, return_counts=True)
+    ties = ties.astype(np.float64)  # ties ** 3 overflows int64 beyond ~2M equal values
+    tie_correction = 1 - ((ties ** 3 - ties).sum() / (n ** 3 - n))
+    h_stat = h_stat / tie_correction if tie_correction > 0 else np.nan
+    h_p = chi2.sf(h_stat, k - 1)
+    return f_stat, f_p, h_stat, h_p
+
+
+def profile_clusters(rfm, columns=RFM_COLUMNS, quantiles=QUANTILES, cluster_column="Cluster", tests=True):
+    """Descriptive statistics and (if tests) significance tests of `columns` across clusters"""
+    labels = rfm[cluster_column].to_numpy()
+    clusters, counts = np.unique(labels, return_counts=True)
+    starts = np.cumsum(counts) - counts
+
+    stats = {("Count", ""): counts}
+    test_rows = []
+    population_means, population_stds = {}, {}
+    for column in columns:
+        values = rfm[column].to_numpy(dtype=np.float64)
+        population_means[column], population_stds[column] = values.mean(), values.std()
+        # Sorted by cluster, then by value: cluster segments are contiguous and sorted
+        order = np.lexsort((values, labels))
+        sorted_values = values[order]
+
+        sums = np.add.reduceat(sorted_values, starts)
+        means = sums / counts
+        squares = np.add.reduceat((sorted_values - np.repeat(means, counts)) ** 2, starts)
+        stats[(column, "mean")] = means
+        stats[(column, "std")] = np.sqrt(squares / np.maximum(counts - 1, 1))
+        stats[(column, "min")] = sorted_values[starts]
+        for q in quantiles:
+            stats[(column, quantile_name(q))] = segment_quantiles(sorted_values, starts, counts, q)
+        stats[(column, "max")] = sorted_values[starts + counts - 1]
+
+        f_stat, f_p, h_stat, h_p = group_tests(values, order, starts, counts, sums, means) if tests \
+            else (np.nan, np.nan, np.nan, np.nan)
+        test_rows.append({"Metric": column, "ANOVA_F": f_stat, "ANOVA_p": f_p,
+                          "Kruskal_H": h_stat, "Kruskal_p": h_p})
+
+    stats = pd.DataFrame(stats, index=pd.Index(clusters, name=cluster_column))
+    personas = {}
+    if set(RFM_COLUMNS) <= set(columns):
+        personas = assign_personas(stats.xs("mean", axis=1, level=1)[RFM_COLUMNS],
+                                   np.array([population_means[c] for c in RFM_COLUMNS]),
+                                   np.array([population_stds[c] for c in RFM_COLUMNS]))
+    return ClusterProfile(stats=stats, tests=pd.DataFrame(test_rows).set_index("Metric"), personas=personas)
@@ -0,0 +1,144 @@
+"""
+Pluggable clustering backends for the final segmentation.
+
+    kmeans     exact full-batch KMeans on an in-memory matrix
+    minibatch  MiniBatchKMeans fitted with partial_fit over streamed chunks,
+               so populations larger than RAM can be clustered and the model
+               can be refitted incrementally as new RFM states arrive
+
+Both expose fit / predict / fit_predict, cluster_centers_ and inertia_;
+prediction is done chunk by chunk and fit always starts from a fresh
+estimator. Backends with supports_partial_fit (minibatch) also take
+partial_fit / fit_stream, which continue from the current model.
+"""
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.cluster import KMeans, MiniBatchKMeans
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+
+def iter_chunks(X, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield consecutive row blocks of an array or DataFrame"""
+    for start in range(0, len(X), chunk_size):
+        yield X[start:start + chunk_size]
+
+
+class ClusteringBackend:
+    """Common interface over the sklearn estimators"""
+
+    # True when the backend also has partial_fit / fit_stream for incremental refits
+    supports_partial_fit = False
+
+    def __init__(self, model, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.model = model
+        self.chunk_size = chunk_size
+
+    @property
+    def n_clusters(self):
+        return self.model.n_clusters
+
+    @property
+    def cluster_centers_(self):
+        return self.model.cluster_centers_
+
+    @property
+    def inertia_(self):
+        return self.model.inertia_
+
+    def fit(self, X):
+        self.model.fit(np.asarray(X))
+        return self
+
+    def predict(self, X):
+        """Assign clusters in chunks so memory stays bounded for large inputs"""
+        if len(X) == 0:
+            return np.empty(0, dtype=np.int32)
+        return np.concatenate([self.model.predict(np.asarray(chunk)) for chunk in iter_chunks(X, self.chunk_size)])
+
+    def fit_predict(self, X):
+        return self.fit(X).predict(X)
+
+    def relabel(self, mapping):
+        """Renumber clusters in place: cluster j becomes mapping[j] for all later predictions"""
+        mapping = np.asarray(mapping)
+        order = np.argsort(mapping)
+        self.model.cluster_centers_ = self.model.cluster_centers_[order]
+        if hasattr(self.model, "labels_"):
+            self.model.labels_ = mapping[self.model.labels_]
+        # MiniBatchKMeans keeps per-center sample counts for later partial_fit calls
+        if hasattr(self.model, "_counts"):
+            self.model._counts = self.model._counts[order]
+        return self
+
+
+class ExactKMeansBackend(ClusteringBackend):
+    """Full-batch KMeans (the original behaviour)"""
+
+    def __init__(self, n_clusters, n_init=10, max_iter=300, random_state=42, chunk_size=DEFAULT_CHUNK_SIZE):
+        super().__init__(KMeans(n_clusters=n_clusters, max_iter=max_iter, random_state=random_state, n_init=n_init),
+                         chunk_size=chunk_size)
+
+    def fit_predict(self, X):
+        return self.model.fit_predict(np.asarray(X))
+
+    @classmethod
+    def from_model(cls, model, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Wrap an already fitted KMeans (e.g. from k_selection.warm_sweep_k) without refitting"""
+        backend = cls.__new__(cls)
+        ClusteringBackend.__init__(backend, model, chunk_size=chunk_size)
+        return backend
+
+
+class MiniBatchKMeansBackend(ClusteringBackend):
+    """MiniBatchKMeans fitted with partial_fit, one mini-batch of batch_size rows at a time"""
+
+    supports_partial_fit = True
+
+    def __init__(self, n_clusters, batch_size=4096, n_epochs=3, random_state=42, chunk_size=DEFAULT_CHUNK_SIZE):
+        super().__init__(MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_size, random_state=random_state),
+                         chunk_size=chunk_size)
+        self.n_epochs = n_epochs
+        self._inertia = None
+
+    @property
+    def inertia_(self):
+        return self._inertia
+
+    def partial_fit(self, chunk):
+        """Update the current model with one chunk"""
+        for batch in iter_chunks(np.asarray(chunk), self.model.batch_size):
+            self.model.partial_fit(batch)
+        return self
+
+    def fit_stream(self, chunks):
+        """Update the current model from an iterable of chunks (one pass per call)"""
+        for chunk in chunks:
+            self.partial_fit(chunk)
+        return self
+
+    def fit(self, X):
+        """Fit a fresh estimator, streaming X through partial_fit for n_epochs passes"""
+        self.model = clone(self.model)
+        for _ in range(self.n_epochs):
+            self.fit_stream(iter_chunks(X, self.chunk_size))
+        self._inertia = self.score_inertia(X)
+        return self
+
+    def score_inertia(self, X):
+        """Sum of squared distances to the closest centroid, computed chunk by chunk"""
+        return float(sum(-self.model.score(np.asarray(chunk)) for chunk in iter_chunks(X, self.chunk_size)))
+
+
+BACKENDS = {
+    "kmeans": ExactKMeansBackend,
+    "minibatch": MiniBatchKMeansBackend,
+}
+
+
+def make_backend(name, n_clusters, **kwargs):
+    """Create a clustering backend by name (see BACKENDS)"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown clustering backend {name!r}; choose from {sorted(BACKENDS)}")
+    return BACKENDS[name](n_clusters, **kwargs)
@@ -0,0 +1,178 @@
+"""
+Pre-aggregated per-cluster summary cube for the dashboard.
+
+The pipeline computes, once, per-cluster counts, sums, means and
+fixed-bin histogram counts of Recency/Frequency/Monetary. Histogram bin
+edges are shared by all clusters, so any selection of clusters is composed
+by adding per-cluster aggregates: O(clusters x bins) per dashboard
+interaction instead of a pass over every customer. The same holds for the
+2D histograms behind the density view of the RFM scatter matrix.
+
+Frequency and Monetary are long-tailed: linear bins put almost every
+customer in the first one. Their edges are spaced evenly in signed log1p
+(Monetary can be negative), and snapped to half-integers for integer
+columns so no bin falls between two whole values. The cube records these
+LOG_COLUMNS; bin_positions() gives the evenly spaced plotting coordinates.
+"""
+
+import json
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from features import signed_expm1, signed_log1p
+from rfm import RFM_COLUMNS
+
+DEFAULT_BINS = 30
+DEFAULT_POINT_BUDGET = 5000
+MIN_POINTS_PER_CLUSTER = 50
+RFM_PAIRS = list(combinations(RFM_COLUMNS, 2))
+LOG_COLUMNS = ["Frequency", "Monetary"]
+
+
+def pair_key(x, y):
+    return f"{x}|{y}"
+
+
+def bin_edges(values, bins, log=False):
+    """Histogram edges over the range of values, evenly spaced in signed log1p when log"""
+    low, high = float(values.min()), float(values.max())
+    high = high if high > low else low + 1
+    if not log:
+        return np.linspace(low, high, bins + 1)
+    edges = signed_expm1(np.linspace(*signed_log1p(np.array([low, high])), bins + 1))
+    if np.issubdtype(values.dtype, np.integer):
+        # Whole values sit inside bins; narrow low bins merge instead of staying empty
+        return np.unique(np.concatenate([[low - 0.5], np.floor(edges[1:-1]) + 0.5, [high + 0.5]]))
+    edges[0], edges[-1] = low, high
+    return edges
+
+
+def build_cube(rfm, bins=DEFAULT_BINS):
+    """Aggregate an RFM table with a Cluster column into a JSON-serializable cube"""
+    edges = {column: bin_edges(rfm[column], bins, log=column in LOG_COLUMNS).tolist() for column in RFM_COLUMNS}
+
+    clusters = {}
+    for cluster_id, group in rfm.groupby("Cluster", observed=True):
+        clusters[str(int(cluster_id))] = {
+            "count": int(len(group)),
+            "sum": {column: float(group[column].to_numpy(dtype=np.float64).sum()) for column in RFM_COLUMNS},
+            "hist": {column: np.histogram(group[column], bins=edges[column])[0].tolist()
+                     for column in RFM_COLUMNS},
+            "hist2d": {pair_key(x, y): np.histogram2d(group[x], group[y], bins=[edges[x], edges[y]])[0]
+                       .astype(np.int64).tolist() for x, y in RFM_PAIRS},
+        }
+    return {"bins": bins, "edges": edges, "log_columns": LOG_COLUMNS, "clusters": clusters}
+
+
+def save_cube(cube, path):
+    with open(path, "w") as f:
+        json.dump(cube, f)
+
+
+def load_cube(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def cluster_ids(cube):
+    return sorted(int(cluster_id) for cluster_id in cube["clusters"])
+
+
+def cluster_summary(cube, selected=None):
+    """Per-cluster Count and mean R/F/M for the selected clusters (all by default)"""
+    selected = cluster_ids(cube) if selected is None else sorted(selected)
+    rows = []
+    for cluster_id in selected:
+        stats = cube["clusters"][str(cluster_id)]
+        rows.append({"Cluster": cluster_id, "Count": stats["count"],
+                     **{column: stats["sum"][column] / stats["count"] for column in RFM_COLUMNS}})
+    return pd.DataFrame(rows, columns=["Cluster", "Count"] + RFM_COLUMNS).set_index("Cluster")
+
+
+def overall_summary(cube, selected=None):
+    """Total customers and mean R/F/M over the selected clusters combined"""
+    selected = cluster_ids(cube) if selected is None else selected
+    count = sum(cube["clusters"][str(c)]["count"] for c in selected)
+    means = {column: sum(cube["clusters"][str(c)]["sum"][column] for c in selected) / count if count else float("nan")
+             for column in RFM_COLUMNS}
+    return count, means
+
+
+def bin_positions(cube, column):
+    """Bin centers on the binning scale (signed log1p for log columns): evenly spaced plotting coordinates"""
+    edges = np.asarray(cube["edges"][column], dtype=np.float64)
+    if column in cube.get("log_columns", []):
+        signed_log1p(edges)
+    return (edges[:-1] + edges[1:]) / 2
+
+
+def bin_centers(cube, column):
+    """Bin centers in the column's units (cubes without log_columns have linear bins)"""
+    positions = bin_positions(cube, column)
+    return signed_expm1(positions) if column in cube.get("log_columns", []) else positions
+
+
+def histogram(cube, column, selected=None):
+    """Bin centers and a {cluster: counts} dict for one metric"""
+    selected = cluster_ids(cube) if selected is None else sorted(selected)
+    return bin_centers(cube, column), {c: np.asarray(cube["clusters"][str(c)]["hist"][column]) for c in selected}
+
+
+def density(cube, x, y, selected=None):
+    """Bin centers of x and y and the summed 2D counts (shape: y bins x x bins) over the selected clusters"""
+    selected = cluster_ids(cube) if selected is None else selected
+    if (x, y) not in RFM_PAIRS:
+        centers_y, centers_x, counts = density(cube, y, x, selected)
+        return centers_x, centers_y, counts.T
+    shape = (len(cube["edges"][x]) - 1, len(cube["edges"][y]) - 1)
+    counts = sum((np.asarray(cube["clusters"][str(c)]["hist2d"][pair_key(x, y)]) for c in selected),
+                 np.zeros(shape, dtype=np.int64))
+    return bin_centers(cube, x), bin_centers(cube, y), counts.T
+
+
+def sort_by_cluster(rfm):
+    """RFM rows grouped by cluster plus each cluster's [start, end) row range, for paging"""
+    rfm = rfm.sort_values("Cluster", kind="stable")
+    clusters, starts = np.unique(rfm["Cluster"].to_numpy(), return_index=True)
+    ends = np.append(starts[1:], len(rfm))
+    return rfm, {int(c): (int(s), int(e)) for c, s, e in zip(clusters, starts, ends)}
+
+
+def page_rows(sorted_rfm, ranges, selected, page, page_size):
+    """One page of rows from the selected clusters without filtering the whole table"""
+    start = page * page_size
+    remaining = page_size
+    parts = []
+    for cluster_id in sorted(selected):
+        lo, hi = ranges.get(cluster_id, (0, 0))
+        size = hi - lo
+        if start >= size:
+            start -= size
+            continue
+        take = min(size - start, remaining)
+        parts.append(sorted_rfm.iloc[lo + start:lo + start + take])
+        remaining -= take
+        start = 0
+        if remaining == 0:
+            break
+    return pd.concat(parts) if parts else sorted_rfm.iloc[0:0]
+
+
+def sample_points(sorted_rfm, ranges, selected, budget=DEFAULT_POINT_BUDGET, random_state=42):
+    """
+    Stratified sample of at most about `budget` rows from the selected clusters.
+    Each cluster keeps its share of the budget, with a floor so small clusters stay visible.
+    """
+    sizes = {c: ranges[c][1] - ranges[c][0] for c in sorted(selected) if c in ranges}
+    total = sum(sizes.values())
+    if total <= budget:
+        return pd.concat([sorted_rfm.iloc[slice(*ranges[c])] for c in sizes]) if sizes else sorted_rfm.iloc[0:0]
+
+    rng = np.random.default_rng(random_state)
+    positions = []
+    for cluster_id, size in sizes.items():
+        quota = min(max(round(size * budget / total), MIN_POINTS_PER_CLUSTER), size)
+        positions.append(ranges[cluster_id][0] + np.sort(rng.choice(size, quota, replace=False)))
+    return sorted_rfm.iloc[np.concatenate(positions)]
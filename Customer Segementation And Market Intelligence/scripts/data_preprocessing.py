@@ -1,44 +1,265 @@
+import argparse
+import itertools
+import os
+import tempfile
+
 import pandas as pd
+from joblib import Parallel, delayed
+
+from instrumentation import set_stage_rows, timed
+from invoices import aggregate_invoices, combine_invoices, invoices_path
+from partitions import customer_totals_path, read_shards, shard_chunks, shard_csv
+from rfm import customer_totals
+from storage import (ColumnarChunkWriter, has_columnar_support, partition_path, save_table, to_columnar_types,
+                     write_manifest)
+
+RAW_DATA_PATH = '/Users/sumitkumarsingh/Downloads/Anomaly Detection in High-Dimensional Data/data/Online Retail.xlsx'
+PREPROCESSED_PATH = 'Online Retail Preprocessed.csv'
+
+# Rows read up front to estimate the in-memory size of a row in streaming mode
+PROBE_ROWS = 5000
+# Working copies per chunk (raw rows, raw frame, cleaned frame) relative to the frame size
+CHUNK_MEMORY_OVERHEAD = 4
+
+
+def clean_transactions(data):
+    """Apply the preprocessing steps to a frame of raw transactions"""
+    # Drop rows where CustomerID is NaN, as it's crucial for customer segmentation
+    data = data.dropna(subset=['CustomerID'])
+
+    # Fill missing Description with 'Unknown'
+    data = data.assign(Description=data['Description'].fillna('Unknown'))
+
+    # Convert CustomerID to integer
+    data = data.assign(CustomerID=data['CustomerID'].astype(int))
+
+    # InvoiceNo as text: a CSV chunk without cancellations ("C536379") is parsed
+    # as integers, and 536365 and "536365" would count as different invoices
+    data = data.assign(InvoiceNo=data['InvoiceNo'].astype(str))
+
+    # Remove rows with negative Quantity (returns)
+    data = data[data['Quantity'] > 0]
+
+    # Calculate TotalPrice for each transaction
+    return data.assign(TotalPrice=data['Quantity'] * data['UnitPrice'])
+
+
+def preprocess_in_memory(input_path, output_path, keep_csv=False, invoices_output=None):
+    """Original whole-file preprocessing with diagnostic output"""
+    # Load the dataset
+    with timed('load_input') as step:
+        if input_path.endswith('.csv'):
+            data = pd.read_csv(input_path, parse_dates=['InvoiceDate'])
+        else:
+            data = pd.read_excel(input_path)
+        step.rows_out = len(data)
+    rows_in = len(data)
+
+    # Display basic information about the dataset
+    print('Dataset Info:')
+    data.info()
+
+    print('\nFirst 5 rows of the dataset:')
+    print(data.head())
+
+    print('\nMissing values before preprocessing:')
+    print(data.isnull().sum())
+
+    with timed('clean', rows_in=len(data)) as step:
+        data = clean_transactions(data)
+        step.rows_out = len(data)
+
+    print('\nMissing values after preprocessing:')
+    print(data.isnull().sum())
+
+    print('\nDataset Info after preprocessing:')
+    data.info()
+
+    print('\nFirst 5 rows after preprocessing:')
+    print(data.head())
+
+    # Save the preprocessed data (typed Feather when pyarrow is available, else CSV)
+    with timed('save_output', rows_in=len(data)):
+        saved_path = save_table(to_columnar_types(data), output_path, keep_csv=keep_csv)
+    print(f'\nPreprocessed data saved to {saved_path}')
+
+    # Invoice-level table for RFM and time-series consumers (see invoices.py)
+    if invoices_output:
+        with timed('invoices', rows_in=len(data)) as step:
+            invoices = aggregate_invoices(data)
+            invoices_saved = save_table(to_columnar_types(invoices), invoices_output, keep_csv=keep_csv)
+            step.rows_out = len(invoices)
+        print(f'{len(invoices):,} invoices saved to {invoices_saved}')
+    set_stage_rows(rows_in, len(data))
+
+
+def rows_per_chunk(probe, max_memory_mb):
+    """Number of rows per chunk that keeps a chunk's working set under max_memory_mb"""
+    bytes_per_row = max(probe.memory_usage(deep=True).sum() / max(len(probe), 1), 1)
+    return max(int(max_memory_mb * 1024 ** 2 / (bytes_per_row * CHUNK_MEMORY_OVERHEAD)), 1)
+
+
+def iter_excel_chunks(path, max_memory_mb):
+    """Yield DataFrame chunks from the first sheet of a workbook using openpyxl read-only mode"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        columns = list(next(rows))
+
+        chunk = pd.DataFrame(list(itertools.islice(rows, PROBE_ROWS)), columns=columns)
+        chunk_rows = rows_per_chunk(chunk, max_memory_mb)
+        while len(chunk):
+            yield chunk
+            chunk = pd.DataFrame(list(itertools.islice(rows, chunk_rows)), columns=columns)
+    finally:
+        workbook.close()
+
+
+def iter_csv_chunks(path, max_memory_mb):
+    """Yield DataFrame chunks from a raw transactions CSV"""
+    probe = pd.read_csv(path, nrows=PROBE_ROWS)
+    chunk_rows = rows_per_chunk(probe, max_memory_mb)
+    yield from pd.read_csv(path, chunksize=chunk_rows, parse_dates=['InvoiceDate'])
+
+
+def preprocess_streaming(input_path, output_path, max_memory_mb=256, keep_csv=False, invoices_output=None):
+    """
+    Clean the input in bounded chunks, appending each cleaned chunk to the output.
+    With invoices_output, per-chunk invoice totals are kept and merged at the
+    end (an invoice can span two chunks).
+    """
+    if input_path.endswith('.csv'):
+        chunks = iter_csv_chunks(input_path, max_memory_mb)
+    else:
+        chunks = iter_excel_chunks(input_path, max_memory_mb)
+
+    writer = ColumnarChunkWriter(output_path) if has_columnar_support() else None
+    write_csv = keep_csv or writer is None
+
+    rows_in = rows_out = 0
+    invoice_partials = []
+    try:
+        with timed('stream_preprocess') as step:
+            for i, chunk in enumerate(chunks):
+                cleaned = clean_transactions(chunk)
+                if writer is not None:
+                    writer.write(cleaned)
+                if write_csv:
+                    cleaned.to_csv(output_path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+                if invoices_output:
+                    invoice_partials.append(aggregate_invoices(cleaned))
+                rows_in += len(chunk)
+                rows_out += len(cleaned)
+                print(f'Chunk {i + 1}: {len(chunk):,} rows in, {len(cleaned):,} rows out')
+            step.rows_in, step.rows_out = rows_in, rows_out
+    finally:
+        if writer is not None:
+            writer.close()
+
+    saved_path = writer.path if writer is not None else output_path
+    print(f'\nPreprocessed {rows_in:,} rows into {rows_out:,} rows, saved to {saved_path}')
+
+    if invoices_output and invoice_partials:
+        with timed('invoices', rows_in=rows_out) as step:
+            invoices = combine_invoices(invoice_partials)
+            invoices_saved = save_table(to_columnar_types(invoices), invoices_output, keep_csv=keep_csv)
+            step.rows_out = len(invoices)
+        print(f'{len(invoices):,} invoices saved to {invoices_saved}')
+    set_stage_rows(rows_in, rows_out)
 
-# Load the dataset
-data = pd.read_excel('/Users/sumitkumarsingh/Downloads/Anomaly Detection in High-Dimensional Data/data/Online Retail.xlsx')
 
-# Display basic information about the dataset
-print('Dataset Info:')
-data.info()
+def preprocess_partition(index, shard_files, template, output_path, totals_output, invoices_output=None,
+                         keep_csv=False):
+    """Worker: clean one customer-hash partition and write its line items, customer totals and invoices"""
+    data = read_shards(shard_files, template)
+    cleaned = clean_transactions(data)
+    save_table(to_columnar_types(cleaned), partition_path(output_path, index), keep_csv=keep_csv)
 
-print('\nFirst 5 rows of the dataset:')
-print(data.head())
+    totals = customer_totals(cleaned)
+    save_table(totals, partition_path(totals_output, index), index=True, keep_csv=keep_csv)
+    if invoices_output:
+        save_table(to_columnar_types(aggregate_invoices(cleaned)), partition_path(invoices_output, index),
+                   keep_csv=keep_csv)
+    return {'rows_in': len(data), 'rows_out': len(cleaned), 'customers': len(totals),
+            'max_date': cleaned['InvoiceDate'].max() if len(cleaned) else None}
 
-print('\nMissing values before preprocessing:')
-print(data.isnull().sum())
 
-# Handle missing values
-# Drop rows where CustomerID is NaN, as it's crucial for customer segmentation
-data.dropna(subset=['CustomerID'], inplace=True)
+def preprocess_partitioned(input_path, output_path, n_partitions, n_jobs=-1, max_memory_mb=256, keep_csv=False,
+                           invoices_output=None):
+    """
+    Shard the input by a hash of CustomerID (see partitions.py), then clean
+    each partition and compute its per-customer totals in a worker process.
+    A CSV is parsed in parallel byte ranges of about max_memory_mb working
+    set each; a workbook is read sequentially. After the shard spill every
+    partition is handled by one worker with no exchange between partitions.
+    """
+    totals_output = customer_totals_path(output_path)
 
-# Fill missing Description with 'Unknown'
-data['Description'].fillna('Unknown', inplace=True)
+    # Shards are spilled next to the output so they stay on the same disk
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_path))) as shard_dir:
+        with timed('shard') as step:
+            if input_path.endswith('.csv'):
+                range_bytes = max_memory_mb * 1024 ** 2 / CHUNK_MEMORY_OVERHEAD
+                rows_in, shards, template = shard_csv(input_path, n_partitions, shard_dir, range_bytes, n_jobs)
+            else:
+                chunks = iter_excel_chunks(input_path, max_memory_mb)
+                rows_in, shards, template = shard_chunks(chunks, n_partitions, shard_dir)
+            step.rows_in = rows_in
 
-# Convert CustomerID to integer
-data['CustomerID'] = data['CustomerID'].astype(int)
+        with timed('clean_partitions', rows_in=rows_in) as step:
+            results = Parallel(n_jobs=n_jobs)(
+                delayed(preprocess_partition)(i, files, template, output_path, totals_output, invoices_output,
+                                              keep_csv)
+                for i, files in enumerate(shards)
+            )
+            rows_out = sum(result['rows_out'] for result in results)
+            step.rows_out = rows_out
 
-# Remove rows with negative Quantity (returns)
-data = data[data['Quantity'] > 0]
+    # Manifests go last: a partitioned output is only read once all its partitions exist
+    max_dates = [result['max_date'] for result in results if result['max_date'] is not None]
+    reference_date = max(max_dates) if max_dates else None
+    outputs = [output_path, totals_output] + ([invoices_output] if invoices_output else [])
+    for path in outputs:
+        write_manifest(path, n_partitions, partitioned_by='CustomerID', reference_date=reference_date,
+                       rows=[result['rows_out'] for result in results],
+                       customers=[result['customers'] for result in results])
 
-# Calculate TotalPrice for each transaction
-data['TotalPrice'] = data['Quantity'] * data['UnitPrice']
+    set_stage_rows(rows_in, rows_out)
+    for i, result in enumerate(results):
+        print(f"Partition {i}: {result['rows_in']:,} rows in, {result['rows_out']:,} rows out, "
+              f"{result['customers']:,} customers")
+    print(f'\nPreprocessed {rows_in:,} rows into {rows_out:,} rows in {n_partitions} partitions of {output_path}')
 
-print('\nMissing values after preprocessing:')
-print(data.isnull().sum())
 
-print('\nDataset Info after preprocessing:')
-data.info()
+def main():
+    parser = argparse.ArgumentParser(description='Clean the Online Retail transactions')
+    parser.add_argument('--input', default=RAW_DATA_PATH, help='Raw .xlsx workbook or .csv file')
+    parser.add_argument('--output', default=PREPROCESSED_PATH)
+    parser.add_argument('--streaming', action='store_true',
+                        help='Process the input in bounded chunks instead of loading it whole')
+    parser.add_argument('--max-memory-mb', type=float, default=256,
+                        help='Approximate memory ceiling per chunk in streaming mode')
+    parser.add_argument('--csv', action='store_true',
+                        help='Also write the CSV output when the Feather file is written')
+    parser.add_argument('--invoices', action='store_true',
+                        help='Also write the invoice-level table read by the RFM and time-series steps')
+    parser.add_argument('--partitions', type=int, default=0,
+                        help='Shard by CustomerID hash into this many partitions, cleaned in parallel workers')
+    parser.add_argument('--jobs', type=int, default=-1, help='Worker processes for --partitions (-1: all cores)')
+    args = parser.parse_args()
 
-print('\nFirst 5 rows after preprocessing:')
-print(data.head())
+    invoices_output = invoices_path(args.output) if args.invoices else None
+    if args.partitions > 0:
+        preprocess_partitioned(args.input, args.output, args.partitions, args.jobs, args.max_memory_mb,
+                               keep_csv=args.csv, invoices_output=invoices_output)
+    elif args.streaming:
+        preprocess_streaming(args.input, args.output, args.max_memory_mb, keep_csv=args.csv,
+                             invoices_output=invoices_output)
+    else:
+        preprocess_in_memory(args.input, args.output, keep_csv=args.csv, invoices_output=invoices_output)
 
-# Save the preprocessed data
-data.to_csv('Online Retail Preprocessed.csv', index=False)
-print('\nPreprocessed data saved to Online Retail Preprocessed')
 
+if __name__ == '__main__':
+    main()
@@ -1,29 +1,50 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-# Load the preprocessed data
-data = pd.read_csv("/Users/sumitkumarsingh/Downloads/Anomaly Detection in High-Dimensional Data/data/Online Retail Preprocessed.csv")
-
-# Convert InvoiceDate to datetime
-data["InvoiceDate"] = pd.to_datetime(data["InvoiceDate"])
+import os
+
+from eda_aggregates import INVOICE_EDA_COLUMNS, PRODUCT_EDA_COLUMNS, aggregate_table
+from instrumentation import set_stage_rows, timed
+from invoices import invoices_are_current, invoices_path
+from plotting import FigureRenderer, histogram_with_kde, render_bar, render_histograms, render_line
+from rfm import RFM_COLUMNS
+
+PREPROCESSED_PATH = "/Users/sumitkumarsingh/Downloads/Anomaly Detection in High-Dimensional Data/data/Online Retail Preprocessed.csv"
+# Written by `data_preprocessing.py --invoices`; RFM, country and monthly totals
+# are read from it when it is current, the line items only for product totals
+INVOICES_PATH = invoices_path(PREPROCESSED_PATH)
+
+# The preprocessed data is streamed in chunks of EDA_CHUNK_ROWS rows and split
+# into EDA_PARTITIONS partitions aggregated by parallel workers (Feather input);
+# only per-country/product/month totals and the per-customer RFM state are kept.
+EDA_CHUNK_ROWS = 1_000_000
+EDA_PARTITIONS = os.cpu_count() or 1
+EDA_JOBS = -1
+
+# --- Aggregate the transactions (single streaming pass) ---
+if invoices_are_current(INVOICES_PATH, PREPROCESSED_PATH):
+    with timed("aggregate_invoices") as step:
+        aggregates = aggregate_table(INVOICES_PATH, n_partitions=EDA_PARTITIONS, n_jobs=EDA_JOBS,
+                                     chunk_rows=EDA_CHUNK_ROWS, columns=INVOICE_EDA_COLUMNS)
+        step.rows_in = aggregates.rows
+    with timed("aggregate_products") as step:
+        products = aggregate_table(PREPROCESSED_PATH, n_partitions=EDA_PARTITIONS, n_jobs=EDA_JOBS,
+                                   chunk_rows=EDA_CHUNK_ROWS, columns=PRODUCT_EDA_COLUMNS)
+        step.rows_in = rows_in = products.rows
+    print(f"Aggregated {aggregates.rows:,} invoices and {rows_in:,} line items")
+    aggregates.merge(products)
+else:
+    with timed("aggregate") as step:
+        aggregates = aggregate_table(PREPROCESSED_PATH, n_partitions=EDA_PARTITIONS, n_jobs=EDA_JOBS,
+                                     chunk_rows=EDA_CHUNK_ROWS)
+        step.rows_in = rows_in = aggregates.rows
 
 # --- RFM Analysis ---
 # Calculate Recency, Frequency, Monetary (RFM) values
 # Recency: Days since last purchase
 # Frequency: Number of purchases
 # Monetary: Total spending
-
-# Get the most recent date in the dataset
-max_date = data["InvoiceDate"].max()
-
-rfm = data.groupby("CustomerID").agg({
-    "InvoiceDate": lambda date: (max_date - date.max()).days, # Recency
-    "InvoiceNo": lambda num: num.nunique(), # Frequency
-    "TotalPrice": lambda price: price.sum() # Monetary
-})
-
-rfm.columns = ["Recency", "Frequency", "Monetary"]
+# (relative to the most recent date in the dataset)
+with timed("rfm", rows_in=rows_in) as step:
+    rfm = aggregates.rfm()
+    step.rows_out = len(rfm)
 
 print("\nRFM Data Head:")
 print(rfm.head())
@@ -31,68 +52,49 @@ print(rfm.head())
 print("\nRFM Data Description:")
 print(rfm.describe())
 
-# --- Visualize RFM Distribution ---
-plt.figure(figsize=(15, 5))
-
-plt.subplot(1, 3, 1)
-sns.histplot(rfm["Recency"], bins=50, kde=True)
-plt.title("Recency Distribution")
-
-plt.subplot(1, 3, 2)
-sns.histplot(rfm["Frequency"], bins=50, kde=True)
-plt.title("Frequency Distribution")
-
-plt.subplot(1, 3, 3)
-sns.histplot(rfm["Monetary"], bins=50, kde=True)
-plt.title("Monetary Distribution")
-
-plt.tight_layout()
-plt.savefig("rfm_distribution.png")
+# Figures are rendered in worker processes at the end (see plotting.py);
+# unchanged figures are not redrawn
+figures = FigureRenderer()
 
-print("RFM distribution plots saved to rfm_distribution.png")
+# --- Visualize RFM Distribution ---
+# Histograms and KDEs are computed on binned data
+with timed("plot_rfm_distribution", rows_in=len(rfm)):
+    figures.submit("rfm_distribution.png", render_histograms,
+                   [(f"{column} Distribution", histogram_with_kde(rfm[column], bins=50)) for column in RFM_COLUMNS])
 
 # --- Explore Top Countries by Sales ---
-top_countries = data.groupby("Country")["TotalPrice"].sum().sort_values(ascending=False).head(10)
+with timed("top_countries"):
+    top_countries = aggregates.top_countries(10)
 print("\nTop 10 Countries by Total Sales:")
 print(top_countries)
 
-plt.figure(figsize=(10, 6))
-sns.barplot(x=top_countries.index, y=top_countries.values)
-plt.title("Top 10 Countries by Total Sales")
-plt.xlabel("Country")
-plt.ylabel("Total Sales")
-plt.xticks(rotation=45, ha="right")
-plt.tight_layout()
-plt.savefig("top_countries_sales.png")
-print("Top countries by sales plot saved to top_countries_sales.png")
+with timed("plot_top_countries"):
+    figures.submit("top_countries_sales.png", render_bar, top_countries.index.astype(str), top_countries.values,
+                   "Top 10 Countries by Total Sales", "Country", "Total Sales")
 
 # --- Explore Top Products by Quantity ---
-top_products = data.groupby("Description")["Quantity"].sum().sort_values(ascending=False).head(10)
+with timed("top_products"):
+    top_products = aggregates.top_products(10)
 print("\nTop 10 Products by Quantity:")
 print(top_products)
 
-plt.figure(figsize=(12, 6))
-sns.barplot(x=top_products.index, y=top_products.values)
-plt.title("Top 10 Products by Quantity")
-plt.xlabel("Product Description")
-plt.ylabel("Total Quantity Sold")
-plt.xticks(rotation=45, ha="right")
-plt.tight_layout()
-plt.savefig("top_products_quantity.png")
-print("Top products by quantity plot saved to top_products_quantity.png")
+with timed("plot_top_products"):
+    figures.submit("top_products_quantity.png", render_bar, top_products.index.astype(str), top_products.values,
+                   "Top 10 Products by Quantity", "Product Description", "Total Quantity Sold", figsize=(12, 6))
 
 # --- Explore Sales Over Time ---
-data["InvoiceMonth"] = data["InvoiceDate"].dt.to_period("M")
-monthly_sales = data.groupby("InvoiceMonth")["TotalPrice"].sum()
-
-plt.figure(figsize=(12, 6))
-monthly_sales.plot(kind="line")
-plt.title("Monthly Sales Over Time")
-plt.xlabel("Month")
-plt.ylabel("Total Sales")
-plt.grid(True)
-plt.tight_layout()
-plt.savefig("monthly_sales_over_time.png")
-print("Monthly sales over time plot saved to monthly_sales_over_time.png")
+with timed("monthly_sales"):
+    monthly_sales = aggregates.monthly()
 
+with timed("plot_monthly_sales"):
+    figures.submit("monthly_sales_over_time.png", render_line, monthly_sales.index.to_timestamp(),
+                   monthly_sales.values, "Monthly Sales Over Time", "Month", "Total Sales")
+
+with timed("render_figures"):
+    figures.close()
+print("RFM distribution plots saved to rfm_distribution.png")
+print("Top countries by sales plot saved to top_countries_sales.png")
+print("Top products by quantity plot saved to top_products_quantity.png")
+print("Monthly sales over time plot saved to monthly_sales_over_time.png")
 
+set_stage_rows(rows_in, len(rfm))
@@ -0,0 +1,126 @@
+"""
+Out-of-core EDA aggregations.
+
+Sales by country, quantity by product, sales by month and the RFM state
+(rfm_state.RFMState) are accumulated chunk by chunk as mergeable partial
+aggregates: every chunk only adds to per-key totals, and partials built
+from different partitions of the input are combined with merge(). Top-k
+rankings are taken from the merged totals with a heap, so the transaction
+history never has to fit in memory and partitions can be aggregated in
+parallel workers.
+
+Each chunk only feeds the aggregates its columns allow, so the per-customer
+and per-month totals can come from the invoice-level table (invoices.py)
+and only the product totals from a two-column pass over the line items.
+"""
+
+import heapq
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+
+from rfm_state import RFMState
+from storage import DEFAULT_CHUNK_ROWS, count_partitions, iter_table
+
+EDA_COLUMNS = ["InvoiceNo", "Description", "Quantity", "InvoiceDate", "CustomerID", "Country", "TotalPrice"]
+# Split of EDA_COLUMNS between the invoice table and the line items
+INVOICE_EDA_COLUMNS = ["InvoiceNo", "InvoiceDate", "CustomerID", "Country", "TotalPrice"]
+PRODUCT_EDA_COLUMNS = ["Description", "Quantity"]
+
+
+def add_totals(left, right):
+    """Sum two per-key total Series, keeping keys present in either"""
+    if left.empty:
+        return right
+    return left.add(right, fill_value=0)
+
+
+def top_k(totals, k=10):
+    """The k largest totals, largest first (heap selection over the distinct keys)"""
+    largest = heapq.nlargest(k, zip(totals.to_numpy(), range(len(totals))))
+    return totals.iloc[[position for _, position in largest]]
+
+
+class EDAAggregates:
+    """Mergeable partial aggregates for eda.py"""
+
+    def __init__(self):
+        self.rows = 0
+        self.max_date = None
+        self.country_sales = pd.Series(dtype=np.float64)
+        self.product_quantity = pd.Series(dtype=np.float64)
+        self.monthly_sales = pd.Series(dtype=np.float64)
+        self.rfm_state = RFMState()
+
+    def update(self, chunk):
+        """Fold one chunk of preprocessed transactions (or invoices) into the totals its columns allow"""
+        if len(chunk) == 0:
+            return self
+        self.rows += len(chunk)
+
+        if "Country" in chunk:
+            country = chunk.groupby("Country", observed=True)["TotalPrice"].sum()
+            self.country_sales = add_totals(self.country_sales,
+                                            country.set_axis(country.index.astype(str)).astype(np.float64))
+        if "Description" in chunk:
+            product = chunk.groupby("Description", observed=True)["Quantity"].sum()
+            self.product_quantity = add_totals(self.product_quantity,
+                                               product.set_axis(product.index.astype(str)).astype(np.float64))
+        if "InvoiceDate" in chunk:
+            chunk_max = chunk["InvoiceDate"].max()
+            self.max_date = chunk_max if self.max_date is None else max(self.max_date, chunk_max)
+            months = chunk["InvoiceDate"].to_numpy().astype("datetime64[M]")
+            monthly = chunk["TotalPrice"].groupby(months).sum()
+            self.monthly_sales = add_totals(self.monthly_sales, monthly.astype(np.float64))
+        if "CustomerID" in chunk:
+            self.rfm_state.update(chunk)
+        return self
+
+    def merge(self, other):
+        """Combine with the aggregates of another partition"""
+        self.rows += other.rows
+        if other.max_date is not None:
+            self.max_date = other.max_date if self.max_date is None else max(self.max_date, other.max_date)
+        self.country_sales = add_totals(self.country_sales, other.country_sales)
+        self.product_quantity = add_totals(self.product_quantity, other.product_quantity)
+        self.monthly_sales = add_totals(self.monthly_sales, other.monthly_sales)
+        self.rfm_state.merge(other.rfm_state)
+        return self
+
+    def top_countries(self, k=10):
+        return top_k(self.country_sales, k).rename_axis("Country").rename("TotalPrice")
+
+    def top_products(self, k=10):
+        return top_k(self.product_quantity, k).astype(np.int64).rename_axis("Description").rename("Quantity")
+
+    def monthly(self):
+        """Sales per month, indexed by monthly Period"""
+        monthly = self.monthly_sales.sort_index()
+        return monthly.set_axis(pd.DatetimeIndex(monthly.index).to_period("M").rename("InvoiceMonth")).rename("TotalPrice")
+
+    def rfm(self):
+        """RFM relative to the latest transaction seen"""
+        return self.rfm_state.to_rfm(reference_date=self.max_date)
+
+
+def aggregate_partition(csv_path, partition, chunk_rows=DEFAULT_CHUNK_ROWS, columns=EDA_COLUMNS):
+    """Aggregate one partition of a stage output chunk by chunk"""
+    aggregates = EDAAggregates()
+    for chunk in iter_table(csv_path, columns=columns, chunk_rows=chunk_rows, partition=partition):
+        aggregates.update(chunk)
+    return aggregates
+
+
+def aggregate_table(csv_path, n_partitions=1, n_jobs=1, chunk_rows=DEFAULT_CHUNK_ROWS, columns=EDA_COLUMNS):
+    """
+    Aggregate `columns` of a preprocessed transaction table in one streaming pass.
+    A Feather input is split into n_partitions ranges of record batches that
+    are aggregated by n_jobs joblib workers and merged; CSV is one stream.
+    """
+    n_partitions = count_partitions(csv_path, n_partitions)
+    parts = Parallel(n_jobs=n_jobs if n_partitions > 1 else 1)(
+        delayed(aggregate_partition)(csv_path, (i, n_partitions), chunk_rows, columns) for i in range(n_partitions)
+    )
+    return reduce(EDAAggregates.merge, parts)
@@ -0,0 +1,172 @@
+"""
+RFM feature pipeline for clustering: log1p, quantile capping and robust scaling.
+
+Recency, Frequency and Monetary are heavily right-skewed; fed raw into
+StandardScaler, a handful of extreme customers dominate the distances and
+KMeans needs many iterations and restarts. RFMTransformer applies, per
+column:
+
+    signed log1p   sign(x) * log1p(|x|) (Monetary can be negative)
+    capping        clip to the cap_quantiles of the (logged) values
+    robust scaling subtract the median, divide by the interquartile range
+
+All statistics are quantiles, estimated in one pass from fixed-grid
+histograms of the signed-log values (SKETCH_BINS bins over
+[-SKETCH_LIMIT, SKETCH_LIMIT], about 0.8% relative resolution). The
+histograms are mergeable, so the transformer can be fitted on streamed
+chunks (partial_fit) or on partitions fitted separately (merge). The fitted
+transformer is persisted as the model artifact's "scaler".
+"""
+
+import numpy as np
+import pandas as pd
+
+from rfm import RFM_COLUMNS
+
+SKETCH_BINS = 8192
+SKETCH_LIMIT = 32.0
+
+
+def signed_log1p(X):
+    """sign(x) * log1p(|x|), in place on a float array"""
+    negative = X < 0
+    np.abs(X, out=X)
+    np.log1p(X, out=X)
+    np.negative(X, out=X, where=negative)
+    return X
+
+
+def signed_expm1(X):
+    """Inverse of signed_log1p, in place on a float array"""
+    negative = X < 0
+    np.abs(X, out=X)
+    np.expm1(X, out=X)
+    np.negative(X, out=X, where=negative)
+    return X
+
+
+class RFMTransformer:
+    """log1p -> quantile capping -> robust scaling, fitted from mergeable histograms"""
+
+    def __init__(self, log=True, cap_quantiles=(0.01, 0.99), scaling="robust", columns=RFM_COLUMNS):
+        if scaling not in ("robust", None):
+            raise ValueError(f"Unknown scaling {scaling!r}; expected 'robust' or None")
+        self.log = log
+        self.cap_quantiles = cap_quantiles
+        self.scaling = scaling
+        self.columns = list(columns)
+        self.reset()
+
+    def reset(self):
+        n_columns = len(self.columns)
+        self.n_samples_ = 0
+        self.counts_ = np.zeros((n_columns, SKETCH_BINS), dtype=np.int64)
+        self.min_ = np.full(n_columns, np.inf)
+        self.max_ = np.full(n_columns, -np.inf)
+        return self
+
+    def _matrix(self, rfm):
+        """float32 copy of the feature columns"""
+        if isinstance(rfm, pd.DataFrame):
+            return rfm[self.columns].to_numpy(dtype=np.float32)
+        return np.array(rfm, dtype=np.float32)
+
+    def _sketch(self, logged):
+        """Add signed-log values to the histograms"""
+        width = 2 * SKETCH_LIMIT / SKETCH_BINS
+        for j in range(logged.shape[1]):
+            column = logged[:, j]
+            bins = np.clip(((column + SKETCH_LIMIT) / width).astype(np.int64), 0, SKETCH_BINS - 1)
+            self.counts_[j] += np.bincount(bins, minlength=SKETCH_BINS)
+        if len(logged):
+            self.min_ = np.minimum(self.min_, logged.min(axis=0))
+            self.max_ = np.maximum(self.max_, logged.max(axis=0))
+        self.n_samples_ += len(logged)
+
+    def partial_fit(self, rfm):
+        """Accumulate statistics from one chunk; call finalize() after the last chunk"""
+        self._sketch(signed_log1p(self._matrix(rfm)))
+        return self
+
+    def merge(self, other):
+        """Combine with statistics accumulated on another partition"""
+        self.counts_ += other.counts_
+        self.min_ = np.minimum(self.min_, other.min_)
+        self.max_ = np.maximum(self.max_, other.max_)
+        self.n_samples_ += other.n_samples_
+        return self
+
+    def quantiles(self, q):
+        """Per-column quantiles q (array-like) on the signed-log scale, interpolated within bins"""
+        q = np.atleast_1d(np.asarray(q, dtype=np.float64))
+        width = 2 * SKETCH_LIMIT / SKETCH_BINS
+        result = np.empty((len(self.columns), len(q)))
+        for j, counts in enumerate(self.counts_):
+            cumulative = np.cumsum(counts)
+            targets = q * cumulative[-1]
+            bins = np.minimum(np.searchsorted(cumulative, targets, side="left"), SKETCH_BINS - 1)
+            before = np.where(bins > 0, cumulative[bins - 1], 0)
+            fraction = (targets - before) / np.maximum(counts[bins], 1)
+            result[j] = np.clip(-SKETCH_LIMIT + (bins + fraction) * width, self.min_[j], self.max_[j])
+        return result
+
+    def finalize(self):
+        """Derive capping bounds and scaling from the accumulated statistics"""
+        if self.n_samples_ == 0:
+            raise ValueError("RFMTransformer has no data; call partial_fit first")
+        low, high = self.cap_quantiles if self.cap_quantiles else (0.0, 1.0)
+        stats = self.quantiles([low, high, 0.25, 0.5, 0.75])
+        if not self.log:
+            stats = signed_expm1(stats)
+        self.lower_, self.upper_ = stats[:, 0], stats[:, 1]
+        if self.scaling == "robust":
+            iqr = stats[:, 4] - stats[:, 2]
+            spread = self.upper_ - self.lower_
+            self.center_ = stats[:, 3]
+            self.scale_ = np.where(iqr > 0, iqr, np.where(spread > 0, spread, 1.0))
+        else:
+            self.center_ = np.zeros(len(self.columns))
+            self.scale_ = np.ones(len(self.columns))
+        return self
+
+    def fit(self, rfm):
+        return self.reset().partial_fit(rfm).finalize()
+
+    def fit_stream(self, chunks):
+        self.reset()
+        for chunk in chunks:
+            self.partial_fit(chunk)
+        return self.finalize()
+
+    def _apply(self, X):
+        """Capping and scaling in place on already logged (if log) values"""
+        np.clip(X, self.lower_.astype(X.dtype), self.upper_.astype(X.dtype), out=X)
+        X -= self.center_.astype(X.dtype)
+        X /= self.scale_.astype(X.dtype)
+        return X
+
+    def transform(self, rfm):
+        """float32 feature matrix; every step works in place on one copy"""
+        X = self._matrix(rfm)
+        if self.log:
+            signed_log1p(X)
+        return self._apply(X)
+
+    def fit_transform(self, rfm):
+        """
+        Fused path: the log transform is computed once and feeds both the
+        statistics and the output, which is then capped and scaled in place.
+        """
+        X = self._matrix(rfm)
+        self.reset()
+        if self.log:
+            self._sketch(signed_log1p(X))
+        else:
+            self._sketch(signed_log1p(X.copy()))
+        self.finalize()
+        return self._apply(X)
+
+    def inverse_transform(self, X):
+        """Back to original units (capping is not undone)"""
+        X = np.array(X, dtype=np.float64) * self.scale_ + self.center_
+        return signed_expm1(X) if self.log else X
@@ -1,79 +1,63 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+from cluster_profiling import profile_clusters
+from instrumentation import set_stage_rows, timed
+from plotting import FigureRenderer, box_stats, render_boxplots
+from rfm import RFM_COLUMNS, compact_rfm
+from storage import load_table
 
 # Load the RFM data with clusters
-rfm = pd.read_csv("/Users/sumitkumarsingh/Downloads/Anomaly Detection in High-Dimensional Data/data/Online Retail RFM Clusters.csv", index_col='CustomerID')
+with timed('load_data') as step:
+    rfm = compact_rfm(load_table("/Users/sumitkumarsingh/Downloads/Anomaly Detection in High-Dimensional Data/data/Online Retail RFM Clusters.csv", index_col='CustomerID'))
+    step.rows_out = len(rfm)
 # --- Analyze Cluster Characteristics ---
-cluster_means = rfm.groupby('Cluster').mean()
+# All per-cluster statistics and significance tests in one profiling pass
+with timed('cluster_profile', rows_in=len(rfm)):
+    profile = profile_clusters(rfm)
+
+cluster_means = profile.metric('mean')
 print("\nCluster Means (Original Scale):\n", cluster_means)
 
-cluster_medians = rfm.groupby('Cluster').median()
+cluster_medians = profile.metric('median')
 print("\nCluster Medians (Original Scale):\n", cluster_medians)
 
-cluster_sizes = rfm['Cluster'].value_counts().sort_index()
+cluster_sizes = profile.stats['Count']
 print("\nCluster Sizes:\n", cluster_sizes)
 
 # --- Generate Customer Persona Profiles ---
-def generate_persona(cluster_id, cluster_data):
-    print(f"\n--- Persona for Cluster {cluster_id} ---")
-    print(f"Number of customers: {len(cluster_data)}")
-    print(f"Average Recency: {cluster_data['Recency'].mean():.2f} days")
-    print(f"Average Frequency: {cluster_data['Frequency'].mean():.2f} purchases")
-    print(f"Average Monetary: ${cluster_data['Monetary'].mean():.2f}")
-    
-    if cluster_id == 0:
-        print("Description: This segment represents recent, frequent, and high-spending customers. They are likely your most valuable customers.")
-        print("Recommendations: Implement loyalty programs, offer exclusive previews of new products, personalized recommendations, and excellent customer service to retain them.")
-    elif cluster_id == 1:
-        print("Description: This segment consists of customers who purchased long ago, with low frequency and monetary value. They might be at risk of churning.")
-        print("Recommendations: Send re-engagement campaigns, special discounts to encourage repeat purchases, and surveys to understand their needs.")
-    elif cluster_id == 2:
-        print("Description: This segment includes highly frequent and high-spending customers, but their recency might vary. These are your 'Whales' or 'VIPs'.")
-        print("Recommendations: Provide dedicated account managers, exclusive high-value offers, and solicit feedback for product development. Ensure they feel valued.")
-    else:
-        print("Description: General customer segment. Further analysis might be needed to refine this segment.")
-        print("Recommendations: Standard marketing campaigns, focus on increasing frequency and monetary value through promotions.")
-
-for cluster_id in sorted(rfm['Cluster'].unique()):
-    cluster_data = rfm[rfm["Cluster"] == cluster_id]
-    generate_persona(cluster_id, cluster_data)
+def generate_persona(cluster_id, profile):
+    stats = profile.stats.loc[cluster_id]
+    persona = profile.persona(cluster_id)
+    print(f"\n--- Persona for Cluster {cluster_id}: {persona['name']} ---")
+    print(f"Number of customers: {int(stats[('Count', '')])}")
+    print(f"Average Recency: {stats[('Recency', 'mean')]:.2f} days (median {stats[('Recency', 'median')]:.0f})")
+    print(f"Average Frequency: {stats[('Frequency', 'mean')]:.2f} purchases (median {stats[('Frequency', 'median')]:.0f})")
+    print(f"Average Monetary: ${stats[('Monetary', 'mean')]:.2f} (median ${stats[('Monetary', 'median')]:.2f})")
+    print(f"Description: {persona['description']}")
+    print(f"Recommendations: {'; '.join(persona['recommendations'])}.")
+
+with timed('personas', rows_in=len(profile.stats)):
+    for cluster_id in profile.stats.index:
+        generate_persona(cluster_id, profile)
 
 # --- Visualize Cluster Characteristics (Box Plots) ---
-plt.figure(figsize=(18, 6))
-
-plt.subplot(1, 3, 1)
-sns.boxplot(x='Cluster', y='Recency', data=rfm)
-plt.title('Recency by Cluster')
-
-plt.subplot(1, 3, 2)
-sns.boxplot(x='Cluster', y='Frequency', data=rfm)
-plt.title('Frequency by Cluster')
-
-plt.subplot(1, 3, 3)
-sns.boxplot(x='Cluster', y='Monetary', data=rfm)
-plt.title('Monetary by Cluster')
-
-plt.tight_layout()
-plt.savefig('cluster_characteristics_boxplot.png')
+# Boxes are drawn from the profile's quartiles (no pass over the rows); whiskers
+# are clamped to 1.5 IQR or the data range and outliers are not drawn
+with timed('plot_boxplots', rows_in=len(rfm)):
+    with FigureRenderer() as figures:
+        figures.submit('cluster_characteristics_boxplot.png', render_boxplots,
+                       [(f'{metric} by Cluster', 'Cluster', metric, box_stats(profile, metric)) for metric in RFM_COLUMNS])
 print("\nCluster characteristics box plots saved to cluster_characteristics_boxplot.png")
 
-# --- Statistical Significance Testing (Example: ANOVA for Monetary value across clusters) ---
-from scipy.stats import f_oneway
-
-# Extract monetary values for each cluster
-monetary_by_cluster = [rfm[rfm['Cluster'] == i]["Monetary"] for i in sorted(rfm['Cluster'].unique())]
-
-# Perform ANOVA test
-f_statistic, p_value = f_oneway(*monetary_by_cluster)
-
-print(f"\nANOVA Test for Monetary Value Across Clusters:")
-print(f"F-statistic: {f_statistic:.2f}")
-print(f"P-value: {p_value:.4f}")
-
-if p_value < 0.05:
-    print("Conclusion: There is a statistically significant difference in Monetary value across the clusters.")
-else:
-    print("Conclusion: There is no statistically significant difference in Monetary value across the clusters.")
+# --- Statistical Significance Testing (ANOVA and Kruskal-Wallis for each RFM metric across clusters) ---
+print("\nSignificance Tests Across Clusters:")
+print(profile.tests.to_string(float_format=lambda value: f"{value:.4g}"))
 
+for metric, test in profile.tests.iterrows():
+    significant = (test['ANOVA_p'] < 0.05, test['Kruskal_p'] < 0.05)
+    if all(significant):
+        print(f"Conclusion: There is a statistically significant difference in {metric} value across the clusters.")
+    elif any(significant):
+        print(f"Conclusion: The difference in {metric} value across the clusters is significant under only one of the tests.")
+    else:
+        print(f"Conclusion: There is no statistically significant difference in {metric} value across the clusters.")
 
+set_stage_rows(len(rfm), len(rfm))
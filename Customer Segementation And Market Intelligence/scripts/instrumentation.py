@@ -0,0 +1,103 @@
+"""
+Step-level timing instrumentation for the pipeline scripts.
+
+Each instrumented step records wall time, CPU time, peak RSS, rows in/out
+and throughput. When run under run_analysis.py (PIPELINE_RUN_DIR set), the
+records are appended to <run dir>/<stage>.steps.jsonl and merged into the
+run report; otherwise they are only kept in STEPS. The run directory and
+stage name are read from the environment when a record is written, so
+stages that `run_analysis.py --in-process` runs one after another in the
+same interpreter each report under their own name.
+
+    with timed("rfm", rows_in=len(data)) as step:
+        rfm = compute_rfm(data)
+        step.rows_out = len(rfm)
+"""
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+STEPS = []
+
+
+def run_dir():
+    return os.environ.get("PIPELINE_RUN_DIR")
+
+
+def stage_name():
+    return os.environ.get("PIPELINE_STAGE") or os.path.splitext(os.path.basename(sys.argv[0]))[0]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None if unavailable)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+class StepRecord:
+    def __init__(self, name, rows_in=None, rows_out=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = rows_out
+        self.wall_time = None
+        self.cpu_time = None
+        self.peak_rss_mb = None
+
+    def to_dict(self):
+        rows = self.rows_in if self.rows_in is not None else self.rows_out
+        return {
+            "kind": "step",
+            "stage": stage_name(),
+            "step": self.name,
+            "wall_time": self.wall_time,
+            "cpu_time": self.cpu_time,
+            "peak_rss_mb": self.peak_rss_mb,
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "rows_per_sec": rows / self.wall_time if rows is not None and self.wall_time else None,
+        }
+
+
+def _emit(record):
+    STEPS.append(record)
+    if run_dir():
+        with open(os.path.join(run_dir(), f"{record['stage']}.steps.jsonl"), "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+@contextmanager
+def timed(name, rows_in=None, rows_out=None):
+    """Time the enclosed block as one step; set step.rows_out inside the block if known"""
+    step = StepRecord(name, rows_in, rows_out)
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield step
+    finally:
+        step.wall_time = time.perf_counter() - wall_start
+        step.cpu_time = time.process_time() - cpu_start
+        step.peak_rss_mb = peak_rss_mb()
+        _emit(step.to_dict())
+
+
+def record_step(name, wall_time, cpu_time=None, rows_in=None, rows_out=None):
+    """Record a step measured elsewhere (e.g. inside a worker process)"""
+    step = StepRecord(name, rows_in, rows_out)
+    step.wall_time = wall_time
+    step.cpu_time = cpu_time
+    _emit(step.to_dict())
+
+
+def set_stage_rows(rows_in=None, rows_out=None):
+    """Rows consumed and produced by the whole stage, for the run report"""
+    _emit({"kind": "stage_rows", "stage": stage_name(), "rows_in": rows_in, "rows_out": rows_out})
@@ -0,0 +1,57 @@
+"""
+Invoice-level pre-aggregation of the preprocessed line items.
+
+RFM and the time-series views only need one row per (CustomerID, InvoiceNo):
+the invoice date, its total and its number of line items. On the Online
+Retail data that table is about 20x smaller than the line items, so RFM
+consumers read it instead of rescanning every line and rehashing every
+invoice number. Its columns keep the line-item names where they mean the
+same thing (TotalPrice is the invoice total), so code that reads
+CustomerID/InvoiceNo/InvoiceDate/TotalPrice works on either table.
+
+data_preprocessing.py --invoices writes it next to the preprocessed data
+("Online Retail Invoices.csv" / ".feather").
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from storage import columnar_is_current, derived_path, read_manifest, table_mtime
+
+INVOICE_KEYS = ["CustomerID", "InvoiceNo"]
+INVOICE_COLUMNS = INVOICE_KEYS + ["InvoiceDate", "Country", "TotalPrice", "ItemCount"]
+INVOICE_AGGREGATIONS = {"InvoiceDate": "max", "Country": "first", "TotalPrice": "sum", "ItemCount": "sum"}
+
+
+def invoices_path(preprocessed_path):
+    """Invoice table that sits next to a preprocessed line-item table"""
+    return derived_path(preprocessed_path, "Invoices")
+
+
+def combine_invoices(partials):
+    """
+    Merge partial invoice tables (e.g. from chunks that split an invoice) into
+    one row per invoice, in InvoiceDate order.
+    """
+    invoices = pd.concat(partials, ignore_index=True) if isinstance(partials, (list, tuple)) else partials
+    invoices = invoices.groupby(INVOICE_KEYS, sort=False, observed=True).agg(INVOICE_AGGREGATIONS)
+    invoices = invoices.reset_index().sort_values("InvoiceDate", kind="stable", ignore_index=True)
+    return invoices.astype({"TotalPrice": np.float64, "ItemCount": np.int32})[INVOICE_COLUMNS]
+
+
+def aggregate_invoices(data):
+    """One row per (CustomerID, InvoiceNo) from cleaned line items"""
+    lines = data[INVOICE_KEYS + ["InvoiceDate", "Country", "TotalPrice"]].assign(ItemCount=1)
+    return combine_invoices(lines)
+
+
+def invoices_are_current(invoice_path, preprocessed_path):
+    """True when a readable invoice table exists and is at least as new as the line items it summarizes"""
+    readable = read_manifest(invoice_path) is not None or columnar_is_current(invoice_path) \
+        or os.path.exists(invoice_path)
+    if not readable:
+        return False
+    lines_mtime = table_mtime(preprocessed_path)
+    return lines_mtime is None or table_mtime(invoice_path) >= lines_mtime
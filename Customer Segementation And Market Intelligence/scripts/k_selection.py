@@ -0,0 +1,235 @@
+"""
+K sweeps for choosing the number of KMeans clusters.
+
+sweep_k fits and scores every K from scratch in its own joblib worker.
+warm_sweep_k walks K upwards sequentially: K+1 starts from the K solution
+with its worst cluster bisected (as in bisecting KMeans), so each step is a
+single short Lloyd run instead of n_init full ones, and the sweep stops once
+the elbow and silhouette criteria both plateau. It also returns the fitted
+models; the chosen K's model can be reused, though it had no restarts of
+its own. Both return a table with one
+row per K (inertia, the selected criteria, iterations, fit and scoring time).
+
+Scoring criteria (selected with `scoring`):
+    silhouette             exact silhouette, O(n^2)
+    sampled_silhouette     silhouette on repeated stratified samples, with a confidence interval
+    simplified_silhouette  centroid-based silhouette, O(n * K)
+    calinski_harabasz      Calinski-Harabasz index (higher is better)
+    davies_bouldin         Davies-Bouldin index (lower is better)
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from scipy import stats
+from sklearn.cluster import KMeans
+from sklearn.metrics import calinski_harabasz_score, davies_bouldin_score, silhouette_score
+
+SCORING_CRITERIA = [
+    "silhouette",
+    "sampled_silhouette",
+    "simplified_silhouette",
+    "calinski_harabasz",
+    "davies_bouldin",
+]
+# Rows per block of simplified_silhouette; a block's distances take
+# SILHOUETTE_CHUNK_SIZE x K x d floats instead of n x K x d
+SILHOUETTE_CHUNK_SIZE = 65_536
+
+
+def stratified_sample(labels, sample_size, rng, min_per_cluster=2):
+    """Indices of a sample that keeps each cluster's share of the population"""
+    labels = np.asarray(labels)
+    clusters, counts = np.unique(labels, return_counts=True)
+    quota = np.maximum(np.round(counts * sample_size / len(labels)), min_per_cluster)
+    quota = np.minimum(quota, counts).astype(np.int64)
+
+    # Random order within each cluster, then keep the first `quota` of every cluster
+    order = np.lexsort((rng.random(len(labels)), labels))
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    rank = np.arange(len(labels)) - starts
+    cluster_pos = np.searchsorted(clusters, labels[order])
+    return order[rank < quota[cluster_pos]]
+
+
+def sampled_silhouette(X, labels, sample_size=10000, n_repeats=5, confidence=0.95, random_state=42):
+    """
+    Mean silhouette over repeated stratified samples and its confidence interval.
+    Falls back to the exact score when the data fits in one sample.
+    """
+    X = np.asarray(X)
+    labels = np.asarray(labels)
+    if len(labels) <= sample_size:
+        score = silhouette_score(X, labels)
+        return score, score, score
+
+    rng = np.random.default_rng(random_state)
+    scores = []
+    for _ in range(n_repeats):
+        idx = stratified_sample(labels, sample_size, rng)
+        scores.append(silhouette_score(X[idx], labels[idx]))
+
+    mean = float(np.mean(scores))
+    half_width = stats.t.ppf((1 + confidence) / 2, n_repeats - 1) * stats.sem(scores) if n_repeats > 1 else 0.0
+    return mean, mean - half_width, mean + half_width
+
+
+def simplified_silhouette(X, labels, centers, chunk_size=SILHOUETTE_CHUNK_SIZE):
+    """Silhouette using distances to centroids instead of to every other point, chunk by chunk"""
+    X = np.asarray(X)
+    labels = np.asarray(labels)
+    total = 0.0
+    for start in range(0, len(X), chunk_size):
+        block, block_labels = X[start:start + chunk_size], labels[start:start + chunk_size]
+        rows = np.arange(len(block))
+        distances = np.sqrt(((block[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2))
+        own = distances[rows, block_labels]
+        distances[rows, block_labels] = np.inf
+        nearest_other = distances.min(axis=1)
+        denom = np.maximum(own, nearest_other)
+        total += np.where(denom > 0, (nearest_other - own) / np.where(denom > 0, denom, 1), 0.0).sum()
+    return float(total / len(X))
+
+
+def score_clustering(X, labels, centers, scoring, sample_size=10000, random_state=42):
+    """Compute the selected criteria for one fitted clustering"""
+    scores = {}
+    for criterion in scoring:
+        if criterion == "silhouette":
+            scores["Silhouette"] = silhouette_score(X, labels)
+        elif criterion == "sampled_silhouette":
+            mean, low, high = sampled_silhouette(X, labels, sample_size=sample_size, random_state=random_state)
+            scores.update({"Silhouette": mean, "SilhouetteLow": low, "SilhouetteHigh": high})
+        elif criterion == "simplified_silhouette":
+            scores["SimplifiedSilhouette"] = simplified_silhouette(X, labels, centers)
+        elif criterion == "calinski_harabasz":
+            scores["CalinskiHarabasz"] = calinski_harabasz_score(X, labels)
+        elif criterion == "davies_bouldin":
+            scores["DaviesBouldin"] = davies_bouldin_score(X, labels)
+        else:
+            raise ValueError(f"Unknown scoring criterion {criterion!r}; choose from {SCORING_CRITERIA}")
+    return scores
+
+
+def fit_and_score(X, n_clusters, n_init=10, max_iter=300, random_state=42,
+                  scoring=("silhouette",), sample_size=10000):
+    """Fit KMeans for one K and return its metrics"""
+    start = time.perf_counter()
+    kmeans = KMeans(n_clusters=n_clusters, max_iter=max_iter, random_state=random_state, n_init=n_init)
+    kmeans.fit(X)
+    fit_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scores = score_clustering(np.asarray(X), kmeans.labels_, kmeans.cluster_centers_, scoring,
+                              sample_size=sample_size, random_state=random_state)
+    score_time = time.perf_counter() - start
+
+    return {
+        "K": n_clusters,
+        "Inertia": kmeans.inertia_,
+        **scores,
+        "Iterations": kmeans.n_iter_,
+        "FitTime": fit_time,
+        "ScoreTime": score_time,
+    }
+
+
+def check_scoring(scoring):
+    unknown = [c for c in scoring if c not in SCORING_CRITERIA]
+    if unknown:
+        raise ValueError(f"Unknown scoring criteria {unknown}; choose from {SCORING_CRITERIA}")
+
+
+def sweep_k(X, k_range=range(2, 11), n_init=10, max_iter=300, random_state=42, n_jobs=-1,
+            scoring=("silhouette",), sample_size=10000):
+    """
+    Fit and score KMeans for every K in k_range in parallel.
+    n_jobs follows joblib conventions (-1 uses all cores).
+    """
+    check_scoring(scoring)
+
+    rows = Parallel(n_jobs=n_jobs)(
+        delayed(fit_and_score)(X, k, n_init=n_init, max_iter=max_iter, random_state=random_state,
+                               scoring=scoring, sample_size=sample_size)
+        for k in k_range
+    )
+    return pd.DataFrame(rows).set_index("K").sort_index()
+
+
+def split_worst_cluster(X, kmeans, n_init=3, random_state=42):
+    """
+    Initial centers for K+1 from a fitted K solution: the cluster with the
+    largest within-cluster sum of squares is bisected with 2-means and the
+    other centers are kept. None when that cluster cannot be split.
+    """
+    labels, centers = kmeans.labels_, kmeans.cluster_centers_
+    sse = np.bincount(labels, weights=((X - centers[labels]) ** 2).sum(axis=1), minlength=len(centers))
+    worst = int(np.argmax(sse))
+    members = X[labels == worst]
+    if len(members) < 2 or sse[worst] == 0:
+        return None
+    halves = KMeans(n_clusters=2, n_init=n_init, random_state=random_state).fit(members).cluster_centers_
+    return np.vstack([np.delete(centers, worst, axis=0), halves]).astype(X.dtype)
+
+
+def plateaued(previous, current, first_gain, elbow_tolerance, silhouette_tolerance, best_silhouette):
+    """
+    True when going from the previous K to the current one flattened the
+    elbow (an inertia gain below elbow_tolerance times the gain of the first
+    step) and, when silhouette is scored, did not beat the best silhouette so
+    far by more than silhouette_tolerance. Either criterion still improving
+    keeps the sweep going.
+    """
+    gain = previous["Inertia"] - current["Inertia"]
+    flat_elbow = first_gain is not None and gain < elbow_tolerance * first_gain
+    if "Silhouette" not in current:
+        return flat_elbow
+    return flat_elbow and current["Silhouette"] <= best_silhouette + silhouette_tolerance
+
+
+def warm_sweep_k(X, k_range=range(2, 11), n_init=10, max_iter=300, random_state=42,
+                 scoring=("silhouette",), sample_size=10000, patience=2, elbow_tolerance=0.25,
+                 silhouette_tolerance=0.0, min_k=None):
+    """
+    Warm-started sequential sweep. The first K is fitted from scratch with
+    n_init restarts; every later K is one Lloyd run from split_worst_cluster.
+    Stops after `patience` consecutive plateaued Ks (see plateaued), but not
+    before min_k. patience=0 sweeps all of k_range.
+    Returns (results table, {K: fitted KMeans}).
+    """
+    check_scoring(scoring)
+    X = np.asarray(X)
+    rows, models = [], {}
+    previous, flat, best_silhouette, first_gain = None, 0, -np.inf, None
+    for k in k_range:
+        start = time.perf_counter()
+        centers = split_worst_cluster(X, previous, random_state=random_state) if previous is not None else None
+        if centers is None:
+            kmeans = KMeans(n_clusters=k, max_iter=max_iter, random_state=random_state, n_init=n_init)
+        else:
+            kmeans = KMeans(n_clusters=k, init=centers, n_init=1, max_iter=max_iter, random_state=random_state)
+        kmeans.fit(X)
+        fit_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        scores = score_clustering(X, kmeans.labels_, kmeans.cluster_centers_, scoring,
+                                  sample_size=sample_size, random_state=random_state)
+        score_time = time.perf_counter() - start
+
+        row = {"K": k, "Inertia": kmeans.inertia_, **scores, "Iterations": kmeans.n_iter_,
+               "FitTime": fit_time, "ScoreTime": score_time, "Init": "scratch" if centers is None else "split"}
+        if rows and plateaued(rows[-1], row, first_gain, elbow_tolerance, silhouette_tolerance, best_silhouette):
+            flat += 1
+        else:
+            flat = 0
+        if len(rows) == 1:
+            first_gain = rows[0]["Inertia"] - row["Inertia"]
+        best_silhouette = max(best_silhouette, row.get("Silhouette", -np.inf))
+        rows.append(row)
+        models[k] = kmeans
+        previous = kmeans
+        if patience and flat >= patience and (min_k is None or k >= min_k):
+            break
+    return pd.DataFrame(rows).set_index("K"), models
@@ -1,91 +1,255 @@
-import pandas as pd
-from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
-from sklearn.metrics import silhouette_score
-import matplotlib.pyplot as plt
-import seaborn as sns
+import argparse
+import os
 
-# Load the preprocessed data
-data = pd.read_csv("/Users/sumitkumarsingh/Downloads/Anomaly Detection in High-Dimensional Data/data/Online Retail Preprocessed.csv")
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+from cluster_profiling import profile_clusters
+from clustering import ExactKMeansBackend, make_backend
+from dashboard_cube import build_cube, save_cube
+from features import RFMTransformer
+from instrumentation import record_step, set_stage_rows, timed
+from invoices import invoices_are_current, invoices_path
+from k_selection import stratified_sample, sweep_k, warm_sweep_k
+from partitions import customer_totals_path, load_partitioned_rfm, load_partitioned_state
+from plotting import FigureRenderer, render_line, render_pairplot
+from rfm import COMPACT_DTYPES, RFM_COLUMNS, compact_rfm, compute_rfm, memory_per_customer, scale_in_place
+from rfm_state import RFMState
+from segmentation_model import align_clusters, load_model, model_versions, save_model
+from storage import load_table, read_manifest, save_table, table_mtime
+
+PREPROCESSED_PATH = "/Users/sumitkumarsingh/Downloads/Anomaly Detection in High-Dimensional Data/data/Online Retail Preprocessed.csv"
+# Invoice-level table from `data_preprocessing.py --invoices` (see invoices.py);
+# RFM is computed from it instead of the line items when it is current
+INVOICES_PATH = invoices_path(PREPROCESSED_PATH)
+# Per-customer totals written per partition by `data_preprocessing.py --partitions N`
+# (see partitions.py); when current, RFM is read from them without touching the line items
+CUSTOMER_TOTALS_PATH = customer_totals_path(PREPROCESSED_PATH)
+
+# Incremental RFM state (see rfm_state.py); new batches are folded in with
+# `python rfm_state.py rfm_state.npz <batch.csv>` instead of rereading all history.
+# The state is only read while it is at least as new as the preprocessed data;
+# otherwise RFM is recomputed from the data and the state rebuilt from it.
+RFM_STATE_PATH = "rfm_state.npz"
+
+parser = argparse.ArgumentParser(description="Fit the RFM segmentation model")
+parser.add_argument("--rebuild-rfm-state", action="store_true",
+                    help=f"Rebuild {RFM_STATE_PATH} from the preprocessed data, discarding batches folded into it")
+args = parser.parse_args()
+
+
+def state_is_current():
+    """True when the saved state is at least as new as the preprocessed data"""
+    if not os.path.exists(RFM_STATE_PATH):
+        return False
+    sources = [table_mtime(path) for path in (PREPROCESSED_PATH, INVOICES_PATH, CUSTOMER_TOTALS_PATH)]
+    return all(os.path.getmtime(RFM_STATE_PATH) >= mtime for mtime in sources if mtime is not None)
+
+
+def partitioned_totals_are_current():
+    """True when partitioned customer totals exist and are at least as new as the preprocessed data"""
+    return read_manifest(CUSTOMER_TOTALS_PATH) is not None and \
+        table_mtime(CUSTOMER_TOTALS_PATH) >= (table_mtime(PREPROCESSED_PATH) or 0)
 
-# Convert InvoiceDate to datetime
-data["InvoiceDate"] = pd.to_datetime(data["InvoiceDate"])
 
 # --- RFM Analysis ---
 # Calculate Recency, Frequency, Monetary (RFM) values
-max_date = data["InvoiceDate"].max()
-
-rfm = data.groupby("CustomerID").agg({
-    "InvoiceDate": lambda date: (max_date - date.max()).days, # Recency
-    "InvoiceNo": lambda num: num.nunique(), # Frequency
-    "TotalPrice": lambda price: price.sum() # Monetary
-})
-
-rfm.columns = ["Recency", "Frequency", "Monetary"]
-
-# Handle outliers in RFM data (e.g., capping)
-# For now, let's focus on the core clustering, but this is a point for refinement.
-
-# Scale the RFM data
-scaler = StandardScaler()
-rfm_scaled = scaler.fit_transform(rfm)
-rfm_scaled_df = pd.DataFrame(rfm_scaled, columns=rfm.columns, index=rfm.index)
+use_state = state_is_current() and not args.rebuild_rfm_state
+if os.path.exists(RFM_STATE_PATH) and not use_state and not args.rebuild_rfm_state:
+    print(f"{RFM_STATE_PATH} is older than the preprocessed data: RFM is recomputed from the data "
+          "and the state rebuilt (batches folded into it that are not in the data are discarded).")
+
+if use_state:
+    with timed("load_rfm_state") as step:
+        rfm = RFMState.load(RFM_STATE_PATH).to_rfm()
+        step.rows_out = len(rfm)
+    rows_in = len(rfm)
+elif partitioned_totals_are_current():
+    # Customers never span partitions: the partitions' totals are concatenated as they are
+    with timed("load_partitioned_rfm") as step:
+        rfm = load_partitioned_rfm(CUSTOMER_TOTALS_PATH)
+        step.rows_out = len(rfm)
+    rows_in = len(rfm)
+
+    with timed("build_rfm_state", rows_in=rows_in):
+        load_partitioned_state(PREPROCESSED_PATH).save(RFM_STATE_PATH)
+else:
+    # Load only the columns RFM needs (InvoiceDate is parsed by the loader),
+    # one row per invoice when the invoice table is current
+    use_invoices = invoices_are_current(INVOICES_PATH, PREPROCESSED_PATH)
+    with timed("load_invoices" if use_invoices else "load_data") as step:
+        data = load_table(INVOICES_PATH if use_invoices else PREPROCESSED_PATH,
+                          columns=["InvoiceNo", "InvoiceDate", "CustomerID", "TotalPrice"])
+        step.rows_out = len(data)
+    rows_in = len(data)
+
+    max_date = data["InvoiceDate"].max()
+
+    with timed("rfm", rows_in=len(data)) as step:
+        rfm = compute_rfm(data, reference_date=max_date, invoices=use_invoices)
+        step.rows_out = len(rfm)
+
+    # Bootstrap the incremental state from the full history
+    with timed("build_rfm_state", rows_in=len(data)):
+        RFMState.from_transactions(data).save(RFM_STATE_PATH)
+
+# Compact layout (uint16/uint32/float32 columns, uint8 Cluster, sorted integer index)
+with timed("compact_rfm", rows_in=len(rfm)) as step:
+    rfm = compact_rfm(rfm)
+    step.rows_out = len(rfm)
+print(f"RFM table: {len(rfm):,} customers, {memory_per_customer(rfm):.1f} bytes per customer")
+
+# Scaling: StandardScaler on raw RFM by default. Set FEATURE_PIPELINE to a
+# features.RFMTransformer configuration to opt into its log1p / capping / robust
+# scaling, e.g. {"log": True, "cap_quantiles": (0.01, 0.99), "scaling": "robust"};
+# the fitted transformer is persisted with the model as its scaler.
+FEATURE_PIPELINE = None
+
+with timed("scale", rows_in=len(rfm)):
+    if FEATURE_PIPELINE is not None:
+        scaler = RFMTransformer(**FEATURE_PIPELINE)
+        rfm_scaled = scaler.fit_transform(rfm)
+    else:
+        scaler = StandardScaler()
+        rfm_scaled = scale_in_place(rfm, scaler, fit=True)
 
 # --- Determine Optimal Number of Clusters (Elbow Method and Silhouette Score) ---
-ssd = [] # Sum of squared distances
-silhouette_scores = []
-range_n_clusters = range(2, 11) # Test 2 to 10 clusters
-
-for num_clusters in range_n_clusters:
-    kmeans = KMeans(n_clusters=num_clusters, max_iter=300, random_state=42, n_init=10)
-    kmeans.fit(rfm_scaled_df)
-    ssd.append(kmeans.inertia_)
-    
-    cluster_labels = kmeans.labels_
-    silhouette_avg = silhouette_score(rfm_scaled_df, cluster_labels)
-    silhouette_scores.append(silhouette_avg)
+# For demonstration, K=3 is used for the final segmentation (a common choice for RFM)
+optimal_k = 3
+
+# K selection mode (see k_selection.py):
+#   "warm"     sequential sweep; K+1 is warm-started from K by bisecting its worst
+#              cluster, the sweep stops after K_PATIENCE Ks in which neither the elbow
+#              nor the silhouette improved (never before optimal_k)
+#   "parallel" every K fitted from scratch with N_INIT restarts, one K per worker
+#              (N_JOBS=-1 uses all cores), and the chosen K refitted
+K_SELECTION = "warm"
+K_RANGE = range(2, 11) # Test 2 to 10 clusters
+K_PATIENCE = 2
+N_INIT = 10
+N_JOBS = -1
+# Criteria computed per K (see k_selection.SCORING_CRITERIA). Silhouette is
+# O(n^2), so it is estimated on stratified samples of SILHOUETTE_SAMPLE_SIZE
+# customers (exact when the customer base is smaller than that).
+SCORING = ["sampled_silhouette", "calinski_harabasz", "davies_bouldin"]
+SILHOUETTE_SAMPLE_SIZE = 10000
+
+with timed("k_sweep", rows_in=len(rfm_scaled)):
+    if K_SELECTION == "warm":
+        k_results, k_models = warm_sweep_k(rfm_scaled, k_range=K_RANGE, n_init=N_INIT, scoring=SCORING,
+                                           sample_size=SILHOUETTE_SAMPLE_SIZE, patience=K_PATIENCE,
+                                           min_k=optimal_k)
+    else:
+        k_results = sweep_k(rfm_scaled, k_range=K_RANGE, n_init=N_INIT, n_jobs=N_JOBS,
+                            scoring=SCORING, sample_size=SILHOUETTE_SAMPLE_SIZE)
+        k_models = {}
+# Per-K fit and scoring times are measured inside the sweep workers
+for k, row in k_results.iterrows():
+    record_step(f"fit_k{k}", row["FitTime"], rows_in=len(rfm_scaled))
+    record_step(f"score_k{k}", row["ScoreTime"], rows_in=len(rfm_scaled))
+k_results.to_csv("k_sweep_results.csv")
+print("\nK Sweep Results:")
+print(k_results.to_string())
+
+range_n_clusters = k_results.index
+ssd = k_results["Inertia"] # Sum of squared distances
+silhouette_scores = k_results["Silhouette"]
+
+# Figures are rendered in worker processes (see plotting.py); unchanged figures are not redrawn
+figures = FigureRenderer()
 
 # Plot Elbow Method
-plt.figure(figsize=(10, 5))
-plt.plot(range_n_clusters, ssd, marker='o')
-plt.title("Elbow Method for Optimal K")
-plt.xlabel("Number of Clusters (K)")
-plt.ylabel("Sum of Squared Distances")
-plt.grid(True)
-plt.savefig("elbow_method.png")
+with timed("plot_elbow"):
+    figures.submit("elbow_method.png", render_line, list(range_n_clusters), ssd.to_numpy(),
+                   "Elbow Method for Optimal K", "Number of Clusters (K)", "Sum of Squared Distances",
+                   marker='o', figsize=(10, 5))
 
 # Plot Silhouette Scores
-plt.figure(figsize=(10, 5))
-plt.plot(range_n_clusters, silhouette_scores, marker='o')
-plt.title("Silhouette Score for Optimal K")
-plt.xlabel("Number of Clusters (K)")
-plt.ylabel("Silhouette Score")
-plt.grid(True)
-plt.savefig("silhouette_score.png")
+with timed("plot_silhouette"):
+    band = (k_results["SilhouetteLow"].to_numpy(), k_results["SilhouetteHigh"].to_numpy()) \
+        if "SilhouetteLow" in k_results else None
+    figures.submit("silhouette_score.png", render_line, list(range_n_clusters), silhouette_scores.to_numpy(),
+                   "Silhouette Score for Optimal K", "Number of Clusters (K)", "Silhouette Score",
+                   band=band, marker='o', figsize=(10, 5))
 
-print("Elbow method plot saved to elbow_method.png")
-print("Silhouette score plot saved to silhouette_score.png")
+print("K sweep results saved to k_sweep_results.csv")
 
 # --- K-Means Clustering with chosen K (e.g., K=3 or K=4 based on typical elbow/silhouette analysis) ---
-# For demonstration, let's choose K=3 (a common choice for RFM segmentation)
-optimal_k = 3 
-kmeans = KMeans(n_clusters=optimal_k, max_iter=300, random_state=42, n_init=10)
-rfm_scaled_df["Cluster"] = kmeans.fit_predict(rfm_scaled_df)
-
-# Add cluster labels back to the original RFM dataframe
-rfm["Cluster"] = rfm_scaled_df["Cluster"]
-
-print(f"\nK-Means Clustering with K={optimal_k} completed.")
+# Clustering backend (see clustering.BACKENDS): "kmeans" for exact full-batch
+# KMeans, "minibatch" for MiniBatchKMeans fitted over streamed chunks
+CLUSTER_BACKEND = "kmeans"
+CLUSTER_BACKEND_OPTIONS = {
+    "kmeans": {"n_init": N_INIT, "max_iter": 300},
+    "minibatch": {"batch_size": 4096, "n_epochs": 3},
+}
+
+# The chosen K is refitted with N_INIT restarts. REUSE_SWEEP_MODEL = True keeps the
+# warm sweep's model for optimal_k instead (a single warm-started run, no restarts).
+REUSE_SWEEP_MODEL = False
+
+if REUSE_SWEEP_MODEL and CLUSTER_BACKEND == "kmeans" and optimal_k in k_models:
+    kmeans = ExactKMeansBackend.from_model(k_models[optimal_k])
+    labels = kmeans.model.labels_
+    print(f"Reusing the K={optimal_k} model from the K sweep")
+else:
+    with timed("final_fit", rows_in=len(rfm_scaled)):
+        kmeans = make_backend(CLUSTER_BACKEND, optimal_k, random_state=42, **CLUSTER_BACKEND_OPTIONS[CLUSTER_BACKEND])
+        labels = kmeans.fit_predict(rfm_scaled)
+
+# Keep cluster IDs stable across refits: renumber to match the previous model's centroids
+if model_versions():
+    with timed("align_clusters"):
+        mapping = align_clusters(scaler, kmeans, load_model())
+    if mapping is not None:
+        kmeans.relabel(mapping)
+        labels = mapping[labels]
+        print(f"Cluster IDs aligned to the previous model (new -> stable: {mapping.tolist()})")
+    else:
+        print("Previous model has a different K or feature set; cluster IDs not aligned")
+
+# Cluster labels go straight onto the compact RFM table
+rfm["Cluster"] = labels.astype(COMPACT_DTYPES["Cluster"])
+
+# Personas are matched to clusters by their RFM profile, not by cluster ID
+with timed("profile_clusters", rows_in=len(rfm)):
+    profile = profile_clusters(rfm)
+personas = {int(cluster_id): persona["name"] for cluster_id, persona in profile.personas.items()}
+print(f"Personas: {personas}")
+
+# Persist scaler + model as a new versioned artifact for batch scoring (segmentation_model.py)
+model_path = save_model(scaler, kmeans, features=RFM_COLUMNS,
+                        metadata={"backend": CLUSTER_BACKEND, "k_selection": K_SELECTION,
+                                  "k_sweep": k_results.to_dict(orient="index"),
+                                  "personas": personas, "feature_pipeline": FEATURE_PIPELINE})
+print(f"Segmentation model saved to {model_path}")
+
+print(f"\nK-Means Clustering ({CLUSTER_BACKEND} backend) with K={optimal_k} completed.")
 print("\nCluster Sizes:")
 print(rfm["Cluster"].value_counts())
 
 print("\nCluster Means (Original Scale):")
 print(rfm.groupby("Cluster").mean())
 
-# Visualize clusters (e.g., pairplot of RFM with hue=Cluster)
-sns.pairplot(rfm, vars=["Recency", "Frequency", "Monetary"], hue="Cluster", palette="viridis")
-plt.suptitle(f"RFM Clusters (K={optimal_k})", y=1.02) # Adjust suptitle position
-plt.savefig("rfm_clusters_pairplot.png")
+# Save RFM with clusters for insights_generation.py and the dashboard
+save_table(rfm, "/Users/sumitkumarsingh/Downloads/Anomaly Detection in High-Dimensional Data/data/Online Retail RFM Clusters.csv", index=True, keep_csv=True)
+print("RFM data with clusters saved to Online Retail RFM Clusters")
+
+# Pre-aggregate per-cluster stats and histograms once for the dashboard
+with timed("dashboard_cube", rows_in=len(rfm)):
+    save_cube(build_cube(rfm), "/Users/sumitkumarsingh/Downloads/Anomaly Detection in High-Dimensional Data/data/Online Retail RFM Cube.json")
+print("Dashboard summary cube saved to Online Retail RFM Cube.json")
+
+# Visualize clusters (e.g., pairplot of RFM with hue=Cluster) on a stratified sample
+PAIRPLOT_SAMPLE_SIZE = 5000
+with timed("plot_pairplot", rows_in=len(rfm)):
+    sample = rfm.iloc[np.sort(stratified_sample(rfm["Cluster"].to_numpy(), PAIRPLOT_SAMPLE_SIZE,
+                                                np.random.default_rng(42)))]
+    figures.submit("rfm_clusters_pairplot.png", render_pairplot, sample, RFM_COLUMNS, "Cluster",
+                   f"RFM Clusters (K={optimal_k})")
+
+with timed("render_figures"):
+    figures.close()
+print("Elbow method plot saved to elbow_method.png")
+print("Silhouette score plot saved to silhouette_score.png")
 print("RFM clusters pairplot saved to rfm_clusters_pairplot.png")
 
-
+set_stage_rows(rows_in, len(rfm))
@@ -0,0 +1,165 @@
+"""
+Customer-hash partitioning of the transaction data.
+
+`data_preprocessing.py --partitions N` splits the input by a hash of
+CustomerID into N partitions and cleans each one in its own worker process.
+A CSV input is also parsed and sharded in parallel, one line-aligned byte
+range per task; workbooks are read sequentially.
+
+All of a customer's transactions land in the same partition, so
+per-customer results (RFM, cluster assignments) are computed partition by
+partition and only concatenated afterwards; no step needs rows from another
+partition.
+
+Per partition i it writes (storage.partition_path)
+
+    Online Retail Preprocessed.part-00i      cleaned line items
+    Online Retail Invoices.part-00i          invoice-level table (--invoices)
+    Online Retail Customer Totals.part-00i   per-customer LastPurchase/Frequency/Monetary
+
+plus one manifest per table. Recency depends on the latest InvoiceDate
+across all partitions, so partitions store the last purchase time and the
+customer totals manifest records that date as reference_date; RFM is
+derived when a partition is read (partition_rfm).
+"""
+
+import io
+import os
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+
+from rfm_state import RFMState
+from storage import derived_path, load_table, partition_path, read_manifest
+
+
+def customer_totals_path(preprocessed_path):
+    """Partitioned per-customer totals that sit next to the preprocessed line items"""
+    return derived_path(preprocessed_path, "Customer Totals")
+
+
+def customer_partition(customer_ids, n_partitions):
+    """Partition index of each CustomerID (a stable hash, identical across processes and runs)"""
+    ids = np.asarray(customer_ids, dtype=np.int64)
+    return (pd.util.hash_array(ids) % np.uint64(n_partitions)).astype(np.int64)
+
+
+def shard_frame(chunk, n_partitions, shard_dir, tag):
+    """
+    Spill one frame of raw rows into per-partition pickle files under
+    shard_dir. Rows without a CustomerID cannot be placed and are dropped
+    here (cleaning drops them anyway). Returns [(partition, path), ...].
+    """
+    chunk = chunk.dropna(subset=["CustomerID"])
+    shards = []
+    for index, shard in chunk.groupby(customer_partition(chunk["CustomerID"], n_partitions), sort=False):
+        path = os.path.join(shard_dir, f"part-{index:03d}-{tag:05d}.pkl")
+        shard.to_pickle(path)
+        shards.append((index, path))
+    return shards
+
+
+def shard_chunks(chunks, n_partitions, shard_dir):
+    """
+    Shard an iterable of raw input chunks sequentially. Returns (rows read,
+    shard files per partition, an empty frame with the input columns).
+    """
+    shards = [[] for _ in range(n_partitions)]
+    rows, template = 0, None
+    for i, chunk in enumerate(chunks):
+        rows += len(chunk)
+        if template is None:
+            template = chunk.iloc[:0]
+        for index, path in shard_frame(chunk, n_partitions, shard_dir, i):
+            shards[index].append(path)
+    return rows, shards, template
+
+
+def csv_byte_ranges(path, range_bytes):
+    """
+    Header line and (start, end) byte ranges of about range_bytes each,
+    aligned to line starts, so ranges can be parsed independently (assumes
+    no newlines inside quoted fields, as in the Online Retail exports).
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header = f.readline()
+        bounds = [f.tell()]
+        while bounds[-1] < size:
+            f.seek(min(bounds[-1] + max(int(range_bytes), 1), size))
+            f.readline()
+            bounds.append(min(f.tell(), size))
+    return header, list(zip(bounds[:-1], bounds[1:]))
+
+
+def shard_csv_range(path, header, byte_range, n_partitions, shard_dir, tag, parse_dates=("InvoiceDate",)):
+    """Worker: parse one byte range of a CSV and shard it; returns (rows read, [(partition, path), ...])"""
+    start, end = byte_range
+    with open(path, "rb") as f:
+        f.seek(start)
+        body = f.read(end - start)
+    chunk = pd.read_csv(io.BytesIO(header + body), parse_dates=list(parse_dates))
+    return len(chunk), shard_frame(chunk, n_partitions, shard_dir, tag)
+
+
+def shard_csv(path, n_partitions, shard_dir, range_bytes, n_jobs=-1):
+    """
+    Shard a CSV with byte ranges parsed in parallel workers. Same return
+    value as shard_chunks; shard files keep the input's row order.
+    """
+    header, ranges = csv_byte_ranges(path, range_bytes)
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(shard_csv_range)(path, header, byte_range, n_partitions, shard_dir, i)
+        for i, byte_range in enumerate(ranges)
+    )
+    shards = [[] for _ in range(n_partitions)]
+    for _, range_shards in results:
+        for index, shard_path in range_shards:
+            shards[index].append(shard_path)
+    template = pd.read_csv(io.BytesIO(header))
+    return sum(rows for rows, _ in results), shards, template
+
+
+def read_shards(shard_files, template):
+    """One partition's raw rows from its shard files"""
+    if not shard_files:
+        return template
+    return pd.concat([pd.read_pickle(path) for path in shard_files], ignore_index=True)
+
+
+def partition_rfm(totals_path, index, reference_date=None):
+    """RFM of one partition, relative to the manifest's reference_date unless one is given"""
+    if reference_date is None:
+        reference_date = read_manifest(totals_path)["reference_date"]
+    customers = load_table(partition_path(totals_path, index), index_col="CustomerID")
+    return RFMState(customers).to_rfm(reference_date)
+
+
+def load_partitioned_rfm(totals_path):
+    """RFM of all customers from the partitioned customer totals"""
+    manifest = read_manifest(totals_path)
+    customers = load_table(totals_path, index_col="CustomerID")
+    return RFMState(customers).to_rfm(manifest["reference_date"])
+
+
+def partition_state(index, preprocessed_path):
+    """Incremental RFM state of one partition's cleaned line items"""
+    data = load_table(partition_path(preprocessed_path, index),
+                      columns=["InvoiceNo", "InvoiceDate", "CustomerID", "TotalPrice"])
+    return RFMState.from_transactions(data)
+
+
+def load_partitioned_state(preprocessed_path, n_jobs=-1):
+    """RFM state of all customers, built partition by partition"""
+    states = map_partitions(partition_state, preprocessed_path, preprocessed_path, n_jobs=n_jobs)
+    # Customers never span partitions, so neither do their invoices: the states are concatenated
+    customers = pd.concat([state.customers for state in states])
+    invoice_pairs = states[0].invoice_pairs.append([state.invoice_pairs for state in states[1:]])
+    return RFMState(customers, invoice_pairs)
+
+
+def map_partitions(func, csv_path, *args, n_jobs=-1):
+    """func(i, *args) for every partition i of a partitioned output, one joblib task per partition"""
+    n_partitions = read_manifest(csv_path)["n_partitions"]
+    return Parallel(n_jobs=n_jobs)(delayed(func)(i, *args) for i in range(n_partitions))
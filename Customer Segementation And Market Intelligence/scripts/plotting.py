@@ -0,0 +1,234 @@
+"""
+Figure rendering for the analysis scripts.
+
+The scripts reduce their data to small plot inputs (histogram counts,
+binned KDE curves, top-N aggregates, stratified samples, box statistics)
+and hand them to a FigureRenderer, which draws each figure in a worker
+process with the Agg backend. A figure is skipped when its output file
+exists and the hash of its inputs and of this module matches the last
+render (recorded next to the figures in .plot_cache.<script>.json, one
+file per script so concurrently running stages do not overwrite each other).
+
+    with FigureRenderer() as figures:
+        figures.submit("rfm_distribution.png", render_histograms, panels)
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import sys
+
+import numpy as np
+import pandas as pd
+from joblib.externals.loky import get_reusable_executor
+
+PLOT_CACHE_FILE = ".plot_cache.{name}.json"
+KDE_GRID_SIZE = 512
+MODULE_PATH = os.path.abspath(__file__)
+
+
+# --- Plot inputs ---
+
+def histogram_with_kde(values, bins=50, grid_size=KDE_GRID_SIZE):
+    """
+    Histogram counts and a Gaussian KDE scaled to counts, from binned data.
+    The KDE convolves a fine grid histogram with a Scott's-rule kernel, so it
+    costs O(n + grid_size^2) instead of O(n * grid_size).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    counts, edges = np.histogram(values, bins=bins)
+    grid_counts, grid_edges = np.histogram(values, bins=grid_size, range=(edges[0], edges[-1]))
+    grid = (grid_edges[:-1] + grid_edges[1:]) / 2
+    grid_width = grid_edges[1] - grid_edges[0]
+
+    bandwidth = values.std(ddof=1) * len(values) ** (-1 / 5) if len(values) > 1 else 0.0
+    sigma = bandwidth / grid_width if grid_width > 0 else 0.0
+    if sigma > 0:
+        offsets = np.arange(-min(int(4 * sigma) + 1, grid_size), min(int(4 * sigma) + 1, grid_size) + 1)
+        kernel = np.exp(-0.5 * (offsets / sigma) ** 2)
+        density = np.convolve(grid_counts, kernel / kernel.sum(), mode="same")
+    else:
+        density = grid_counts.astype(np.float64)
+    # Scale to histogram counts like seaborn's histplot(kde=True)
+    bin_width = edges[1] - edges[0]
+    kde = density / grid_width * bin_width if grid_width > 0 else density
+    return {"edges": edges, "counts": counts, "kde_x": grid, "kde_y": kde}
+
+
+def box_stats(profile, metric):
+    """Matplotlib bxp() statistics per cluster from a cluster_profiling.ClusterProfile"""
+    stats = []
+    for cluster_id, row in profile.stats.iterrows():
+        q1, median, q3 = row[(metric, "q25")], row[(metric, "median")], row[(metric, "q75")]
+        iqr = q3 - q1
+        stats.append({"label": str(cluster_id), "q1": q1, "med": median, "q3": q3, "mean": row[(metric, "mean")],
+                      "whislo": max(row[(metric, "min")], q1 - 1.5 * iqr),
+                      "whishi": min(row[(metric, "max")], q3 + 1.5 * iqr)})
+    return stats
+
+
+# --- Renderers (run in worker processes; draw on the current figure) ---
+
+def render_histograms(panels, figsize=(15, 5)):
+    """One subplot per (title, histogram_with_kde()) panel"""
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=figsize)
+    for i, (title, hist) in enumerate(panels, start=1):
+        plt.subplot(1, len(panels), i)
+        plt.stairs(hist["counts"], hist["edges"], fill=True, alpha=0.5)
+        plt.plot(hist["kde_x"], hist["kde_y"])
+        plt.title(title)
+        plt.ylabel("Count")
+    plt.tight_layout()
+
+
+def render_bar(labels, values, title, xlabel, ylabel, figsize=(10, 6)):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    plt.figure(figsize=figsize)
+    sns.barplot(x=list(labels), y=list(values))
+    plt.title(title)
+    plt.xlabel(xlabel)
+    plt.ylabel(ylabel)
+    plt.xticks(rotation=45, ha="right")
+    plt.tight_layout()
+
+
+def render_line(x, y, title, xlabel, ylabel, band=None, marker=None, figsize=(12, 6)):
+    """Line plot with an optional (low, high) shaded band"""
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=figsize)
+    plt.plot(x, y, marker=marker)
+    if band is not None:
+        plt.fill_between(x, band[0], band[1], alpha=0.2)
+    plt.title(title)
+    plt.xlabel(xlabel)
+    plt.ylabel(ylabel)
+    plt.grid(True)
+    plt.tight_layout()
+
+
+def render_pairplot(sample, variables, hue, title):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.pairplot(sample, vars=variables, hue=hue, palette="viridis", diag_kind="hist", plot_kws={"s": 8})
+    plt.suptitle(title, y=1.02)
+
+
+def render_boxplots(panels, figsize=(18, 6)):
+    """One subplot per (title, xlabel, ylabel, box_stats()) panel, drawn from precomputed statistics"""
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=figsize)
+    for i, (title, xlabel, ylabel, stats) in enumerate(panels, start=1):
+        ax = plt.subplot(1, len(panels), i)
+        ax.bxp(stats, showfliers=False, patch_artist=True)
+        ax.set_title(title)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+    plt.tight_layout()
+
+
+# --- Rendering pool ---
+
+def use_agg_backend():
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def render_figure(render, path, args, kwargs):
+    """Worker entry point: draw one figure and save it"""
+    import matplotlib.pyplot as plt
+
+    render(*args, **kwargs)
+    plt.savefig(path, bbox_inches="tight")
+    plt.close("all")
+    return path
+
+
+def input_hash(*parts):
+    """Content hash of plot inputs (frames and arrays hashed by value)"""
+    digest = hashlib.sha256()
+
+    def update(value):
+        if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+            digest.update(pd.util.hash_pandas_object(value, index=not isinstance(value, pd.Index)).to_numpy().tobytes())
+            digest.update(repr(list(value.columns) if isinstance(value, pd.DataFrame) else value.name).encode())
+        elif isinstance(value, np.ndarray):
+            digest.update(str(value.dtype).encode() + str(value.shape).encode())
+            digest.update(np.ascontiguousarray(value).tobytes())
+        elif isinstance(value, dict):
+            for key in sorted(value, key=str):
+                update(str(key))
+                update(value[key])
+        elif isinstance(value, (list, tuple)):
+            digest.update(f"{type(value).__name__}[{len(value)}]".encode())
+            for item in value:
+                update(item)
+        else:
+            digest.update(pickle.dumps(value))
+
+    for part in parts:
+        update(part)
+    return digest.hexdigest()
+
+
+class FigureRenderer:
+    """Renders figures in a process pool and skips those whose inputs are unchanged"""
+
+    def __init__(self, output_dir=".", max_workers=None, cache_name=None):
+        self.output_dir = output_dir
+        self.max_workers = max_workers or min(os.cpu_count() or 1, 4)
+        cache_name = cache_name or os.path.splitext(os.path.basename(sys.argv[0]))[0] or "interactive"
+        self.cache_path = os.path.join(output_dir, PLOT_CACHE_FILE.format(name=cache_name))
+        self.cache = {}
+        if os.path.exists(self.cache_path):
+            with open(self.cache_path) as f:
+                self.cache = json.load(f)
+        with open(MODULE_PATH, "rb") as f:
+            self.code_hash = hashlib.sha256(f.read()).hexdigest()
+        self.pending = {}
+        self.skipped = []
+        self._executor = None
+
+    def submit(self, filename, render, *args, **kwargs):
+        """Queue a figure; returns False when the cached render is still valid"""
+        path = os.path.join(self.output_dir, filename)
+        key = input_hash(self.code_hash, render.__name__, args, kwargs)
+        if os.path.exists(path) and self.cache.get(filename) == key:
+            self.skipped.append(filename)
+            return False
+        if self._executor is None:
+            self._executor = get_reusable_executor(max_workers=self.max_workers, initializer=use_agg_backend)
+        self.pending[filename] = (key, self._executor.submit(render_figure, render, path, args, kwargs))
+        return True
+
+    def close(self):
+        """Wait for all queued figures, then record their input hashes"""
+        errors = []
+        for filename, (key, future) in self.pending.items():
+            try:
+                future.result()
+                self.cache[filename] = key
+            except Exception as exc:
+                errors.append(f"{filename}: {exc!r}")
+                self.cache.pop(filename, None)
+        rendered = len(self.pending) - len(errors)
+        self.pending = {}
+        with open(self.cache_path, "w") as f:
+            json.dump(self.cache, f, indent=2)
+        print(f"Figures: {rendered} rendered, {len(self.skipped)} unchanged")
+        if errors:
+            raise RuntimeError("Figure rendering failed: " + "; ".join(errors))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
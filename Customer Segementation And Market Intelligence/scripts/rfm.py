@@ -0,0 +1,133 @@
+"""
+Vectorized RFM (Recency, Frequency, Monetary) computation shared by the
+analysis scripts.
+
+All three metrics are computed from integer customer codes with native
+numpy/pandas reductions instead of per-customer Python lambdas.
+"""
+
+import numpy as np
+import pandas as pd
+
+RFM_COLUMNS = ["Recency", "Frequency", "Monetary"]
+
+SECONDS_PER_DAY = 86400
+
+# Compact per-customer layout: 2 + 4 + 4 bytes of metrics, 1 byte of cluster
+# label and a 4-byte CustomerID index (8 bytes if ids exceed uint32), i.e.
+# 15 bytes per customer, about 0.75 GB for 50M customers. Monetary keeps 7
+# significant digits in float32 (cent precision up to about 131k).
+COMPACT_DTYPES = {"Recency": np.uint16, "Frequency": np.uint32, "Monetary": np.float32, "Cluster": np.uint8}
+
+
+def to_epoch_seconds(dates):
+    """Convert a datetime-like column to int64 seconds since the epoch"""
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates)
+    return np.asarray(dates, dtype="datetime64[s]").view("int64")
+
+
+def customer_totals(data, invoices=False):
+    """
+    Per-customer LastPurchase (epoch seconds), Frequency and Monetary from
+    line-item transactions, or from the invoice-level table (invoices.py,
+    one row per customer and invoice) with invoices=True, where Frequency is
+    a plain row count. Recency is derived from LastPurchase once the
+    reference date is known (compute_rfm, rfm_state.RFMState.to_rfm).
+    """
+    # Map CustomerID to dense 0..n-1 codes (sorted, so the output index is sorted)
+    codes, customers = pd.factorize(data["CustomerID"], sort=True)
+    n_customers = len(customers)
+
+    # Last purchase: per-customer max of integer timestamps
+    seconds = to_epoch_seconds(data["InvoiceDate"])
+    last_seconds = pd.Series(seconds).groupby(codes, sort=True).max().to_numpy()
+
+    # Frequency: count distinct (customer, invoice) pairs
+    if invoices:
+        frequency = np.bincount(codes, minlength=n_customers)
+    else:
+        invoice_codes, invoice_numbers = pd.factorize(data["InvoiceNo"])
+        pair_keys = codes.astype(np.int64) * len(invoice_numbers) + invoice_codes
+        unique_pairs = pd.unique(pair_keys)
+        frequency = np.bincount(unique_pairs // len(invoice_numbers), minlength=n_customers)
+
+    # Monetary: weighted bincount over customer codes
+    monetary = np.bincount(
+        codes, weights=data["TotalPrice"].to_numpy(dtype=np.float64), minlength=n_customers
+    )
+
+    return pd.DataFrame(
+        {"LastPurchase": last_seconds.astype(np.int64),
+         "Frequency": frequency.astype(np.int64),
+         "Monetary": monetary},
+        index=pd.Index(customers, name="CustomerID"),
+    )
+
+
+def compute_rfm(data, reference_date=None, invoices=False):
+    """
+    Compute per-customer RFM values from line-item transactions (or from the
+    invoice-level table with invoices=True, see customer_totals).
+
+    Recency: days between the customer's last purchase and reference_date
+             (defaults to the most recent InvoiceDate in the data)
+    Frequency: number of distinct invoices
+    Monetary: total spending (sum of TotalPrice)
+    """
+    totals = customer_totals(data, invoices=invoices)
+    last_seconds = totals["LastPurchase"].to_numpy()
+    if reference_date is None:
+        reference_seconds = last_seconds.max() if len(last_seconds) else 0
+    else:
+        reference_seconds = pd.Timestamp(reference_date).value // 10**9
+    recency = (reference_seconds - last_seconds) // SECONDS_PER_DAY
+
+    rfm = pd.DataFrame(
+        {"Recency": recency.astype(np.int64),
+         "Frequency": totals["Frequency"].to_numpy(),
+         "Monetary": totals["Monetary"].to_numpy()},
+        index=totals.index,
+    )
+    return rfm
+
+
+def compact_rfm(rfm):
+    """
+    Return rfm with the compact dtypes of COMPACT_DTYPES and a sorted integer
+    CustomerID index. Raises ValueError when a value does not fit its dtype.
+    """
+    columns = {}
+    for column in rfm.columns:
+        dtype = COMPACT_DTYPES.get(column)
+        values = rfm[column].to_numpy()
+        if dtype is not None and np.issubdtype(dtype, np.integer):
+            info = np.iinfo(dtype)
+            if len(values) and (values.min() < info.min or values.max() > info.max):
+                raise ValueError(f"{column} values outside the {np.dtype(dtype).name} range "
+                                 f"[{info.min}, {info.max}]")
+        columns[column] = values.astype(dtype) if dtype is not None else values
+
+    ids = rfm.index.to_numpy()
+    if len(ids) and np.all(np.mod(ids, 1) == 0) and ids.min() >= 0:
+        ids = ids.astype(np.uint32 if ids.max() <= np.iinfo(np.uint32).max else np.int64)
+    compact = pd.DataFrame(columns, index=pd.Index(ids, name=rfm.index.name))
+    if not compact.index.is_monotonic_increasing:
+        compact = compact.sort_index()
+    return compact
+
+
+def scale_in_place(rfm, scaler, fit=False, columns=RFM_COLUMNS):
+    """
+    Scaled float32 feature matrix for clustering. The float32 copy of the
+    compact columns is the only scaled copy: the scaler transforms it in place.
+    """
+    X = rfm[columns].to_numpy(dtype=np.float32)
+    if fit:
+        scaler.fit(X)
+    return scaler.transform(X, copy=False)
+
+
+def memory_per_customer(rfm):
+    """Bytes per customer of an RFM frame, index included"""
+    return rfm.memory_usage(index=True, deep=True).sum() / max(len(rfm), 1)
@@ -0,0 +1,156 @@
+"""
+Multi-snapshot RFM and segment migration tracking.
+
+RFM is computed for many reference dates in one pass over the transactions
+sorted by InvoiceDate: per-customer running aggregates (last purchase,
+distinct invoices, spend) are advanced from one reference date to the next,
+so each snapshot costs O(new rows + customers) instead of a full groupby.
+With window_days, rows older than the window are subtracted again, giving
+trailing-window RFM. Every snapshot is assigned with the persisted
+segmentation model and consecutive snapshots are counted into a segment
+transition matrix.
+
+Usage:
+    python rfm_snapshots.py --months 36 [--window-days 365] [--version 3]
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from rfm import RFM_COLUMNS, SECONDS_PER_DAY, to_epoch_seconds
+from segmentation_model import MODEL_DIR, load_model, predict_segments
+from storage import columnar_path, has_columnar_support, load_table, save_table
+
+PREPROCESSED_PATH = "/Users/sumitkumarsingh/Downloads/Anomaly Detection in High-Dimensional Data/data/Online Retail Preprocessed.csv"
+
+# Label of customers with no purchases up to (or within the window before) a snapshot
+ABSENT = -1
+SNAPSHOT_SEGMENTS_PATH = "rfm_snapshot_segments.csv"
+TRANSITIONS_PATH = "segment_transitions.csv"
+
+
+def monthly_reference_dates(dates, n_months=None):
+    """Month starts after the first transaction up to the last one (the latest n_months when given)"""
+    dates = pd.to_datetime(pd.Series(dates))
+    references = pd.date_range(dates.min().normalize() + pd.offsets.MonthBegin(1), dates.max(), freq="MS")
+    return references[-n_months:] if n_months else references
+
+
+def iter_snapshot_rfm(data, reference_dates, window_days=None):
+    """
+    Yield (reference_date, rfm) for each reference date in increasing order.
+    A snapshot covers transactions with InvoiceDate <= reference_date (and,
+    with window_days, later than reference_date - window_days); customers
+    without such transactions are left out of it.
+    """
+    codes, customers = pd.factorize(data["CustomerID"], sort=True)
+    n_customers = len(customers)
+    invoice_codes, invoices = pd.factorize(data["InvoiceNo"])
+
+    # One stable sort by time; everything after this walks it forward
+    seconds = to_epoch_seconds(data["InvoiceDate"])
+    order = np.argsort(seconds, kind="stable")
+    seconds, codes, invoice_codes = seconds[order], codes[order], invoice_codes[order]
+    prices = data["TotalPrice"].to_numpy(dtype=np.float64)[order]
+    # A (customer, invoice) pair is counted at its first row; all rows of an invoice share one date
+    first_row = ~pd.Series(codes.astype(np.int64) * len(invoices) + invoice_codes).duplicated().to_numpy()
+
+    last_purchase = np.full(n_customers, np.iinfo(np.int64).min, dtype=np.int64)
+    frequency = np.zeros(n_customers, dtype=np.int64)
+    monetary = np.zeros(n_customers, dtype=np.float64)
+    end = start = 0
+
+    for reference_date in pd.DatetimeIndex(reference_dates).sort_values():
+        reference_seconds = reference_date.value // 10**9
+        new_end = np.searchsorted(seconds, reference_seconds, side="right")
+        block = slice(end, new_end)
+        np.maximum.at(last_purchase, codes[block], seconds[block])
+        frequency += np.bincount(codes[block][first_row[block]], minlength=n_customers)
+        monetary += np.bincount(codes[block], weights=prices[block], minlength=n_customers)
+        end = new_end
+
+        if window_days is not None:
+            new_start = np.searchsorted(seconds, reference_seconds - window_days * SECONDS_PER_DAY, side="right")
+            block = slice(start, new_start)
+            frequency -= np.bincount(codes[block][first_row[block]], minlength=n_customers)
+            monetary -= np.bincount(codes[block], weights=prices[block], minlength=n_customers)
+            start = new_start
+
+        active = frequency > 0
+        rfm = pd.DataFrame(
+            {"Recency": (reference_seconds - last_purchase[active]) // SECONDS_PER_DAY,
+             "Frequency": frequency[active],
+             "Monetary": monetary[active]},
+            index=pd.Index(customers[active], name="CustomerID"),
+        )
+        yield reference_date, rfm[RFM_COLUMNS]
+
+
+def snapshot_segments(data, reference_dates, artifact=None, window_days=None):
+    """
+    Cluster of every customer at every reference date, assigned with the
+    persisted model: a CustomerID x snapshot frame of int8 labels, ABSENT
+    where the customer has no transactions in the snapshot.
+    """
+    if artifact is None:
+        artifact = load_model()
+    customers = pd.Index(np.sort(pd.unique(data["CustomerID"])), name="CustomerID")
+    segments = {}
+    for reference_date, rfm in iter_snapshot_rfm(data, reference_dates, window_days):
+        labels = np.full(len(customers), ABSENT, dtype=np.int8)
+        labels[customers.get_indexer(rfm.index)] = predict_segments(rfm, artifact).to_numpy()
+        segments[reference_date.strftime("%Y-%m-%d")] = labels
+    return pd.DataFrame(segments, index=customers)
+
+
+def transition_matrix(segments, n_clusters, normalize=False):
+    """
+    Customer counts moving between states across consecutive snapshots,
+    summed over all snapshot pairs. States are "Absent" and the cluster ids;
+    normalize turns each row into transition probabilities.
+    """
+    n_states = n_clusters + 1
+    labels = segments.to_numpy(dtype=np.int64) - ABSENT
+    pairs = labels[:, :-1] * n_states + labels[:, 1:]
+    counts = np.bincount(pairs.ravel(), minlength=n_states * n_states).reshape(n_states, n_states)
+    states = ["Absent"] + list(range(n_clusters))
+    matrix = pd.DataFrame(counts, index=pd.Index(states, name="From"), columns=pd.Index(states, name="To"))
+    if normalize:
+        matrix = matrix.div(matrix.sum(axis=1).replace(0, 1), axis=0)
+    return matrix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute monthly RFM snapshots and segment transitions")
+    parser.add_argument("--input", default=PREPROCESSED_PATH, help="Preprocessed transactions")
+    parser.add_argument("--months", type=int, default=36, help="Number of monthly snapshots: the latest months, in date order")
+    parser.add_argument("--window-days", type=int, help="Trailing window per snapshot (default: all history)")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--version", type=int, help="Model artifact version (defaults to the latest)")
+    parser.add_argument("--segments-out", default=SNAPSHOT_SEGMENTS_PATH)
+    parser.add_argument("--transitions-out", default=TRANSITIONS_PATH)
+    args = parser.parse_args()
+
+    artifact = load_model(args.model_dir, args.version)
+    data = load_table(args.input, columns=["InvoiceNo", "InvoiceDate", "CustomerID", "TotalPrice"])
+    reference_dates = monthly_reference_dates(data["InvoiceDate"], args.months)
+    if len(reference_dates) < 2:
+        parser.error("Need at least two monthly snapshots in the data to track transitions")
+
+    segments = snapshot_segments(data, reference_dates, artifact, args.window_days)
+    save_table(segments.rename(columns=str), args.segments_out, index=True)
+    segments_path = columnar_path(args.segments_out) if has_columnar_support() else args.segments_out
+    print(f"Segments for {len(segments):,} customers at {len(reference_dates)} snapshots "
+          f"({reference_dates[0]:%Y-%m-%d} to {reference_dates[-1]:%Y-%m-%d}) saved to {segments_path}")
+
+    transitions = transition_matrix(segments, artifact["n_clusters"])
+    transitions.to_csv(args.transitions_out)
+    print(f"\nSegment transitions (customers, summed over consecutive snapshots):\n{transitions}")
+    print(f"\nTransition probabilities:\n{transition_matrix(segments, artifact['n_clusters'], normalize=True).round(3)}")
+    print(f"Transition matrix saved to {args.transitions_out}")
+
+
+if __name__ == "__main__":
+    main()
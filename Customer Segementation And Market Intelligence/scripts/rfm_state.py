@@ -0,0 +1,184 @@
+"""
+Incremental RFM state store.
+
+Keeps a persisted per-customer state (last purchase time, distinct invoice
+count, running monetary sum) that new transaction batches are folded into,
+so RFM can be refreshed without rereading the full transaction history.
+Recency is derived from the state relative to a reference date in
+O(customers).
+
+Usage:
+    python rfm_state.py rfm_state.npz new_invoices.csv [more_invoices.csv ...]
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from rfm import RFM_COLUMNS, SECONDS_PER_DAY, to_epoch_seconds
+
+
+class RFMState:
+    """Per-customer running RFM aggregates"""
+
+    def __init__(self, customers=None, invoice_pairs=None):
+        # customers: indexed by CustomerID with LastPurchase (epoch seconds), Frequency, Monetary
+        if customers is None:
+            customers = pd.DataFrame(
+                {"LastPurchase": pd.Series(dtype=np.int64),
+                 "Frequency": pd.Series(dtype=np.int64),
+                 "Monetary": pd.Series(dtype=np.float64)},
+                index=pd.Index([], dtype=np.int64, name="CustomerID"),
+            )
+        # invoice_pairs: distinct (CustomerID, InvoiceNo) already counted in Frequency
+        if invoice_pairs is None:
+            invoice_pairs = pd.MultiIndex.from_arrays(
+                [np.array([], dtype=np.int64), np.array([], dtype=str)],
+                names=["CustomerID", "InvoiceNo"],
+            )
+        self.customers = customers
+        # Pairs added since the last read of invoice_pairs are kept as arrays and
+        # concatenated on read; membership is tested against a set built once
+        self._pairs = invoice_pairs
+        self._new_pairs = []
+        self._seen = None
+
+    @property
+    def invoice_pairs(self):
+        if self._new_pairs:
+            customer_ids, invoice_nos = zip(*self._new_pairs)
+            new_pairs = pd.MultiIndex.from_arrays([np.concatenate(customer_ids), np.concatenate(invoice_nos)],
+                                                  names=["CustomerID", "InvoiceNo"])
+            self._pairs = self._pairs.append(new_pairs)
+            self._new_pairs = []
+        return self._pairs
+
+    def _add_pairs(self, customer_ids, invoice_nos):
+        """Record distinct (CustomerID, InvoiceNo) pairs; returns the mask of those not seen before"""
+        if self._seen is None:
+            pairs = self.invoice_pairs
+            self._seen = set(zip(pairs.get_level_values(0).tolist(), pairs.get_level_values(1).tolist()))
+        keys = list(zip(customer_ids.tolist(), invoice_nos.tolist()))
+        is_new = np.fromiter((key not in self._seen for key in keys), dtype=bool, count=len(keys))
+        self._seen.update(keys)
+        self._new_pairs.append((customer_ids[is_new], invoice_nos[is_new]))
+        return is_new
+
+    @classmethod
+    def from_transactions(cls, data):
+        """Build a state from a full transaction history"""
+        return cls().update(data)
+
+    def update(self, batch):
+        """Fold a batch of new line-item transactions into the state"""
+        if len(batch) == 0:
+            return self
+
+        customer_ids = batch["CustomerID"].to_numpy(dtype=np.int64)
+        seconds = to_epoch_seconds(batch["InvoiceDate"])
+
+        # Only invoices not seen in earlier batches add to Frequency; only this
+        # batch's distinct pairs are looked up, not the whole history
+        batch_pairs = pd.MultiIndex.from_arrays(
+            [customer_ids, batch["InvoiceNo"].astype(str).to_numpy()],
+            names=["CustomerID", "InvoiceNo"],
+        ).unique()
+        pair_customers = batch_pairs.get_level_values(0).to_numpy(dtype=np.int64)
+        is_new = self._add_pairs(pair_customers, batch_pairs.get_level_values(1).to_numpy(dtype=object))
+        new_invoice_counts = pd.Series(1, index=pair_customers[is_new]).groupby(level=0).sum()
+
+        batch_state = pd.DataFrame({"LastPurchase": seconds, "Monetary": batch["TotalPrice"].to_numpy(dtype=np.float64)},
+                                   index=pd.Index(customer_ids, name="CustomerID"))
+        batch_state = batch_state.groupby(level=0).agg({"LastPurchase": "max", "Monetary": "sum"})
+        batch_state["Frequency"] = new_invoice_counts.reindex(batch_state.index, fill_value=0)
+
+        combined = pd.concat([self.customers, batch_state[self.customers.columns]])
+        self.customers = combined.groupby(level=0).agg(
+            {"LastPurchase": "max", "Frequency": "sum", "Monetary": "sum"}
+        ).astype({"LastPurchase": np.int64, "Frequency": np.int64})
+        return self
+
+    def merge(self, other):
+        """Fold in a state built from another partition of the transactions"""
+        # Invoices split across both partitions must only be counted once
+        other_pairs = other.invoice_pairs
+        pair_customers = other_pairs.get_level_values(0).to_numpy(dtype=np.int64)
+        is_new = self._add_pairs(pair_customers, other_pairs.get_level_values(1).to_numpy(dtype=object))
+        shared_counts = pd.Series(1, index=pair_customers[~is_new]).groupby(level=0).sum()
+
+        combined = pd.concat([self.customers, other.customers])
+        customers = combined.groupby(level=0).agg({"LastPurchase": "max", "Frequency": "sum", "Monetary": "sum"})
+        customers["Frequency"] -= shared_counts.reindex(customers.index, fill_value=0)
+        self.customers = customers.astype({"LastPurchase": np.int64, "Frequency": np.int64})
+        return self
+
+    def to_rfm(self, reference_date=None):
+        """Return Recency/Frequency/Monetary relative to reference_date (defaults to the latest purchase)"""
+        last_seconds = self.customers["LastPurchase"].to_numpy()
+        if reference_date is None:
+            reference_seconds = last_seconds.max() if len(last_seconds) else 0
+        else:
+            reference_seconds = pd.Timestamp(reference_date).value // 10**9
+        rfm = pd.DataFrame(
+            {"Recency": (reference_seconds - last_seconds) // SECONDS_PER_DAY,
+             "Frequency": self.customers["Frequency"].to_numpy(),
+             "Monetary": self.customers["Monetary"].to_numpy()},
+            index=self.customers.index.copy(),
+        )
+        return rfm[RFM_COLUMNS]
+
+    def save(self, path):
+        """Persist the state to a compressed .npz file"""
+        np.savez_compressed(
+            path,
+            customer_id=self.customers.index.to_numpy(dtype=np.int64),
+            last_purchase=self.customers["LastPurchase"].to_numpy(),
+            frequency=self.customers["Frequency"].to_numpy(),
+            monetary=self.customers["Monetary"].to_numpy(),
+            pair_customer_id=self.invoice_pairs.get_level_values(0).to_numpy(dtype=np.int64),
+            pair_invoice_no=self.invoice_pairs.get_level_values(1).to_numpy().astype(str),
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Load a state written by save()"""
+        with np.load(path) as arrays:
+            customers = pd.DataFrame(
+                {"LastPurchase": arrays["last_purchase"],
+                 "Frequency": arrays["frequency"],
+                 "Monetary": arrays["monetary"]},
+                index=pd.Index(arrays["customer_id"], name="CustomerID"),
+            )
+            invoice_pairs = pd.MultiIndex.from_arrays(
+                [arrays["pair_customer_id"], arrays["pair_invoice_no"]],
+                names=["CustomerID", "InvoiceNo"],
+            )
+        return cls(customers, invoice_pairs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fold new transaction batches into a persisted RFM state")
+    parser.add_argument("state", help="Path to the .npz state file (created if missing)")
+    parser.add_argument("batches", nargs="+", help="Preprocessed transaction CSVs to fold in")
+    parser.add_argument("--reference-date", help="Reference date for Recency (defaults to latest purchase)")
+    parser.add_argument("--rfm-out", help="Optionally write the refreshed RFM table to this CSV")
+    args = parser.parse_args()
+
+    state = RFMState.load(args.state) if os.path.exists(args.state) else RFMState()
+    for batch_path in args.batches:
+        batch = pd.read_csv(batch_path, usecols=["CustomerID", "InvoiceNo", "InvoiceDate", "TotalPrice"])
+        state.update(batch)
+        print(f"Folded {len(batch):,} rows from {batch_path}")
+
+    state.save(args.state)
+    print(f"State saved to {args.state} ({len(state.customers):,} customers)")
+
+    if args.rfm_out:
+        state.to_rfm(args.reference_date).to_csv(args.rfm_out)
+        print(f"RFM table saved to {args.rfm_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Local HTTP service for low-latency segment lookups.
+
+Loads the persisted segmentation model once, scores the known customers at
+startup into a sorted CustomerID -> cluster index (binary search lookups),
+and scores raw R/F/M values through a micro-batcher that groups concurrent
+requests into one vectorized assignment.
+
+Endpoints:
+    GET  /segment?customer_id=12347
+    GET  /segment?recency=5&frequency=7&monetary=4310
+    POST /segment/batch   {"customer_ids": [...]} or {"rfm": [[r, f, m], ...]}
+    GET  /health
+
+Usage:
+    python segment_service.py --port 8765
+"""
+
+import argparse
+import json
+import queue
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from segmentation_model import MODEL_DIR, assign_clusters, load_model, predict_segments, scale_features
+from storage import load_table
+
+RFM_CLUSTERS_PATH = "/Users/sumitkumarsingh/Downloads/Anomaly Detection in High-Dimensional Data/data/Online Retail RFM Clusters.csv"
+
+
+class SegmentIndex:
+    """Sorted CustomerID array with the matching cluster labels"""
+
+    def __init__(self, customer_ids, clusters):
+        order = np.argsort(customer_ids, kind="stable")
+        self.customer_ids = np.asarray(customer_ids, dtype=np.int64)[order]
+        self.clusters = np.asarray(clusters, dtype=np.int32)[order]
+
+    @classmethod
+    def from_rfm(cls, rfm, artifact):
+        return cls(rfm.index.to_numpy(), predict_segments(rfm, artifact).to_numpy())
+
+    def lookup(self, customer_ids):
+        """Cluster per CustomerID, -1 for unknown customers"""
+        customer_ids = np.asarray(customer_ids, dtype=np.int64)
+        if len(self.customer_ids) == 0:
+            return np.full(len(customer_ids), -1, dtype=np.int32)
+        pos = np.searchsorted(self.customer_ids, customer_ids)
+        pos = np.minimum(pos, len(self.customer_ids) - 1)
+        found = self.customer_ids[pos] == customer_ids
+        return np.where(found, self.clusters[pos], -1)
+
+
+class MicroBatcher:
+    """
+    Groups concurrent raw-RFM scoring requests into one vectorized call.
+    Requests that queue up while a batch is being scored form the next
+    batch; max_wait_ms > 0 additionally waits for stragglers.
+    """
+
+    def __init__(self, artifact, max_batch=1024, max_wait_ms=0.0):
+        self.scaler = artifact["scaler"]
+        self.n_features = len(artifact["features"])
+        self.centers = artifact["cluster_centers"]
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, rows):
+        """Score an (n, n_features) array; blocks until the batch containing it is done"""
+        future = Future()
+        self._queue.put((np.asarray(rows, dtype=np.float64).reshape(-1, self.n_features), future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            size = len(pending[0][0])
+            while size < self.max_batch:
+                try:
+                    if self.max_wait > 0:
+                        item = self._queue.get(timeout=self.max_wait)
+                    else:
+                        item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                pending.append(item)
+                size += len(item[0])
+
+            try:
+                X = np.concatenate([rows for rows, _ in pending])
+                labels = assign_clusters(scale_features(self.scaler, X), self.centers)
+            except Exception as e:  # fail this batch's requests, keep serving the next ones
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            offset = 0
+            for rows, future in pending:
+                future.set_result(labels[offset:offset + len(rows)])
+                offset += len(rows)
+
+
+def make_handler(index, batcher, model_version):
+    """Request handler bound to a loaded index and batcher"""
+
+    class SegmentHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive so clients can reuse connections
+        disable_nagle_algorithm = True  # headers and body are separate writes
+
+        def log_message(self, format, *args):
+            pass  # keep per-request logging off the hot path
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+            try:
+                if url.path == "/health":
+                    self._send(200, {"status": "ok", "model_version": model_version,
+                                     "customers": len(index.customer_ids)})
+                elif url.path == "/segment" and "customer_id" in params:
+                    customer_id = int(params["customer_id"])
+                    cluster = int(index.lookup([customer_id])[0])
+                    if cluster < 0:
+                        self._send(404, {"error": f"Unknown customer {customer_id}"})
+                    else:
+                        self._send(200, {"customer_id": customer_id, "cluster": cluster})
+                elif url.path == "/segment":
+                    rfm = [float(params["recency"]), float(params["frequency"]), float(params["monetary"])]
+                    self._send(200, {"rfm": rfm, "cluster": int(batcher.submit(rfm)[0])})
+                else:
+                    self._send(404, {"error": "Not found"})
+            except (KeyError, ValueError, OverflowError) as e:
+                self._send(400, {"error": f"Bad request: {e}"})
+            except Exception as e:
+                self._send(500, {"error": f"Scoring failed: {e}"})
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/segment/batch":
+                self._send(404, {"error": "Not found"})
+                return
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                if "customer_ids" in request:
+                    clusters = index.lookup(request["customer_ids"])
+                else:
+                    clusters = batcher.submit(request["rfm"])
+                self._send(200, {"clusters": clusters.tolist()})
+            except (KeyError, ValueError, TypeError, OverflowError) as e:
+                self._send(400, {"error": f"Bad request: {e}"})
+            except Exception as e:
+                self._send(500, {"error": f"Scoring failed: {e}"})
+
+    return SegmentHandler
+
+
+def create_server(host="127.0.0.1", port=8765, model_dir=MODEL_DIR, version=None, rfm_path=RFM_CLUSTERS_PATH,
+                  rfm=None):
+    """Load the model and customer table once and return a ready ThreadingHTTPServer"""
+    artifact = load_model(model_dir, version)
+    if rfm is None:
+        rfm = load_table(rfm_path, columns=artifact["features"], index_col="CustomerID")
+    index = SegmentIndex.from_rfm(rfm, artifact)
+    batcher = MicroBatcher(artifact)
+    return ThreadingHTTPServer((host, port), make_handler(index, batcher, artifact["version"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve segment lookups over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--version", type=int, help="Model version (defaults to the latest)")
+    parser.add_argument("--rfm", default=RFM_CLUSTERS_PATH, help="Per-customer RFM table to index")
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.model_dir, args.version, args.rfm)
+    print(f"Serving segments on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Persisted, versioned segmentation model and batch scoring.
+
+An artifact bundles the fitted scaler, the cluster centroids, the chosen K
+and the feature list. Artifacts are written to MODEL_DIR as
+segmentation_model_v001.joblib, _v002, ... and the highest version is used
+unless one is requested explicitly. The fitted clustering estimator is
+written next to it (segmentation_model_v001.estimator.joblib) and only
+loaded on request (load_estimator): scoring needs just the scaler and the
+centroids, so loading an artifact does not import scikit-learn. A fitted
+StandardScaler is stored as its mean and scale arrays for the same reason. Refits are
+aligned to the previous artifact's centroids (align_clusters) so a cluster
+keeps its ID from one version to the next.
+
+A partitioned input (partitions.py), e.g. the customer totals written by
+`data_preprocessing.py --partitions N`, is scored one partition per worker
+into a partitioned output.
+
+Usage:
+    python segmentation_model.py new_customers_rfm.csv scored.csv [--version 3]
+    python segmentation_model.py "Online Retail Customer Totals.csv" scored.csv --jobs 8
+"""
+
+import argparse
+import glob
+import os
+import re
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from features import RFMTransformer
+from partitions import map_partitions
+from rfm import RFM_COLUMNS
+from rfm_state import RFMState
+from storage import load_table, partition_path, read_manifest, save_table, write_manifest
+
+MODEL_DIR = "models"
+MODEL_FILE_PATTERN = "segmentation_model_v{version:03d}.joblib"
+ESTIMATOR_FILE_PATTERN = "segmentation_model_v{version:03d}.estimator.joblib"
+SCORING_CHUNK_SIZE = 262_144
+
+
+def model_versions(model_dir=MODEL_DIR):
+    """Sorted list of artifact versions present in model_dir"""
+    versions = []
+    for path in glob.glob(os.path.join(model_dir, "segmentation_model_v*.joblib")):
+        match = re.search(r"_v(\d+)\.joblib$", path)
+        if match:
+            versions.append(int(match.group(1)))
+    return sorted(versions)
+
+
+def scaler_arrays(scaler):
+    """Plain-array form of a fitted StandardScaler for an artifact; an RFMTransformer is kept as it is"""
+    if isinstance(scaler, (RFMTransformer, dict)):
+        return scaler
+    return {"mean": np.asarray(scaler.mean_, dtype=np.float64), "scale": np.asarray(scaler.scale_, dtype=np.float64)}
+
+
+def standard_arrays(scaler):
+    """(mean, scale) of a StandardScaler or its plain-array form"""
+    if isinstance(scaler, dict):
+        return scaler["mean"], scaler["scale"]
+    return scaler.mean_, scaler.scale_
+
+
+def save_model(scaler, model, features=RFM_COLUMNS, model_dir=MODEL_DIR, metadata=None):
+    """Write a new artifact version and return its path"""
+    os.makedirs(model_dir, exist_ok=True)
+    versions = model_versions(model_dir)
+    version = versions[-1] + 1 if versions else 1
+    artifact = {
+        "version": version,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "features": list(features),
+        "n_clusters": int(model.n_clusters),
+        "scaler": scaler_arrays(scaler),
+        "cluster_centers": np.asarray(model.cluster_centers_, dtype=np.float64),
+        "model_file": ESTIMATOR_FILE_PATTERN.format(version=version),
+        "metadata": metadata or {},
+    }
+    joblib.dump(model, os.path.join(model_dir, artifact["model_file"]))
+    path = os.path.join(model_dir, MODEL_FILE_PATTERN.format(version=version))
+    joblib.dump(artifact, path)
+    return path
+
+
+def load_model(model_dir=MODEL_DIR, version=None):
+    """Load an artifact (latest version by default)"""
+    if version is None:
+        versions = model_versions(model_dir)
+        if not versions:
+            raise FileNotFoundError(f"No segmentation model found in {model_dir}")
+        version = versions[-1]
+    return joblib.load(os.path.join(model_dir, MODEL_FILE_PATTERN.format(version=version)))
+
+
+def load_estimator(artifact, model_dir=MODEL_DIR):
+    """The fitted clustering estimator of an artifact (older artifacts embed it as "model")"""
+    if "model" in artifact:
+        return artifact["model"]
+    return joblib.load(os.path.join(model_dir, artifact["model_file"]))
+
+
+def scale_features(scaler, X):
+    """Apply an artifact's scaler: StandardScaler arrays or (FEATURE_PIPELINE) a features.RFMTransformer"""
+    if isinstance(scaler, RFMTransformer):
+        return scaler.transform(X)
+    mean, scale = standard_arrays(scaler)
+    return (np.asarray(X, dtype=np.float64) - mean) / scale
+
+
+def unscale_features(scaler, X):
+    """Map points in scaled space (e.g. centroids) back to original RFM units"""
+    if isinstance(scaler, RFMTransformer):
+        return scaler.inverse_transform(X)
+    mean, scale = standard_arrays(scaler)
+    return np.asarray(X, dtype=np.float64) * scale + mean
+
+
+def align_clusters(scaler, model, reference, features=RFM_COLUMNS):
+    """
+    Cluster renumbering that keeps IDs stable across refits: each new centroid
+    takes the ID of the reference artifact's centroid it matches (Hungarian
+    matching on squared distances, compared in the new scaler's space).
+    Returns mapping[new_id] -> stable id, or None when K or the features differ.
+    """
+    from scipy.optimize import linear_sum_assignment
+
+    centers = np.asarray(model.cluster_centers_, dtype=np.float64)
+    if reference["n_clusters"] != len(centers) or reference["features"] != list(features):
+        return None
+    ref_centers = scale_features(scaler, unscale_features(reference["scaler"], reference["cluster_centers"]))
+    cost = ((centers[:, None, :] - ref_centers[None, :, :]) ** 2).sum(axis=2)
+    rows, cols = linear_sum_assignment(cost)
+    mapping = np.empty(len(centers), dtype=np.int64)
+    mapping[rows] = cols
+    return mapping
+
+
+def assign_clusters(X_scaled, centers, chunk_size=SCORING_CHUNK_SIZE):
+    """Nearest-centroid assignment using ||x||^2 - 2 x.c + ||c||^2, chunk by chunk"""
+    center_norms = (centers ** 2).sum(axis=1)
+    labels = np.empty(len(X_scaled), dtype=np.int32)
+    for start in range(0, len(X_scaled), chunk_size):
+        block = X_scaled[start:start + chunk_size]
+        distances = center_norms - 2.0 * block @ centers.T
+        labels[start:start + chunk_size] = distances.argmin(axis=1)
+    return labels
+
+
+def predict_segments(rfm_frame, artifact=None, chunk_size=SCORING_CHUNK_SIZE):
+    """
+    Assign clusters to customers with a persisted model, without refitting.
+    Returns a Series of cluster labels aligned with rfm_frame's index.
+    """
+    if artifact is None:
+        artifact = load_model()
+    X = rfm_frame[artifact["features"]].to_numpy(dtype=np.float64)
+    X_scaled = scale_features(artifact["scaler"], X)
+    labels = assign_clusters(X_scaled, artifact["cluster_centers"], chunk_size=chunk_size)
+    return pd.Series(labels, index=rfm_frame.index, name="Cluster")
+
+
+def score_partition(index, input_path, output_path, model_dir=MODEL_DIR, version=None):
+    """Worker: score one partition of a partitioned RFM or customer-totals table"""
+    artifact = load_model(model_dir, version)
+    rfm = load_table(partition_path(input_path, index), index_col="CustomerID")
+    if "LastPurchase" in rfm:
+        rfm = RFMState(rfm).to_rfm(read_manifest(input_path)["reference_date"])
+    rfm["Cluster"] = predict_segments(rfm, artifact)
+    save_table(rfm, partition_path(output_path, index), index=True, keep_csv=True)
+    return len(rfm)
+
+
+def score_partitions(input_path, output_path, model_dir=MODEL_DIR, version=None, n_jobs=-1):
+    """Score every partition of input_path in parallel into a partitioned output_path"""
+    version = version or load_model(model_dir)["version"]
+    counts = map_partitions(score_partition, input_path, input_path, output_path, model_dir, version, n_jobs=n_jobs)
+    write_manifest(output_path, len(counts), partitioned_by="CustomerID", model_version=version, customers=counts)
+    return version, sum(counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score customers with a persisted segmentation model")
+    parser.add_argument("input", help="CSV with CustomerID and the model's RFM features")
+    parser.add_argument("output", help="CSV to write with an added Cluster column")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--version", type=int, help="Artifact version (defaults to the latest)")
+    parser.add_argument("--jobs", type=int, default=-1, help="Worker processes for a partitioned input")
+    args = parser.parse_args()
+
+    if read_manifest(args.input) is not None:
+        version, n_customers = score_partitions(args.input, args.output, args.model_dir, args.version, args.jobs)
+        print(f"Scored {n_customers:,} customers in {read_manifest(args.output)['n_partitions']} partitions "
+              f"with model v{version}, saved to {args.output}")
+        return
+
+    artifact = load_model(args.model_dir, args.version)
+    rfm = pd.read_csv(args.input, index_col="CustomerID")
+    rfm["Cluster"] = predict_segments(rfm, artifact)
+    rfm.to_csv(args.output)
+    print(f"Scored {len(rfm):,} customers with model v{artifact['version']} (K={artifact['n_clusters']}), "
+          f"saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
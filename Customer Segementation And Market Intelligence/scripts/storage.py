@@ -0,0 +1,222 @@
+"""
+Typed columnar storage for the data handed between pipeline stages.
+
+Tables are written as Arrow IPC (Feather, uncompressed so reads can be
+memory-mapped) next to the CSV path the stages already use, e.g.
+"Online Retail Preprocessed.csv" -> "Online Retail Preprocessed.feather".
+Readers load only the columns they ask for and fall back to the CSV when
+pyarrow is not installed or no columnar file exists.
+
+A stage output can also be partitioned ("<name>.part-000.csv", ... plus a
+"<name>.partitions.json" manifest, see partitions.py). While the manifest is
+newer than the unpartitioned files, load_table and iter_table read the
+partitions in its place.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow is optional; everything falls back to CSV
+    pa = None
+    feather = None
+
+CATEGORICAL_COLUMNS = ["StockCode", "Description", "Country"]
+FLOAT32_COLUMNS = ["UnitPrice", "TotalPrice"]
+DATE_COLUMNS = ["InvoiceDate"]
+DEFAULT_CHUNK_ROWS = 1_000_000
+PARTITION_FILE = "{stem}.part-{index:03d}{ext}"
+MANIFEST_FILE = "{stem}.partitions.json"
+
+
+def columnar_path(csv_path):
+    """Feather file that sits next to a stage's CSV output"""
+    return os.path.splitext(csv_path)[0] + ".feather"
+
+
+def derived_path(csv_path, label):
+    """Path of a table derived from a stage output ("... Preprocessed.csv" -> "... <label>.csv")"""
+    directory, name = os.path.split(csv_path)
+    stem, ext = os.path.splitext(name)
+    stem = stem.replace("Preprocessed", label, 1) if "Preprocessed" in stem else f"{stem} {label}"
+    return os.path.join(directory, stem + ext)
+
+
+def partition_path(csv_path, index):
+    stem, ext = os.path.splitext(csv_path)
+    return PARTITION_FILE.format(stem=stem, index=index, ext=ext)
+
+
+def manifest_path(csv_path):
+    return MANIFEST_FILE.format(stem=os.path.splitext(csv_path)[0])
+
+
+def write_manifest(csv_path, n_partitions, **info):
+    """Record a partitioned output; written after all its partitions"""
+    with open(manifest_path(csv_path), "w") as f:
+        json.dump({"n_partitions": n_partitions, **info}, f, indent=2, default=str)
+
+
+def read_manifest(csv_path):
+    """The partition manifest of csv_path, or None when there is none or the unpartitioned files are newer"""
+    path = manifest_path(csv_path)
+    if not os.path.exists(path):
+        return None
+    unpartitioned = [p for p in (csv_path, columnar_path(csv_path)) if os.path.exists(p)]
+    if any(os.path.getmtime(p) > os.path.getmtime(path) for p in unpartitioned):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def table_mtime(csv_path):
+    """Modification time of the newest file of a stage output (CSV, Feather or manifest), None if absent"""
+    paths = [p for p in (csv_path, columnar_path(csv_path), manifest_path(csv_path)) if os.path.exists(p)]
+    return max(map(os.path.getmtime, paths)) if paths else None
+
+
+def has_columnar_support():
+    return feather is not None
+
+
+def to_columnar_types(data, categorical=True):
+    """Cast transaction columns to compact types (categories, datetime64, float32)"""
+    dtypes = {}
+    for column in data.columns:
+        if column in CATEGORICAL_COLUMNS:
+            dtypes[column] = "category" if categorical else str
+        elif column in FLOAT32_COLUMNS:
+            dtypes[column] = "float32"
+        elif column == "InvoiceNo":
+            dtypes[column] = str
+    data = data.astype(dtypes)
+    for column in DATE_COLUMNS:
+        if column in data.columns and not pd.api.types.is_datetime64_any_dtype(data[column]):
+            data[column] = pd.to_datetime(data[column])
+    return data
+
+
+def save_table(data, csv_path, index=False, keep_csv=False):
+    """
+    Write a stage output as Feather when pyarrow is available, otherwise CSV.
+    keep_csv also writes the CSV for consumers that only read CSV. Returns
+    the path of the table written (the Feather file when there is one).
+    """
+    if has_columnar_support():
+        table = data.reset_index() if index else data.reset_index(drop=True)
+        feather.write_feather(table, columnar_path(csv_path), compression="uncompressed")
+    if keep_csv or not has_columnar_support():
+        data.to_csv(csv_path, index=index)
+    return columnar_path(csv_path) if has_columnar_support() else csv_path
+
+
+class ColumnarChunkWriter:
+    """Append DataFrame chunks to one Feather file (plain string columns, no dictionaries)"""
+
+    def __init__(self, csv_path):
+        self.path = columnar_path(csv_path)
+        self._sink = None
+        self._writer = None
+        self._schema = None
+
+    def write(self, chunk):
+        batch = pa.Table.from_pandas(to_columnar_types(chunk, categorical=False), preserve_index=False)
+        if self._writer is None:
+            self._sink = pa.OSFile(self.path, "wb")
+            self._schema = batch.schema
+            self._writer = pa.ipc.new_file(self._sink, self._schema)
+        self._writer.write_table(batch.cast(self._schema))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+
+
+def columnar_is_current(csv_path):
+    """True when a Feather file exists for csv_path and is at least as new as the CSV"""
+    path = columnar_path(csv_path)
+    return has_columnar_support() and os.path.exists(path) and (
+        not os.path.exists(csv_path) or os.path.getmtime(path) >= os.path.getmtime(csv_path)
+    )
+
+
+def load_table(csv_path, columns=None, index_col=None):
+    """
+    Read a stage output, preferring the memory-mapped Feather file (the
+    concatenated partitions of a partitioned output).
+    Only `columns` (plus index_col) are loaded when given.
+    """
+    path = columnar_path(csv_path)
+    if columns is not None and index_col is not None and index_col not in columns:
+        columns = [index_col] + list(columns)
+
+    manifest = read_manifest(csv_path)
+    if manifest is not None:
+        parts = [load_table(partition_path(csv_path, i), columns) for i in range(manifest["n_partitions"])]
+        data = to_columnar_types(pd.concat(parts, ignore_index=True))
+    elif columnar_is_current(csv_path):
+        table = feather.read_table(path, columns=columns, memory_map=True)
+        data = to_columnar_types(table.to_pandas())
+    else:
+        header = pd.read_csv(csv_path, nrows=0).columns
+        parse_dates = [c for c in DATE_COLUMNS if c in header and (columns is None or c in columns)]
+        data = pd.read_csv(csv_path, usecols=columns, parse_dates=parse_dates)
+
+    if index_col is not None:
+        data = data.set_index(index_col)
+    return data
+
+
+def count_partitions(csv_path, n_partitions):
+    """
+    Number of partitions iter_table can split csv_path into (partition files,
+    Feather record batches; CSV is one stream)
+    """
+    manifest = read_manifest(csv_path)
+    if manifest is not None:
+        return max(min(n_partitions, manifest["n_partitions"]), 1)
+    if not columnar_is_current(csv_path):
+        return 1
+    with pa.memory_map(columnar_path(csv_path)) as source:
+        return max(min(n_partitions, pa.ipc.open_file(source).num_record_batches), 1)
+
+
+def iter_table(csv_path, columns=None, chunk_rows=DEFAULT_CHUNK_ROWS, partition=(0, 1)):
+    """
+    Yield a stage output as DataFrame chunks of about chunk_rows rows without
+    loading it whole. partition=(i, n) restricts a Feather file to the i-th of
+    n contiguous ranges of its record batches (of its partition files for a
+    partitioned output), so workers can split one file.
+    """
+    index, n_partitions = partition
+    manifest = read_manifest(csv_path)
+    if manifest is not None:
+        bounds = np.linspace(0, manifest["n_partitions"], n_partitions + 1).astype(int)
+        for i in range(bounds[index], bounds[index + 1]):
+            yield from iter_table(partition_path(csv_path, i), columns, chunk_rows)
+    elif columnar_is_current(csv_path):
+        with pa.memory_map(columnar_path(csv_path)) as source:
+            reader = pa.ipc.open_file(source)
+            bounds = np.linspace(0, reader.num_record_batches, n_partitions + 1).astype(int)
+            batches, rows = [], 0
+            for i in range(bounds[index], bounds[index + 1]):
+                batch = reader.get_batch(i)
+                batches.append(batch.select(columns) if columns is not None else batch)
+                rows += batch.num_rows
+                if rows >= chunk_rows:
+                    yield to_columnar_types(pa.Table.from_batches(batches).to_pandas())
+                    batches, rows = [], 0
+            if batches:
+                yield to_columnar_types(pa.Table.from_batches(batches).to_pandas())
+    else:
+        if n_partitions > 1:
+            raise ValueError("CSV stage outputs can only be streamed as a single partition")
+        header = pd.read_csv(csv_path, nrows=0).columns
+        parse_dates = [c for c in DATE_COLUMNS if c in header and (columns is None or c in columns)]
+        yield from pd.read_csv(csv_path, usecols=columns, parse_dates=parse_dates, chunksize=chunk_rows)
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (PROJECT_DIR, os.path.join(PROJECT_DIR, "benchmarks"), os.path.join(PROJECT_DIR, "scripts")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from data_preprocessing import clean_transactions  # noqa: E402
+from synthetic_data import generate_transactions  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def raw_transactions():
+    """Synthetic raw Online Retail rows (missing CustomerIDs, cancellations, multi-line invoices)"""
+    return generate_transactions(20_000, n_customers=400, seed=7)
+
+
+@pytest.fixture(scope="session")
+def transactions(raw_transactions):
+    """Cleaned line items, as data_preprocessing.py writes them"""
+    return clean_transactions(raw_transactions).reset_index(drop=True)
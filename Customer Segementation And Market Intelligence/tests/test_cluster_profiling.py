@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from cluster_profiling import PERSONAS, profile_clusters
+from rfm import RFM_COLUMNS
+
+
+@pytest.fixture
+def clustered():
+    rng = np.random.default_rng(3)
+    n = 3000
+    rfm = pd.DataFrame({"Recency": rng.integers(0, 365, n).astype(float),
+                        "Frequency": rng.poisson(4, n).astype(float),
+                        "Monetary": rng.gamma(2.0, 300.0, n),
+                        "Cluster": rng.integers(0, 4, n)})
+    rfm.loc[rfm["Cluster"] == 1, "Monetary"] *= 1.5
+    rfm.loc[rfm["Cluster"] == 2, "Recency"] += 30
+    return rfm
+
+
+def test_stats_match_pandas(clustered):
+    profile = profile_clusters(clustered)
+    groups = clustered.groupby("Cluster")
+    pd.testing.assert_series_equal(profile.stats["Count"], groups.size(), check_names=False, check_dtype=False)
+    for column in RFM_COLUMNS:
+        expected = groups[column]
+        for statistic, values in (("mean", expected.mean()), ("std", expected.std()), ("min", expected.min()),
+                                  ("q25", expected.quantile(0.25)), ("median", expected.median()),
+                                  ("q75", expected.quantile(0.75)), ("max", expected.max())):
+            np.testing.assert_allclose(profile.stats[(column, statistic)], values, rtol=1e-10,
+                                       err_msg=f"{column} {statistic}")
+
+
+def test_tests_match_scipy(clustered):
+    profile = profile_clusters(clustered)
+    for column in RFM_COLUMNS:
+        groups = [group[column].to_numpy() for _, group in clustered.groupby("Cluster")]
+        anova, kruskal = stats.f_oneway(*groups), stats.kruskal(*groups)
+        row = profile.tests.loc[column]
+        np.testing.assert_allclose([row["ANOVA_F"], row["ANOVA_p"], row["Kruskal_H"], row["Kruskal_p"]],
+                                   [anova.statistic, anova.pvalue, kruskal.statistic, kruskal.pvalue], rtol=1e-8)
+
+
+def test_kruskal_with_millions_of_ties():
+    # ~2.4M customers share the value 0: that tie count cubed exceeds int64
+    rng = np.random.default_rng(5)
+    n = 3_000_000
+    labels = rng.integers(0, 3, n)
+    values = rng.random(n) < 0.2 + 0.001 * labels
+    rfm = pd.DataFrame({"Frequency": values.astype(float), "Cluster": labels})
+    row = profile_clusters(rfm, columns=["Frequency"]).tests.loc["Frequency"]
+    expected = stats.kruskal(*(values[labels == label] for label in range(3)))
+    np.testing.assert_allclose([row["Kruskal_H"], row["Kruskal_p"]], [expected.statistic, expected.pvalue], rtol=1e-6)
+
+
+def test_personas_follow_profiles_not_ids():
+    # One cluster per template, centred on the template's standardized profile
+    rng = np.random.default_rng(0)
+    names = list(PERSONAS)
+    frames = []
+    for cluster_id, name in zip([7, 3, 5, 1], names):
+        center = np.array(PERSONAS[name]["profile"]) * 100 + 1000
+        frames.append(pd.DataFrame(center + rng.normal(0, 5, (500, 3)), columns=RFM_COLUMNS).assign(Cluster=cluster_id))
+    rfm = pd.concat(frames, ignore_index=True)
+    profile = profile_clusters(rfm)
+    assert {cluster_id: profile.persona(cluster_id)["name"] for cluster_id in (7, 3, 5, 1)} == dict(zip([7, 3, 5, 1], names))
+    assert profile.persona(99)["name"] == "General Segment"
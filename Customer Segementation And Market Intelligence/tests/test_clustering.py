@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from clustering import BACKENDS, make_backend
+
+
+@pytest.fixture(scope="module")
+def blobs():
+    rng = np.random.default_rng(1)
+    centers = np.array([[0.0, 0.0], [6.0, 0.0], [0.0, 6.0]])
+    X = np.vstack([center + rng.normal(0, 1, (2000, 2)) for center in centers])
+    return X[rng.permutation(len(X))]
+
+
+@pytest.mark.parametrize("name", sorted(BACKENDS))
+def test_refit_starts_from_a_fresh_estimator(blobs, name):
+    shifted = blobs + 50
+    refitted = make_backend(name, 3, chunk_size=1000).fit(blobs).fit(shifted)
+    fresh = make_backend(name, 3, chunk_size=1000).fit(shifted)
+    np.testing.assert_allclose(refitted.cluster_centers_, fresh.cluster_centers_)
+    np.testing.assert_allclose(refitted.inertia_, fresh.inertia_)
+    np.testing.assert_array_equal(refitted.predict(shifted), fresh.model.predict(shifted))
+
+
+def test_partial_fit_is_a_declared_capability(blobs):
+    exact, minibatch = make_backend("kmeans", 3), make_backend("minibatch", 3, chunk_size=1000)
+    assert not exact.supports_partial_fit and not hasattr(exact, "partial_fit")
+    assert minibatch.supports_partial_fit
+
+    minibatch.fit(blobs)
+    before = minibatch.cluster_centers_.copy()
+    minibatch.fit_stream(np.array_split(blobs + 1, 4))
+    assert minibatch.model.n_steps_ > 0 and not np.allclose(minibatch.cluster_centers_, before)
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard_cube import (RFM_PAIRS, bin_edges, build_cube, cluster_ids, cluster_summary, density, histogram,
+                            load_cube, overall_summary, page_rows, save_cube, sort_by_cluster)
+from rfm import RFM_COLUMNS, compact_rfm, compute_rfm
+
+
+@pytest.fixture(scope="module")
+def rfm(transactions):
+    """Compact RFM table with four clusters of uneven size"""
+    rfm = compute_rfm(transactions)
+    clusters = pd.qcut(rfm["Monetary"].rank(method="first"), [0, 0.5, 0.8, 0.95, 1], labels=False)
+    return compact_rfm(rfm.assign(Cluster=clusters))
+
+
+@pytest.fixture(scope="module")
+def cube(rfm):
+    return build_cube(rfm)
+
+
+def test_counts_and_sums_match_groupby(rfm, cube):
+    groups = rfm.astype({column: np.float64 for column in RFM_COLUMNS}).groupby("Cluster")
+    assert cluster_ids(cube) == sorted(groups.groups)
+
+    summary = cluster_summary(cube)
+    np.testing.assert_array_equal(summary["Count"], groups.size())
+    for cluster_id, sums in groups[RFM_COLUMNS].sum().iterrows():
+        np.testing.assert_allclose([cube["clusters"][str(cluster_id)]["sum"][c] for c in RFM_COLUMNS], sums,
+                                   rtol=1e-9)
+    pd.testing.assert_frame_equal(summary[RFM_COLUMNS], groups[RFM_COLUMNS].mean(), check_names=False,
+                                  check_index_type=False, rtol=1e-9)
+
+    selected = [0, 3]
+    count, means = overall_summary(cube, selected)
+    subset = rfm[rfm["Cluster"].isin(selected)].astype({column: np.float64 for column in RFM_COLUMNS})
+    assert count == len(subset)
+    np.testing.assert_allclose([means[c] for c in RFM_COLUMNS], subset[RFM_COLUMNS].mean(), rtol=1e-9)
+
+
+def test_histograms_cover_every_customer(rfm, cube):
+    sizes = rfm["Cluster"].value_counts()
+    for column in RFM_COLUMNS:
+        _, counts = histogram(cube, column)
+        for cluster_id, cluster_counts in counts.items():
+            assert cluster_counts.sum() == sizes[cluster_id]
+            edges = cube["edges"][column]
+            values = rfm.loc[rfm["Cluster"] == cluster_id, column]
+            np.testing.assert_array_equal(cluster_counts, np.histogram(values, bins=edges)[0])
+
+    for x, y in RFM_PAIRS:
+        # Each 2D histogram's marginals are the 1D histograms
+        _, _, counts = density(cube, x, y, [1, 2])
+        assert counts.sum() == sizes[[1, 2]].sum()
+        np.testing.assert_array_equal(counts.sum(axis=0), sum(histogram(cube, x, [1, 2])[1].values()))
+        np.testing.assert_array_equal(counts.sum(axis=1), sum(histogram(cube, y, [1, 2])[1].values()))
+
+
+def test_long_tailed_columns_are_spread_over_bins(rfm, cube):
+    linear = np.histogram(rfm["Monetary"], bins=cube["bins"])[0]
+    assert linear.max() > 0.8 * len(rfm)
+
+    for column in ["Frequency", "Monetary"]:
+        totals = sum(histogram(cube, column)[1].values())
+        assert totals.max() < 0.5 * len(rfm)
+        assert (totals > 0).sum() >= 8
+
+    # Whole-valued Frequency: every edge lies between two whole values, so each bin holds at least one of them
+    edges = np.asarray(cube["edges"]["Frequency"])
+    np.testing.assert_array_equal(edges % 1, 0.5)
+    centers, _ = histogram(cube, "Frequency")
+    assert np.all((centers > edges[:-1]) & (centers < edges[1:]))
+
+
+def test_log_edges_handle_negative_values():
+    values = pd.Series([-250.0, -3.0, 0.0, 2.0, 15.0, 900.0, 48_000.0])
+    edges = bin_edges(values, 10, log=True)
+    assert edges[0] == values.min() and edges[-1] == values.max()
+    assert np.all(np.diff(edges) > 0)
+    assert np.histogram(values, bins=edges)[0].sum() == len(values)
+
+
+def test_linear_cube_without_log_columns(rfm, cube, tmp_path):
+    path = str(tmp_path / "cube.json")
+    save_cube(cube, path)
+    assert load_cube(path) == cube
+
+    # Cubes written before log_columns existed have linear bins with arithmetic centers
+    legacy = {key: value for key, value in build_cube(rfm).items() if key != "log_columns"}
+    legacy["edges"] = {column: np.linspace(0, 30, legacy["bins"] + 1).tolist() for column in RFM_COLUMNS}
+    centers, _ = histogram(legacy, "Monetary")
+    np.testing.assert_allclose(centers, np.arange(0.5, 30, 1))
+
+
+def test_page_rows_follow_cluster_order(rfm):
+    sorted_rfm, ranges = sort_by_cluster(rfm)
+    selected = [1, 3]
+    expected = pd.concat([rfm[rfm["Cluster"] == c] for c in selected])
+    pages = [page_rows(sorted_rfm, ranges, selected, page, 25) for page in range(len(expected) // 25 + 1)]
+    pd.testing.assert_frame_equal(pd.concat(pages), expected)
@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+
+from data_preprocessing import preprocess_in_memory, preprocess_partitioned, preprocess_streaming
+from invoices import invoices_path
+from partitions import customer_totals_path, load_partitioned_rfm, load_partitioned_state
+from rfm import compute_rfm
+from rfm_state import RFMState
+from storage import load_table
+
+RFM_INPUT_COLUMNS = ["InvoiceNo", "InvoiceDate", "CustomerID", "TotalPrice"]
+
+
+@pytest.fixture(scope="module")
+def raw_csv(raw_transactions, tmp_path_factory):
+    path = tmp_path_factory.mktemp("raw") / "raw.csv"
+    raw_transactions.to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture(scope="module")
+def in_memory(raw_csv, tmp_path_factory):
+    output = str(tmp_path_factory.mktemp("in_memory") / "Preprocessed.csv")
+    preprocess_in_memory(raw_csv, output, invoices_output=invoices_path(output))
+    return output
+
+
+def test_in_memory_matches_clean_transactions(in_memory, transactions):
+    data = load_table(in_memory, columns=RFM_INPUT_COLUMNS)
+    assert len(data) == len(transactions)
+    pd.testing.assert_frame_equal(compute_rfm(data), compute_rfm(transactions), check_dtype=False)
+
+
+def test_streaming_matches_in_memory(raw_csv, in_memory, tmp_path):
+    output = str(tmp_path / "Preprocessed.csv")
+    preprocess_streaming(raw_csv, output, max_memory_mb=0.5, invoices_output=invoices_path(output))
+    streamed = load_table(output, columns=RFM_INPUT_COLUMNS)
+    expected = load_table(in_memory, columns=RFM_INPUT_COLUMNS)
+    assert len(streamed) == len(expected)
+    pd.testing.assert_frame_equal(compute_rfm(streamed), compute_rfm(expected), check_dtype=False)
+
+    # Invoices split across chunks are merged back into one row
+    invoices = load_table(invoices_path(output))
+    assert len(invoices) == len(load_table(invoices_path(in_memory)))
+    pd.testing.assert_frame_equal(compute_rfm(invoices, invoices=True), compute_rfm(expected), check_dtype=False,
+                                  check_exact=False, rtol=1e-6)
+
+
+def test_partitioned_matches_in_memory(raw_csv, in_memory, tmp_path):
+    output = str(tmp_path / "Preprocessed.csv")
+    preprocess_partitioned(raw_csv, output, n_partitions=3, n_jobs=1, max_memory_mb=0.5)
+    expected = compute_rfm(load_table(in_memory, columns=RFM_INPUT_COLUMNS))
+
+    partitioned = load_table(output, columns=RFM_INPUT_COLUMNS)
+    pd.testing.assert_frame_equal(compute_rfm(partitioned).sort_index(), expected, check_dtype=False,
+                                  check_exact=False, rtol=1e-6)
+    pd.testing.assert_frame_equal(load_partitioned_rfm(customer_totals_path(output)).sort_index(), expected,
+                                  check_dtype=False, check_exact=False, rtol=1e-6)
+
+    # The state rebuilt partition by partition matches the one built from the full history
+    state = load_partitioned_state(output, n_jobs=1)
+    full = RFMState.from_transactions(load_table(in_memory, columns=RFM_INPUT_COLUMNS))
+    pd.testing.assert_frame_equal(state.customers.sort_index(), full.customers.sort_index(), check_dtype=False,
+                                  check_exact=False, rtol=1e-6)
+    assert len(state.invoice_pairs) == len(full.invoice_pairs)
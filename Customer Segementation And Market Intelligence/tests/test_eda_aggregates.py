@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from eda_aggregates import EDA_COLUMNS, INVOICE_EDA_COLUMNS, PRODUCT_EDA_COLUMNS, aggregate_table
+from invoices import aggregate_invoices
+from rfm import compute_rfm
+from storage import ColumnarChunkWriter, count_partitions
+
+# Feather tables store TotalPrice as float32
+PRICE_RTOL = 1e-5
+
+
+def write_chunked(data, path, chunk_rows):
+    """Feather table with one record batch per chunk_rows rows, as streaming preprocessing writes it"""
+    writer = ColumnarChunkWriter(path)
+    for start in range(0, len(data), chunk_rows):
+        writer.write(data.iloc[start:start + chunk_rows])
+    writer.close()
+    return path
+
+
+@pytest.fixture(scope="module")
+def line_items(transactions, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("eda") / "Preprocessed.csv")
+    return write_chunked(transactions[EDA_COLUMNS], path, chunk_rows=1_500)
+
+
+@pytest.fixture(scope="module")
+def expected(transactions):
+    """Totals from full-table pandas groupbys"""
+    months = transactions["InvoiceDate"].dt.to_period("M").rename("InvoiceMonth")
+    return {
+        "country": transactions.groupby("Country", observed=True)["TotalPrice"].sum(),
+        "product": transactions.groupby("Description", observed=True)["Quantity"].sum(),
+        "monthly": transactions.groupby(months)["TotalPrice"].sum(),
+        "rfm": compute_rfm(transactions),
+    }
+
+
+def assert_top_k_matches(top, totals, k=10, rtol=PRICE_RTOL):
+    """Same k largest totals, largest first; ties may come in any order"""
+    np.testing.assert_allclose(top.to_numpy(), np.sort(totals.to_numpy())[::-1][:k], rtol=rtol)
+    np.testing.assert_allclose(top.to_numpy(), totals.reindex(top.index.astype(str)).to_numpy(), rtol=rtol)
+
+
+def assert_matches_groupby(aggregates, expected, n_rows):
+    assert aggregates.rows == n_rows
+    country = expected["country"].set_axis(expected["country"].index.astype(str))
+    product = expected["product"].set_axis(expected["product"].index.astype(str))
+    pd.testing.assert_series_equal(aggregates.country_sales.sort_index(), country.sort_index(),
+                                   check_names=False, check_index_type=False, check_exact=False, rtol=PRICE_RTOL)
+    pd.testing.assert_series_equal(aggregates.product_quantity.sort_index(), product.sort_index().astype(np.float64),
+                                   check_names=False, check_index_type=False)
+    pd.testing.assert_series_equal(aggregates.monthly(), expected["monthly"], check_names=False,
+                                   check_exact=False, rtol=PRICE_RTOL)
+    assert_top_k_matches(aggregates.top_countries(), country)
+    assert_top_k_matches(aggregates.top_products(), product, rtol=0)
+    pd.testing.assert_frame_equal(aggregates.rfm().sort_index(), expected["rfm"], check_dtype=False,
+                                  check_exact=False, rtol=PRICE_RTOL)
+
+
+@pytest.mark.parametrize("n_partitions", [1, 4])
+def test_chunked_aggregates_match_groupby(line_items, expected, transactions, n_partitions):
+    # Small chunks and several partitions, so most keys are summed from partials
+    assert count_partitions(line_items, n_partitions) == n_partitions
+    aggregates = aggregate_table(line_items, n_partitions=n_partitions, n_jobs=1, chunk_rows=2_000)
+    assert_matches_groupby(aggregates, expected, len(transactions))
+
+
+def test_invoice_and_product_passes_match_groupby(line_items, expected, transactions, tmp_path):
+    # The split eda.py makes when the invoice table is current
+    invoices = aggregate_invoices(transactions)
+    invoice_table = write_chunked(invoices, str(tmp_path / "Invoices.csv"), chunk_rows=700)
+    aggregates = aggregate_table(invoice_table, n_partitions=3, n_jobs=1, chunk_rows=1_000,
+                                 columns=INVOICE_EDA_COLUMNS)
+    products = aggregate_table(line_items, n_partitions=3, n_jobs=1, chunk_rows=1_000, columns=PRODUCT_EDA_COLUMNS)
+    aggregates.merge(products)
+    assert_matches_groupby(aggregates, expected, len(invoices) + len(transactions))
+
+
+def test_csv_is_streamed_in_chunks(transactions, expected, tmp_path):
+    path = str(tmp_path / "Preprocessed.csv")
+    transactions[EDA_COLUMNS].to_csv(path, index=False)
+    aggregates = aggregate_table(path, n_partitions=4, chunk_rows=1_000)
+    assert_matches_groupby(aggregates, expected, len(transactions))
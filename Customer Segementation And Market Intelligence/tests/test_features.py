@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from features import SKETCH_BINS, SKETCH_LIMIT, RFMTransformer, signed_log1p
+from rfm import RFM_COLUMNS, compute_rfm
+
+# One histogram bin of the quantile sketch, on the signed-log scale
+BIN_WIDTH = 2 * SKETCH_LIMIT / SKETCH_BINS
+
+
+@pytest.fixture(scope="module")
+def skewed_rfm():
+    """50,000 customers with integer Recency/Frequency and a long-tailed Monetary, some of it negative"""
+    rng = np.random.default_rng(11)
+    n = 50_000
+    monetary = rng.lognormal(6.0, 1.5, n)
+    monetary[rng.random(n) < 0.02] *= -0.1
+    return pd.DataFrame({"Recency": rng.integers(0, 374, n),
+                         "Frequency": 1 + rng.negative_binomial(1, 0.2, n),
+                         "Monetary": monetary},
+                        index=pd.Index(np.arange(12346, 12346 + n), name="CustomerID"))[RFM_COLUMNS]
+
+
+def exact_statistics(values, cap_quantiles=(0.01, 0.99)):
+    """Capping bounds, median and IQR from exact quantiles"""
+    low, high, q1, median, q3 = np.quantile(values, [*cap_quantiles, 0.25, 0.5, 0.75], axis=0)
+    return low, high, median, q3 - q1
+
+
+def test_robust_statistics_match_exact_quantiles(skewed_rfm):
+    transformer = RFMTransformer().fit(skewed_rfm)
+    logged = signed_log1p(skewed_rfm.to_numpy(dtype=np.float64))
+    low, high, median, iqr = exact_statistics(logged)
+
+    np.testing.assert_allclose(transformer.lower_, low, atol=2 * BIN_WIDTH)
+    np.testing.assert_allclose(transformer.upper_, high, atol=2 * BIN_WIDTH)
+    np.testing.assert_allclose(transformer.center_, median, atol=2 * BIN_WIDTH)
+    np.testing.assert_allclose(transformer.scale_, iqr, atol=4 * BIN_WIDTH)
+
+
+def test_statistics_without_log_match_exact_quantiles(skewed_rfm):
+    transformer = RFMTransformer(log=False).fit(skewed_rfm)
+    low, high, median, iqr = exact_statistics(skewed_rfm.to_numpy(dtype=np.float64))
+
+    # The sketch works on the log scale, so its resolution is relative in original units
+    np.testing.assert_allclose(transformer.lower_, low, rtol=2 * BIN_WIDTH, atol=2 * BIN_WIDTH)
+    np.testing.assert_allclose(transformer.upper_, high, rtol=2 * BIN_WIDTH, atol=2 * BIN_WIDTH)
+    np.testing.assert_allclose(transformer.center_, median, rtol=2 * BIN_WIDTH, atol=2 * BIN_WIDTH)
+    np.testing.assert_allclose(transformer.scale_, iqr, rtol=4 * BIN_WIDTH, atol=4 * BIN_WIDTH)
+
+
+def test_transform_logs_caps_and_scales(skewed_rfm):
+    transformer = RFMTransformer().fit(skewed_rfm)
+    X = transformer.transform(skewed_rfm)
+    assert X.dtype == np.float32
+
+    logged = signed_log1p(skewed_rfm.to_numpy(dtype=np.float64))
+    expected = (np.clip(logged, transformer.lower_, transformer.upper_) - transformer.center_) / transformer.scale_
+    np.testing.assert_allclose(X, expected, rtol=1e-5, atol=1e-5)
+
+    # About 1% of the long-tailed Monetary is capped at each end
+    monetary = X[:, RFM_COLUMNS.index("Monetary")]
+    for bound in (monetary.min(), monetary.max()):
+        assert 0.005 < np.mean(np.isclose(monetary, bound)) < 0.02
+    np.testing.assert_allclose(np.median(X, axis=0), 0.0, atol=2 * BIN_WIDTH)
+
+    np.testing.assert_array_equal(transformer.fit_transform(skewed_rfm), X)
+
+
+def test_inverse_transform_round_trips_uncapped_values(skewed_rfm):
+    transformer = RFMTransformer().fit(skewed_rfm)
+    X = transformer.transform(skewed_rfm)
+    original = skewed_rfm.to_numpy(dtype=np.float64)
+    uncapped = (X > X.min(axis=0)) & (X < X.max(axis=0))
+    np.testing.assert_allclose(transformer.inverse_transform(X)[uncapped], original[uncapped], rtol=1e-5)
+
+
+def test_chunked_and_merged_fits_match_one_pass(transactions, skewed_rfm):
+    for rfm in (compute_rfm(transactions), skewed_rfm):
+        full = RFMTransformer().fit(rfm)
+        chunks = np.array_split(np.arange(len(rfm)), 7)
+
+        streamed = RFMTransformer().fit_stream(rfm.iloc[chunk] for chunk in chunks)
+        merged = RFMTransformer().partial_fit(rfm.iloc[chunks[0]])
+        for chunk in chunks[1:]:
+            merged.merge(RFMTransformer().partial_fit(rfm.iloc[chunk]))
+        merged.finalize()
+
+        for transformer in (streamed, merged):
+            np.testing.assert_array_equal(transformer.counts_, full.counts_)
+            assert transformer.n_samples_ == len(rfm)
+            np.testing.assert_array_equal(transformer.transform(rfm), full.transform(rfm))
+
+
+def test_requires_data_and_known_scaling():
+    with pytest.raises(ValueError):
+        RFMTransformer().finalize()
+    with pytest.raises(ValueError):
+        RFMTransformer(scaling="standard")
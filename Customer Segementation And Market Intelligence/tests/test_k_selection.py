@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from scipy.spatial.distance import cdist
+
+from k_selection import plateaued, simplified_silhouette, warm_sweep_k
+
+
+def test_plateau_needs_both_criteria():
+    previous = {"Inertia": 100.0, "Silhouette": 0.6}
+    flat_elbow_better_silhouette = {"Inertia": 99.0, "Silhouette": 0.7}
+    steep_elbow_worse_silhouette = {"Inertia": 50.0, "Silhouette": 0.5}
+    both_flat = {"Inertia": 99.0, "Silhouette": 0.5}
+    assert not plateaued(previous, flat_elbow_better_silhouette, 100.0, 0.25, 0.0, 0.6)
+    assert not plateaued(previous, steep_elbow_worse_silhouette, 100.0, 0.25, 0.0, 0.6)
+    assert plateaued(previous, both_flat, 100.0, 0.25, 0.0, 0.6)
+    assert plateaued(previous, {"Inertia": 99.0}, 100.0, 0.25, 0.0, -np.inf)
+
+
+def test_warm_sweep_reaches_nested_clusters():
+    # Two rows of three blobs: silhouette dips at K=3-5 while the elbow keeps dropping, peaking at K=6
+    rng = np.random.default_rng(0)
+    centers = [(x, y) for y in (0, 21) for x in (0, 7, 14)]
+    X = np.vstack([np.array(center) + rng.normal(0, 1, (300, 2)) for center in centers])
+    results, models = warm_sweep_k(X, k_range=range(2, 11), n_init=3, scoring=["silhouette"], patience=2)
+    assert 6 in results.index and results["Silhouette"].idxmax() == 6
+    assert set(models) == set(results.index)
+
+
+def test_simplified_silhouette_is_chunk_independent():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(1_000, 3))
+    centers = rng.normal(size=(4, 3))
+    labels = cdist(X, centers).argmin(axis=1)
+    labels[::10] = (labels[::10] + 1) % 4  # some points are closer to another centroid
+
+    distances = cdist(X, centers)
+    own = distances[np.arange(len(X)), labels]
+    nearest_other = np.where(np.arange(4) == labels[:, None], np.inf, distances).min(axis=1)
+    expected = np.mean((nearest_other - own) / np.maximum(own, nearest_other))
+
+    for chunk_size in (len(X), 97, 1):
+        assert simplified_silhouette(X, labels, centers, chunk_size=chunk_size) == pytest.approx(expected, rel=1e-12)
@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from plotting import FigureRenderer, histogram_with_kde, input_hash, render_line
+
+
+def render_twice(tmp_path, first, second):
+    """Submit `first`, then `second` in a new renderer (as two script runs); returns what submit() returned"""
+    results = []
+    for submission in (first, second):
+        filename, render, args, kwargs = submission
+        with FigureRenderer(str(tmp_path), max_workers=1, cache_name="test") as figures:
+            results.append(figures.submit(filename, render, *args, **kwargs))
+    return results
+
+
+def line_inputs(y):
+    x = np.arange(len(y))
+    return ("line.png", render_line, (x, y, "title", "x", "y"), {"marker": "o"})
+
+
+def test_unchanged_inputs_are_skipped(tmp_path, capsys):
+    y = np.linspace(0, 1, 20)
+    assert render_twice(tmp_path, line_inputs(y), line_inputs(y.copy())) == [True, False]
+    assert "Figures: 0 rendered, 1 unchanged" in capsys.readouterr().out
+    assert os.path.exists(tmp_path / "line.png")
+    assert os.path.exists(tmp_path / ".plot_cache.test.json")
+
+
+def test_changed_inputs_are_rendered_again(tmp_path):
+    y = np.linspace(0, 1, 20)
+    changed = y.copy()
+    changed[7] += 1e-9
+    assert render_twice(tmp_path, line_inputs(y), line_inputs(changed)) == [True, True]
+
+    filename, render, args, kwargs = line_inputs(y)
+    assert render_twice(tmp_path, line_inputs(y), (filename, render, args, {"marker": "x"})) == [True, True]
+
+
+def test_missing_output_is_rendered_again(tmp_path):
+    y = np.linspace(0, 1, 20)
+    render_twice(tmp_path, line_inputs(y), line_inputs(y))
+    os.remove(tmp_path / "line.png")
+    assert render_twice(tmp_path, line_inputs(y), line_inputs(y)) == [True, False]
+    assert os.path.exists(tmp_path / "line.png")
+
+
+def test_failed_render_is_not_cached(tmp_path):
+    filename, render, (x, y, *labels), kwargs = line_inputs(np.linspace(0, 1, 20))
+    figures = FigureRenderer(str(tmp_path), max_workers=1, cache_name="test")
+    figures.submit(filename, render, x, y[:5], *labels, **kwargs)
+    with pytest.raises(RuntimeError, match="line.png"):
+        figures.close()
+    assert filename not in figures.cache
+
+
+def test_input_hash_follows_values_not_identity():
+    frame = pd.DataFrame({"Recency": [3, 1, 2], "Monetary": [10.0, 20.0, 30.0]}, index=[12346, 12347, 12348])
+    assert input_hash(frame, {"bins": 30}) == input_hash(frame.copy(), {"bins": 30})
+    assert input_hash(frame) != input_hash(frame.set_axis([12346, 12347, 12349]))
+    assert input_hash(frame) != input_hash(frame.rename(columns={"Monetary": "Value"}))
+    assert input_hash(frame, {"bins": 30}) != input_hash(frame, {"bins": 31})
+    assert input_hash(np.arange(4)) != input_hash(np.arange(4).reshape(2, 2))
+    assert input_hash([1, 2], 3) != input_hash([1, 2, 3])
+
+
+def test_histogram_with_kde_matches_histogram():
+    values = np.random.default_rng(3).normal(50, 10, 10_000)
+    hist = histogram_with_kde(values, bins=40)
+    counts, edges = np.histogram(values, bins=40)
+    np.testing.assert_array_equal(hist["counts"], counts)
+    np.testing.assert_array_equal(hist["edges"], edges)
+    # The KDE is scaled to counts: its area matches the histogram's (up to mass past the range)
+    area = hist["kde_y"].sum() * (hist["kde_x"][1] - hist["kde_x"][0])
+    assert area == pytest.approx(counts.sum() * (edges[1] - edges[0]), rel=0.02)
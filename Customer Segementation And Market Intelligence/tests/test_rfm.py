@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from invoices import aggregate_invoices
+from rfm import COMPACT_DTYPES, compact_rfm, compute_rfm
+
+
+def reference_rfm(data, reference_date):
+    """The original per-customer lambda groupby"""
+    return data.groupby("CustomerID").agg(
+        Recency=("InvoiceDate", lambda dates: (reference_date - dates.max()).days),
+        Frequency=("InvoiceNo", "nunique"),
+        Monetary=("TotalPrice", "sum"),
+    )
+
+
+def test_compute_rfm_matches_groupby(transactions):
+    reference_date = transactions["InvoiceDate"].max()
+    rfm = compute_rfm(transactions, reference_date=reference_date)
+    expected = reference_rfm(transactions, reference_date)
+    pd.testing.assert_frame_equal(rfm, expected, check_dtype=False)
+
+
+def test_compute_rfm_defaults_to_latest_date(transactions):
+    pd.testing.assert_frame_equal(compute_rfm(transactions),
+                                  compute_rfm(transactions, reference_date=transactions["InvoiceDate"].max()))
+
+
+def test_compute_rfm_from_invoices_matches_line_items(transactions):
+    reference_date = transactions["InvoiceDate"].max()
+    from_invoices = compute_rfm(aggregate_invoices(transactions), reference_date=reference_date, invoices=True)
+    pd.testing.assert_frame_equal(from_invoices, compute_rfm(transactions, reference_date=reference_date),
+                                  check_exact=False, rtol=1e-12)
+
+
+def test_compact_rfm_dtypes_and_range(transactions):
+    rfm = compute_rfm(transactions)
+    compact = compact_rfm(rfm)
+    for column in rfm.columns:
+        assert compact[column].dtype == COMPACT_DTYPES[column]
+    assert compact.index.is_monotonic_increasing
+    np.testing.assert_allclose(compact["Monetary"], rfm.sort_index()["Monetary"], rtol=1e-6)
+
+    with pytest.raises(ValueError, match="Recency"):
+        compact_rfm(rfm.assign(Recency=-1))
@@ -0,0 +1,67 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import StandardScaler
+
+import rfm_snapshots
+from clustering import make_backend
+from rfm import compute_rfm
+from rfm_snapshots import ABSENT, iter_snapshot_rfm, monthly_reference_dates, transition_matrix
+from segmentation_model import save_model, scale_features
+from storage import load_table, save_table
+
+
+@pytest.mark.parametrize("window_days", [None, 60])
+def test_snapshots_match_filtered_compute_rfm(transactions, window_days):
+    reference_dates = monthly_reference_dates(transactions["InvoiceDate"], 6)
+    snapshots = list(iter_snapshot_rfm(transactions, reference_dates, window_days))
+    assert [date for date, _ in snapshots] == list(reference_dates)
+    for reference_date, rfm in snapshots:
+        visible = transactions["InvoiceDate"] <= reference_date
+        if window_days is not None:
+            visible &= transactions["InvoiceDate"] > reference_date - pd.Timedelta(days=window_days)
+        expected = compute_rfm(transactions[visible], reference_date=reference_date)
+        pd.testing.assert_frame_equal(rfm, expected, check_dtype=False, check_exact=False, rtol=1e-9, atol=1e-6)
+
+
+def test_monthly_reference_dates_are_ascending_month_starts(transactions):
+    dates = monthly_reference_dates(transactions["InvoiceDate"], 4)
+    assert len(dates) == 4 and dates.is_monotonic_increasing
+    assert all(date.day == 1 for date in dates)
+    assert dates[-1] <= transactions["InvoiceDate"].max()
+
+
+def test_transition_matrix_counts_consecutive_pairs():
+    segments = pd.DataFrame({"2011-01-01": [ABSENT, 0, 1, 1],
+                             "2011-02-01": [0, 0, 1, ABSENT],
+                             "2011-03-01": [1, 0, ABSENT, ABSENT]})
+    matrix = transition_matrix(segments, n_clusters=2)
+    pairs = pd.DataFrame({"From": segments.iloc[:, :-1].to_numpy().ravel(),
+                          "To": segments.iloc[:, 1:].to_numpy().ravel()}).replace(ABSENT, "Absent")
+    expected = pd.crosstab(pairs["From"], pairs["To"]).reindex(index=matrix.index, columns=matrix.columns,
+                                                              fill_value=0)
+    np.testing.assert_array_equal(matrix.to_numpy(), expected.to_numpy())
+    np.testing.assert_allclose(transition_matrix(segments, 2, normalize=True).sum(axis=1)[matrix.sum(axis=1) > 0], 1)
+
+
+def test_main_reports_the_files_it_wrote(transactions, tmp_path, monkeypatch, capsys):
+    rfm = compute_rfm(transactions)
+    scaler = StandardScaler().fit(rfm.to_numpy())
+    save_model(scaler, make_backend("kmeans", 3, n_init=3).fit(scale_features(scaler, rfm.to_numpy())),
+               model_dir=tmp_path)
+    save_table(transactions, str(tmp_path / "preprocessed.csv"))
+    monkeypatch.setattr(sys, "argv", ["rfm_snapshots.py", "--input", str(tmp_path / "preprocessed.csv"),
+                                      "--months", "4", "--model-dir", str(tmp_path),
+                                      "--segments-out", str(tmp_path / "segments.csv"),
+                                      "--transitions-out", str(tmp_path / "transitions.csv")])
+    rfm_snapshots.main()
+
+    output = capsys.readouterr().out
+    segments_path = output.split("saved to ", 1)[1].splitlines()[0]
+    assert os.path.exists(segments_path)
+    segments = load_table(str(tmp_path / "segments.csv"))
+    assert list(segments.columns[1:]) == sorted(segments.columns[1:]) and len(segments.columns) == 5
+    assert os.path.exists(tmp_path / "transitions.csv")
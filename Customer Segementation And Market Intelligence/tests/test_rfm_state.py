@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from rfm import compute_rfm
+from rfm_state import RFMState
+
+
+def test_incremental_batches_match_full_history(transactions):
+    reference_date = transactions["InvoiceDate"].max()
+    ordered = transactions.sort_values("InvoiceDate", kind="stable")
+    state = RFMState()
+    for rows in np.array_split(np.arange(len(ordered)), 4):
+        state.update(ordered.iloc[rows])
+    pd.testing.assert_frame_equal(state.to_rfm(reference_date), compute_rfm(transactions, reference_date),
+                                  check_dtype=False)
+
+
+def test_merge_counts_split_invoices_once(transactions):
+    # Random row halves split most invoices across both partitions
+    rng = np.random.default_rng(0)
+    left = rng.random(len(transactions)) < 0.5
+    merged = RFMState.from_transactions(transactions[left]).merge(RFMState.from_transactions(transactions[~left]))
+    reference_date = transactions["InvoiceDate"].max()
+    expected = compute_rfm(transactions, reference_date)
+    pd.testing.assert_frame_equal(merged.to_rfm(reference_date), expected, check_dtype=False,
+                                  check_exact=False, rtol=1e-12)
+
+
+def test_refolding_a_batch_does_not_recount_invoices(transactions):
+    state = RFMState.from_transactions(transactions)
+    frequency = state.customers["Frequency"].copy()
+    state.update(transactions.head(100).assign(TotalPrice=0.0))
+    pd.testing.assert_series_equal(state.customers["Frequency"], frequency)
+
+
+def test_save_and_load_round_trip(transactions, tmp_path):
+    state = RFMState.from_transactions(transactions)
+    path = tmp_path / "rfm_state.npz"
+    state.save(path)
+    loaded = RFMState.load(path)
+    pd.testing.assert_frame_equal(loaded.to_rfm(), state.to_rfm())
+    assert len(loaded.invoice_pairs) == len(state.invoice_pairs)
+
+
+def test_pairs_stay_distinct_across_batches_reads_and_reloads(transactions, tmp_path):
+    # Row batches in file order split invoices across batches; pairs are read and the state reloaded midway
+    batches = np.array_split(np.arange(len(transactions)), 9)
+    state = RFMState()
+    for i, rows in enumerate(batches):
+        state.update(transactions.iloc[rows])
+        if i == 3:
+            assert state.invoice_pairs.is_unique
+        if i == 5:
+            state.save(tmp_path / "rfm_state.npz")
+            state = RFMState.load(tmp_path / "rfm_state.npz")
+        state.update(transactions.iloc[rows[:50]])
+
+    expected = transactions[["CustomerID", "InvoiceNo"]].drop_duplicates()
+    assert state.invoice_pairs.is_unique and len(state.invoice_pairs) == len(expected)
+    pd.testing.assert_series_equal(state.customers["Frequency"], compute_rfm(transactions)["Frequency"],
+                                   check_dtype=False)
@@ -0,0 +1,122 @@
+import json
+import os
+
+import pytest
+
+import run_analysis
+from run_analysis import Stage, code_files, run_pipeline
+
+COPY_SCRIPT = """
+import sys
+from helper import SUFFIX
+with open(sys.argv[1]) as f:
+    text = f.read()
+with open(sys.argv[2], "w") as f:
+    f.write(text + SUFFIX)
+"""
+
+# Bootstraps a state file it also reads, and writes a new versioned artifact per run
+VERSION_SCRIPT = """
+import glob, os, sys
+state, models = sys.argv[1], sys.argv[2]
+if not os.path.exists(state):
+    with open(state, "w") as f:
+        f.write("bootstrap")
+version = len(glob.glob(os.path.join(models, "model_v*.txt"))) + 1
+with open(os.path.join(models, f"model_v{version:03d}.txt"), "w") as f:
+    f.write(open(state).read())
+"""
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    scripts = tmp_path / "scripts"
+    scripts.mkdir()
+    (scripts / "copy_text.py").write_text(COPY_SCRIPT)
+    (scripts / "helper.py").write_text('SUFFIX = "!"\n')
+    (scripts / "fail.py").write_text("raise SystemExit(3)\n")
+    (scripts / "version.py").write_text(VERSION_SCRIPT)
+    monkeypatch.setattr(run_analysis, "SCRIPTS_DIR", str(scripts))
+    monkeypatch.setattr(run_analysis, "CACHE_PATH", str(tmp_path / "cache.json"))
+    monkeypatch.setattr(run_analysis, "REPORTS_DIR", str(tmp_path / "reports"))
+
+    source, middle, final = (str(tmp_path / name) for name in ("source.txt", "middle.txt", "final.txt"))
+    with open(source, "w") as f:
+        f.write("data")
+    stages = [Stage("first", "copy_text.py", "First", inputs=[source], outputs=[middle], args=[source, middle]),
+              Stage("second", "copy_text.py", "Second", inputs=[middle], outputs=[final], args=[middle, final],
+                    deps=["first"])]
+    return scripts, source, final, stages
+
+
+def statuses(run_dir):
+    with open(os.path.join(run_dir, "report.json")) as f:
+        return {record["stage"]: record["status"] for record in json.load(f)["stages"]}
+
+
+def test_code_files_follows_local_imports(pipeline):
+    scripts, *_ = pipeline
+    assert code_files("copy_text.py") == sorted([str(scripts / "copy_text.py"), str(scripts / "helper.py")])
+
+
+@pytest.mark.parametrize("in_process", [False, True])
+def test_unchanged_stages_are_skipped_and_changes_rerun(pipeline, in_process):
+    scripts, source, final, stages = pipeline
+    failed, run_dir = run_pipeline(stages, in_process=in_process)
+    assert not failed and statuses(run_dir) == {"first": "ok", "second": "ok"}
+    with open(final) as f:
+        assert f.read() == "data!!"
+
+    _, run_dir = run_pipeline(stages, in_process=in_process)
+    assert statuses(run_dir) == {"first": "up to date", "second": "up to date"}
+
+    # New input content reruns the stage and, through its changed output, the dependent stage
+    with open(source, "w") as f:
+        f.write("more")
+    _, run_dir = run_pipeline(stages, in_process=in_process)
+    assert statuses(run_dir) == {"first": "ok", "second": "ok"}
+
+    # So does a change to an imported local module
+    (scripts / "helper.py").write_text('SUFFIX = "?"\n')
+    _, run_dir = run_pipeline(stages, in_process=in_process)
+    assert statuses(run_dir) == {"first": "ok", "second": "ok"}
+    with open(final) as f:
+        assert f.read() == "more??"
+
+    # A deleted output reruns only its stage
+    os.remove(final)
+    _, run_dir = run_pipeline(stages, in_process=in_process)
+    assert statuses(run_dir) == {"first": "up to date", "second": "ok"}
+
+
+def test_failed_stage_skips_dependents(pipeline):
+    _, source, _, stages = pipeline
+    stages[0].script, stages[0].args = "fail.py", []
+    failed, run_dir = run_pipeline(stages)
+    assert failed == {"first", "second"}
+    assert statuses(run_dir) == {"first": "failed", "second": "not run"}
+
+
+def test_stage_writing_its_input_and_versioned_outputs(pipeline, tmp_path):
+    state, models = str(tmp_path / "state.txt"), tmp_path / "models"
+    models.mkdir()
+    stage = Stage("model", "version.py", "Model", inputs=[state], outputs=[str(models / "model_v*.txt")],
+                  args=[state, str(models)])
+
+    _, run_dir = run_pipeline([stage])
+    assert statuses(run_dir) == {"model": "ok"}
+    # The state the stage bootstrapped does not make it look stale
+    _, run_dir = run_pipeline([stage])
+    assert statuses(run_dir) == {"model": "up to date"}
+
+    # A batch folded into the state reruns it
+    with open(state, "a") as f:
+        f.write(" + batch")
+    _, run_dir = run_pipeline([stage])
+    assert statuses(run_dir) == {"model": "ok"}
+    assert sorted(os.listdir(models)) == ["model_v001.txt", "model_v002.txt"]
+
+    # Every version matching the output pattern is tracked
+    os.remove(models / "model_v001.txt")
+    _, run_dir = run_pipeline([stage])
+    assert statuses(run_dir) == {"model": "ok"}
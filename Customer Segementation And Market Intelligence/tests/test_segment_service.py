@@ -0,0 +1,74 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pytest
+from sklearn.preprocessing import StandardScaler
+
+import segment_service
+from clustering import make_backend
+from rfm import compute_rfm
+from segment_service import MicroBatcher, create_server
+from segmentation_model import load_model, predict_segments, save_model, scale_features
+
+
+@pytest.fixture(scope="module")
+def served(transactions, tmp_path_factory):
+    model_dir = tmp_path_factory.mktemp("models")
+    rfm = compute_rfm(transactions)
+    scaler = StandardScaler().fit(rfm.to_numpy())
+    model = make_backend("kmeans", 3, n_init=3).fit(scale_features(scaler, rfm.to_numpy(dtype=np.float64)))
+    save_model(scaler, model, model_dir=model_dir)
+    artifact = load_model(model_dir)
+
+    server = create_server(port=0, model_dir=model_dir, rfm=rfm)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", rfm, artifact
+    server.shutdown()
+    server.server_close()
+
+
+def request(url, payload=None):
+    data = None if payload is None else json.dumps(payload).encode()
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data)) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_lookups_match_batch_scoring(served):
+    base, rfm, artifact = served
+    expected = predict_segments(rfm, artifact)
+    customer_id = int(rfm.index[0])
+    assert request(f"{base}/segment?customer_id={customer_id}") == \
+        (200, {"customer_id": customer_id, "cluster": int(expected.iloc[0])})
+    status, body = request(f"{base}/segment/batch", {"customer_ids": rfm.index[:50].tolist()})
+    assert status == 200 and body["clusters"] == expected.iloc[:50].tolist()
+    status, body = request(f"{base}/segment/batch", {"rfm": rfm.to_numpy()[:50].tolist()})
+    assert status == 200 and body["clusters"] == expected.iloc[:50].tolist()
+
+
+def test_out_of_range_ids_are_bad_requests(served):
+    base, *_ = served
+    assert request(f"{base}/segment?customer_id={10 ** 30}")[0] == 400
+    assert request(f"{base}/segment/batch", {"customer_ids": [1, 10 ** 30]})[0] == 400
+    assert request(f"{base}/segment?customer_id=1")[0] == 404
+    assert request(f"{base}/health")[0] == 200
+
+
+def test_scoring_failure_fails_the_batch_not_the_batcher(served, monkeypatch):
+    _, rfm, artifact = served
+    batcher = MicroBatcher(artifact)
+    row = rfm.to_numpy()[:1]
+
+    def broken(X, centers):
+        raise RuntimeError("scoring failed")
+
+    monkeypatch.setattr(segment_service, "assign_clusters", broken)
+    with pytest.raises(RuntimeError, match="scoring failed"):
+        batcher.submit(row)
+    monkeypatch.undo()
+    np.testing.assert_array_equal(batcher.submit(row), predict_segments(rfm.iloc[:1], artifact).to_numpy())
@@ -0,0 +1,87 @@
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import StandardScaler
+
+from clustering import make_backend
+from features import RFMTransformer
+from rfm import RFM_COLUMNS, compute_rfm
+from segmentation_model import (align_clusters, load_estimator, load_model, model_versions, predict_segments,
+                                save_model, scale_features)
+
+
+@pytest.fixture(params=["standard", "robust"])
+def fitted(request, transactions):
+    rfm = compute_rfm(transactions)
+    scaler = StandardScaler().fit(rfm.to_numpy()) if request.param == "standard" else RFMTransformer().fit(rfm)
+    model = make_backend("kmeans", 3, n_init=3).fit(scale_features(scaler, rfm.to_numpy(dtype=np.float64)))
+    return rfm, scaler, model
+
+
+def test_artifact_round_trip_and_versions(fitted, tmp_path):
+    rfm, scaler, model = fitted
+    save_model(scaler, model, model_dir=tmp_path)
+    save_model(scaler, model, model_dir=tmp_path)
+    assert model_versions(tmp_path) == [1, 2]
+
+    artifact = load_model(tmp_path)
+    assert artifact["version"] == 2 and artifact["features"] == RFM_COLUMNS
+    np.testing.assert_array_equal(artifact["cluster_centers"], model.cluster_centers_)
+    np.testing.assert_array_equal(load_estimator(artifact, tmp_path).cluster_centers_, model.cluster_centers_)
+    with pytest.raises(FileNotFoundError):
+        load_model(tmp_path / "missing")
+
+
+def test_scoring_does_not_import_sklearn(fitted, tmp_path):
+    rfm, scaler, model = fitted
+    save_model(scaler, model, model_dir=tmp_path)
+    rfm.to_csv(tmp_path / "rfm.csv")
+    code = ("import sys\n"
+            "import pandas as pd\n"
+            "from segmentation_model import load_model, predict_segments\n"
+            f"rfm = pd.read_csv({str(tmp_path / 'rfm.csv')!r}, index_col='CustomerID')\n"
+            f"predict_segments(rfm, load_model({str(tmp_path)!r}))\n"
+            "print(sorted(m for m in ('sklearn', 'scipy') if m in sys.modules))")
+    # A fresh interpreter, with the test session's import path
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, env=env)
+    assert result.stdout.strip() == "[]"
+
+
+def test_predict_segments_matches_estimator(fitted, tmp_path):
+    rfm, scaler, model = fitted
+    save_model(scaler, model, model_dir=tmp_path)
+    artifact = load_model(tmp_path)
+    labels = predict_segments(rfm, artifact, chunk_size=97)
+    X = scale_features(scaler, rfm.to_numpy(dtype=np.float64))
+    np.testing.assert_array_equal(labels.to_numpy(), model.predict(X))
+    assert labels.index.equals(rfm.index)
+
+
+def test_align_clusters_recovers_renumbering(fitted, tmp_path):
+    _, scaler, model = fitted
+    save_model(scaler, model, model_dir=tmp_path)
+    reference = load_model(tmp_path)
+
+    permutation = np.array([2, 0, 1])
+    refit = SimpleNamespace(cluster_centers_=model.cluster_centers_[permutation])
+    np.testing.assert_array_equal(align_clusters(scaler, refit, reference), permutation)
+
+    other_k = SimpleNamespace(cluster_centers_=model.cluster_centers_[:2])
+    assert align_clusters(scaler, other_k, reference) is None
+    assert align_clusters(scaler, refit, reference, features=["Recency", "Monetary"]) is None
+
+
+def test_relabel_keeps_predictions_consistent(fitted):
+    rfm, scaler, model = fitted
+    X = scale_features(scaler, rfm.to_numpy(dtype=np.float64))
+    before = model.predict(X)
+    mapping = np.array([1, 2, 0])
+    model.relabel(mapping)
+    np.testing.assert_array_equal(model.predict(X), mapping[before])
+    pd.testing.assert_series_equal(pd.Series(model.model.labels_), pd.Series(mapping[before]))